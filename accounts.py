@@ -0,0 +1,90 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from budgets import BudgetTracker
+from project_cache import ProjectCache
+from rate_limit import RateLimiter
+from routing_rules import RoutingRules
+from sync_wal import SyncLog
+
+# Toggl allows about one request per second per token, with short bursts
+DEFAULT_TOGGL_REQUESTS_PER_MINUTE = 60
+TOGGL_BURST = 3
+SAFE_NAME_RE = re.compile(r"[^\w.-]+")
+# Accounts sync on worker threads; whole messages are printed under one lock
+_PRINT_LOCK = threading.Lock()
+
+
+@dataclass
+class Account:
+    """One Toggl user synced by this process, with its own state files and rate limit
+
+    ``cfg`` is the top-level config overlaid with the account's own keys, so
+    every per-account setting (token, workspace, ``id_to_name``,
+    ``PROJECT_CALENDARS``, ``ROUTING_RULES``, ``COALESCE_GAP_MINUTES``,
+    ``SINK``, ``BUDGETS``) falls back to the shared value.
+    """
+    name: str
+    cfg: Dict[str, Any]
+    project_cache: ProjectCache
+    routing_rules: RoutingRules
+    sync_log: SyncLog
+    limiter: RateLimiter
+    prefix_logs: bool = False
+    budgets: Optional[BudgetTracker] = None
+
+    def log(self, message: str = "") -> None:
+        if self.prefix_logs:
+            message = "\n".join(f"[{self.name}] {line}" for line in message.split("\n"))
+        with _PRINT_LOCK:
+            print(message, flush=self.prefix_logs)
+
+
+def load_accounts(cfg: Dict[str, Any], config_dir: str) -> List[Account]:
+    """Accounts from ``ACCOUNTS`` in config.json, or the top-level settings as one account
+
+    Named accounts keep their project cache, write-ahead log and budget
+    totals in ``.toggl_projects.<name>.json``, ``.sync_wal.<name>.jsonl``
+    and ``.budgets.<name>.json`` unless they set ``PROJECT_CACHE_PATH`` /
+    ``SYNC_LOG_PATH`` / ``BUDGET_STATE_PATH`` themselves.
+    """
+    shared = {k: v for k, v in cfg.items() if k != "ACCOUNTS"}
+    specs = cfg.get("ACCOUNTS")
+    if not specs:
+        return [_build_account("default", shared, config_dir, prefix_logs=False)]
+
+    accounts = []
+    seen = set()
+    for i, spec in enumerate(specs):
+        name = spec.get("name") or f"account{i + 1}"
+        if name in seen:
+            raise ValueError(f"Duplicate account name: {name}")
+        seen.add(name)
+        safe = SAFE_NAME_RE.sub("_", name)
+        account_cfg = {
+            **shared,
+            "PROJECT_CACHE_PATH": os.path.join(config_dir, f".toggl_projects.{safe}.json"),
+            "SYNC_LOG_PATH": os.path.join(config_dir, f".sync_wal.{safe}.jsonl"),
+            "BUDGET_STATE_PATH": os.path.join(config_dir, f".budgets.{safe}.json"),
+            **spec,
+        }
+        accounts.append(_build_account(name, account_cfg, config_dir, prefix_logs=len(specs) > 1))
+    return accounts
+
+
+def _build_account(name: str, cfg: Dict[str, Any], config_dir: str, prefix_logs: bool) -> Account:
+    limiter = RateLimiter.per_minute(cfg.get("TOGGL_REQUESTS_PER_MINUTE", DEFAULT_TOGGL_REQUESTS_PER_MINUTE),
+                                    burst=TOGGL_BURST)
+    return Account(
+        name=name,
+        cfg=cfg,
+        project_cache=ProjectCache.from_config(cfg, config_dir, limiter),
+        routing_rules=RoutingRules.from_config(cfg),
+        sync_log=SyncLog.from_config(cfg, config_dir),
+        limiter=limiter,
+        prefix_logs=prefix_logs,
+        budgets=BudgetTracker.from_config(cfg, config_dir),
+    )
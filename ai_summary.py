@@ -1,40 +1,79 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import functools
 import json
-import requests
-from deprecated import deprecated
+import threading
+import time
+import uuid
+from prompt_compaction import compact_report, estimate_tokens, DEFAULT_TOKEN_BUDGET
+from review_metrics import ReviewMetrics, render_tables
+from instrumentation import RECORDER, http_request, http_session
+
+
+def deprecated(reason: str):
+    """``deprecated.deprecated`` applied on first call, so importing this module stays cheap"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from deprecated import deprecated as _deprecated
+            return _deprecated(reason=reason)(func)(*args, **kwargs)
+        return wrapper
+    return decorator
+
 
 # Type alias for configuration
 Config = Dict[str, Any]
+# Telemetry labels of a query: report_type, report_id, prompt_version, token_budget
+Labels = Dict[str, Any]
 
 class Assistant(ABC):
     def __init__(self):
         self.api_key = None
         self.base_url = None
+        self.model = "gpt-3.5-turbo"
+        self.timeout = 30
+        self.name = "default"
+        self.stream_usage = True
+        self.telemetry = None
     
     def initialize(self, cfg: Config):
         try: 
             self.api_key = cfg["AGENT_API_KEY"]
             self.base_url = cfg.get("AGENT_URL", "https://api.openai.com/v1")
+            self.model = cfg.get("AGENT_MODEL", self.model)
+            self.timeout = cfg.get("AGENT_TIMEOUT", self.timeout)
+            self.stream_usage = cfg.get("AGENT_STREAM_USAGE", self.stream_usage)
         except KeyError as e:
             raise e
+        if self.telemetry is None:
+            from llm_telemetry import LlmTelemetry
+            self.telemetry = LlmTelemetry.from_config(cfg)
 
     @abstractmethod
-    def query(self, prompt: str) -> str:
+    def query(self, prompt: str, labels: Optional[Labels] = None) -> str:
         pass
 
+    def query_stream(self, prompt: str, labels: Optional[Labels] = None) -> Iterator[str]:
+        """Yield the completion in chunks; falls back to a single blocking query"""
+        yield self.query(prompt, labels)
+
     @staticmethod
     def build_assistant(cfg: Config) -> 'Assistant':
-        # For now, return a default LLM assistant
-        # You can extend this to support different assistant types
-        assistant = LLMAssistant()
+        # A backend registry routes across several endpoints;
+        # otherwise return a single default LLM assistant
+        if cfg.get("LLM_BACKENDS"):
+            assistant = RoutedAssistant()
+        else:
+            assistant = LLMAssistant()
         assistant.initialize(cfg)
         return assistant
 
 
 class LLMAssistant(Assistant):
-    def query(self, prompt: str) -> str:
-        """Send a query to the LLM API using requests"""
+    def _build_request(self, prompt: str, stream: bool = False):
+        """Build headers and payload for a chat completion request"""
         if not self.api_key or not self.base_url:
             raise ValueError("Assistant not properly initialized")
         
@@ -44,30 +83,372 @@ class LLMAssistant(Assistant):
         }
         
         payload = {
-            "model": "gpt-3.5-turbo",  # Default model, can be configurable
+            "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": 1000,
             "temperature": 0.7
         }
+        if stream:
+            payload["stream"] = True
+            headers["Accept"] = "text/event-stream"
+            if self.stream_usage:
+                # the final chunk then carries the usage; dropped after a 400 from servers that reject it
+                payload["stream_options"] = {"include_usage": True}
+        return headers, payload
+
+    def _record(self, labels: Optional[Labels], prompt: str, latency: float, outcome: str,
+                usage: Optional[Dict[str, Any]], completion: Optional[str] = None, stream: bool = False,
+                ttft: Optional[float] = None) -> None:
+        """Append one call to the telemetry log; tokens are estimated locally when the API sent no usage"""
+        if self.telemetry is None:
+            return
+        from llm_telemetry import LlmCall
+
+        estimated = not usage and completion is not None
+        if usage:
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        elif estimated:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+        else:
+            prompt_tokens = completion_tokens = None
+        self.telemetry.record(LlmCall(
+            backend=self.name, model=self.model, latency=latency, outcome=outcome, stream=stream, ttft=ttft,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, tokens_estimated=estimated,
+            **(labels or {}),
+        ))
+
+    def query(self, prompt: str, labels: Optional[Labels] = None) -> str:
+        """Send a query to the LLM API using requests"""
+        import requests
+
+        headers, payload = self._build_request(prompt)
+        outcome = "error"
+        result = {}
+        content = None
+        t0 = time.perf_counter()
         
         try:
-            response = requests.post(
+            response = http_request(
+                "POST",
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=30
+                timeout=self.timeout
             )
             response.raise_for_status()
             
             result = response.json()
-            return result["choices"][0]["message"]["content"]
+            content = result["choices"][0]["message"]["content"]
+            outcome = "ok"
+            return content
             
+        except requests.exceptions.Timeout as e:
+            outcome = "timeout"
+            raise Exception(f"API request failed: {e}")
         except requests.exceptions.RequestException as e:
             raise Exception(f"API request failed: {e}")
         except (KeyError, IndexError) as e:
             raise Exception(f"Invalid API response format: {e}")
+        finally:
+            self._record(labels, prompt, time.perf_counter() - t0, outcome,
+                         result.get("usage") if isinstance(result, dict) else None, content)
+
+    def query_stream(self, prompt: str, labels: Optional[Labels] = None) -> Iterator[str]:
+        """Send a streaming query and yield content deltas as they arrive (SSE)"""
+        import requests
+
+        headers, payload = self._build_request(prompt, stream=True)
+        url = f"{self.base_url}/chat/completions"
+        received = 0
+        outcome = "error"
+        usage: Dict[str, Any] = {}
+        chunks: List[str] = []
+        ttft = None
+        t0 = time.perf_counter()
+
+        try:
+            # (connect, read) timeout: the read timeout applies between chunks,
+            # so long completions no longer hit a wall-clock limit
+            response = http_session().post(url, headers=headers, json=payload, stream=True,
+                                           timeout=(10, self.timeout))
+            if response.status_code == 400 and "stream_options" in payload:
+                # servers that reject stream_options: ask again without it, and stop sending it
+                response.close()
+                self.stream_usage = False
+                del payload["stream_options"]
+                response = http_session().post(url, headers=headers, json=payload, stream=True,
+                                               timeout=(10, self.timeout))
+            with response:
+                response.raise_for_status()
+                lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+                for content in self._iter_sse_content(lines, usage):
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    received += len(content.encode("utf-8"))
+                    chunks.append(content)
+                    yield content
+            outcome = "ok"
+
+        except GeneratorExit:
+            outcome = "cancelled"
+            raise
+        except requests.exceptions.Timeout as e:
+            outcome = "timeout"
+            raise Exception(f"API request failed: {e}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"API request failed: {e}")
+        finally:
+            # recorded once the stream is consumed, so the duration covers the whole completion
+            duration = time.perf_counter() - t0
+            RECORDER.record_call("http", f"POST {url}", duration, len(json.dumps(payload)) + received, outcome)
+            self._record(labels, prompt, duration, outcome, usage, "".join(chunks) if outcome == "ok" else None,
+                         stream=True, ttft=ttft)
+
+    @staticmethod
+    def _iter_sse_content(lines, usage: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Extract content deltas from the `data:` lines of an SSE stream; ``usage`` is filled if reported
+
+        A stream that ends without ``[DONE]`` or a ``finish_reason`` was cut
+        off and raises, so a truncated completion is not taken for a whole one.
+        """
+        finished = False
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            try:
+                chunk = json.loads(data)
+                if usage is not None and chunk.get("usage"):
+                    usage.update(chunk["usage"])
+                if not chunk.get("choices") and "usage" in chunk:
+                    continue  # the usage-only final chunk
+                choice = chunk["choices"][0]
+                delta = choice.get("delta", {})
+            except (ValueError, KeyError, IndexError, AttributeError) as e:
+                raise Exception(f"Invalid stream chunk: {e}")
+            finished = finished or bool(choice.get("finish_reason"))
+            content = delta.get("content")
+            if content:
+                yield content
+        if not finished:
+            raise Exception("Stream ended before the completion finished")
+
+
+class LatencyTracker:
+    """Rolling latency samples and failure streak for one backend"""
+
+    def __init__(self, window: int = 50, seed: Optional[List[float]] = None):
+        self.samples = deque(seed or (), maxlen=window)
+        self.failures = 0
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: Optional[bool]) -> None:
+        """Sample one attempt; ``ok=None`` is a cancelled hedge, whose latency is a lower bound
+
+        Failures are sampled as well, so a backend that keeps timing out
+        raises its percentile instead of vanishing from it.
+        """
+        with self._lock:
+            self.samples.append(latency)
+            if ok:
+                self.consecutive_failures = 0
+            elif ok is not None:
+                self.failures += 1
+                self.consecutive_failures += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class RoutedAssistant(Assistant):
+    """Routes queries across several OpenAI-compatible backends
+
+    Configured through ``LLM_BACKENDS`` (a list of ``name``, ``url``,
+    ``api_key``, ``model``, ``timeout``) and ``LLM_ROUTING``:
+
+    - ``policy``: ``"failover"`` tries backends one after another on errors or
+      timeouts; ``"hedged"`` (default) additionally starts the next backend
+      when the current one is slower than its own p95 latency, and returns
+      whichever answers first. Hedged attempts are streamed, so the losing
+      one closes its response instead of running to completion.
+    - ``hedge_percentile`` (95), ``min_samples`` (5) before the percentile is
+      trusted, ``default_hedge_delay`` seconds used until then (5.0).
+
+    Latency trackers start from the backends' recent latencies in the LLM
+    telemetry log, so a fresh process hedges on real percentiles.
+    """
+
+    def initialize(self, cfg: Config):
+        routing = cfg.get("LLM_ROUTING", {})
+        self.policy = routing.get("policy", "hedged")
+        if self.policy not in ("hedged", "failover"):
+            raise ValueError(f"Unknown LLM routing policy: {self.policy}")
+        self.hedge_percentile = routing.get("hedge_percentile", 95)
+        self.min_samples = routing.get("min_samples", 5)
+        self.default_hedge_delay = routing.get("default_hedge_delay", 5.0)
+
+        from llm_telemetry import LlmTelemetry
+
+        self.telemetry = LlmTelemetry.from_config(cfg)
+        self.backends: List[LLMAssistant] = []
+        for i, backend_cfg in enumerate(cfg["LLM_BACKENDS"]):
+            backend = LLMAssistant()
+            backend.telemetry = self.telemetry
+            backend.initialize({
+                "AGENT_API_KEY": backend_cfg.get("api_key", cfg.get("AGENT_API_KEY")),
+                "AGENT_URL": backend_cfg.get("url", cfg.get("AGENT_URL", "https://api.openai.com/v1")),
+                "AGENT_MODEL": backend_cfg.get("model", cfg.get("AGENT_MODEL", "gpt-3.5-turbo")),
+                "AGENT_TIMEOUT": backend_cfg.get("timeout", cfg.get("AGENT_TIMEOUT", 30)),
+                "AGENT_STREAM_USAGE": backend_cfg.get("stream_usage", cfg.get("AGENT_STREAM_USAGE", True)),
+            })
+            backend.name = backend_cfg.get("name", f"backend-{i}")
+            self.backends.append(backend)
+        window = 50
+        recent = self.telemetry.recent_latencies(window)
+        self.trackers: Dict[str, LatencyTracker] = {
+            b.name: LatencyTracker(window, recent.get(b.name)) for b in self.backends
+        }
+        self.api_key = self.backends[0].api_key if self.backends else None
+        self.base_url = self.backends[0].base_url if self.backends else None
+
+    def _ordered_backends(self) -> List[LLMAssistant]:
+        """Configured order, with backends on a failure streak moved to the back"""
+        return sorted(self.backends, key=lambda b: self.trackers[b.name].consecutive_failures > 0)
+
+    def _hedge_delay(self, backend: LLMAssistant) -> float:
+        tracker = self.trackers[backend.name]
+        if len(tracker.samples) < self.min_samples:
+            return self.default_hedge_delay
+        return tracker.percentile(self.hedge_percentile)
+
+    def _timed_query(self, backend: LLMAssistant, prompt: str, attempt: int = 0,
+                     labels: Optional[Labels] = None, cancel: Optional[threading.Event] = None) -> Optional[str]:
+        """Query one backend and sample its latency
+
+        With ``cancel`` the completion is streamed so the attempt can stop:
+        once the event is set the response is closed and None returned.
+        """
+        t0 = time.perf_counter()
+        try:
+            with RECORDER.retry_attempt(attempt):
+                if cancel is None:
+                    result = backend.query(prompt, labels)
+                else:
+                    result = self._cancellable_query(backend, prompt, labels, cancel)
+        except Exception:
+            self.trackers[backend.name].record(time.perf_counter() - t0, ok=False)
+            raise
+        self.trackers[backend.name].record(time.perf_counter() - t0, ok=None if result is None else True)
+        return result
+
+    @staticmethod
+    def _cancellable_query(backend: LLMAssistant, prompt: str, labels: Optional[Labels],
+                           cancel: threading.Event) -> Optional[str]:
+        if cancel.is_set():
+            return None
+        chunks = []
+        stream = backend.query_stream(prompt, labels)
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    return None
+                chunks.append(chunk)
+        finally:
+            stream.close()  # closes the HTTP response of a cancelled attempt
+        return "".join(chunks)
+
+    def query(self, prompt: str, labels: Optional[Labels] = None) -> str:
+        if not self.backends:
+            raise ValueError("Assistant not properly initialized")
+        if self.policy == "failover":
+            return self._query_failover(prompt, labels)
+        return self._query_hedged(prompt, labels)
+
+    def _query_failover(self, prompt: str, labels: Optional[Labels] = None) -> str:
+        errors = []
+        for attempt, backend in enumerate(self._ordered_backends()):
+            try:
+                return self._timed_query(backend, prompt, attempt, labels)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+        raise Exception(f"All LLM backends failed ({'; '.join(errors)})")
+
+    def _query_hedged(self, prompt: str, labels: Optional[Labels] = None) -> str:
+        pending = list(self._ordered_backends())
+        errors = []
+        in_flight = {}
+        attempt = 0
+        # set once a backend has answered: the losers close their responses at their next chunk
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(pending))
+        try:
+            while pending or in_flight:
+                if pending:
+                    backend = pending.pop(0)
+                    in_flight[executor.submit(self._timed_query, backend, prompt, attempt, labels, cancel)] = backend
+                    attempt += 1
+                    timeout = self._hedge_delay(backend) if pending else None
+                else:
+                    timeout = None
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = in_flight.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        errors.append(f"{backend.name}: {e}")
+        finally:
+            cancel.set()
+            executor.shutdown(wait=False)
+        raise Exception(f"All LLM backends failed ({'; '.join(errors)})")
+
+    def query_stream(self, prompt: str, labels: Optional[Labels] = None) -> Iterator[str]:
+        """Stream from the first backend that produces output, failing over before the first chunk"""
+        if not self.backends:
+            raise ValueError("Assistant not properly initialized")
+        errors = []
+        for attempt, backend in enumerate(self._ordered_backends()):
+            t0 = time.perf_counter()
+            started = False
+            try:
+                with RECORDER.retry_attempt(attempt):
+                    for chunk in backend.query_stream(prompt, labels):
+                        started = True
+                        yield chunk
+            except Exception as e:
+                self.trackers[backend.name].record(time.perf_counter() - t0, ok=False)
+                if started:
+                    raise
+                errors.append(f"{backend.name}: {e}")
+                continue
+            self.trackers[backend.name].record(time.perf_counter() - t0, ok=True)
+            return
+        raise Exception(f"All LLM backends failed ({'; '.join(errors)})")
+
+    def latency_report(self) -> Dict[str, Dict[str, Any]]:
+        """Per-backend p50/p95 latency and failure counts"""
+        return {
+            name: {
+                "samples": len(tracker.samples),
+                "p50": tracker.percentile(50),
+                "p95": tracker.percentile(95),
+                "failures": tracker.failures,
+            }
+            for name, tracker in self.trackers.items()
+        }
 
 
 class ReportAnalyzer: 
@@ -95,7 +476,23 @@ class ReportAnalyzer:
         
         self.agent = Assistant.build_assistant(self.cfg)
 
-    def _build_prompt(self, report: str, report_type: str = "DAILY"):
+    def _token_budget(self) -> int:
+        return self.cfg.get("PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET) if hasattr(self, "cfg") else DEFAULT_TOKEN_BUDGET
+
+    def _labels(self, report_type: str, metrics: Optional[ReviewMetrics]) -> Labels:
+        """Telemetry labels for one report; every attempt made for it shares the report_id"""
+        return {
+            "report_type": report_type.upper(),
+            "report_id": uuid.uuid4().hex[:12],
+            "prompt_version": "v3" if metrics is not None else "v2",
+            "token_budget": self._token_budget(),
+        }
+
+    def _build_prompt(self, report: str, report_type: str = "DAILY", metrics: Optional[ReviewMetrics] = None):
+        # Compact the report first so prompt size stays flat as the range grows
+        report = compact_report(report, self._token_budget())
+        if metrics is not None:
+            return self._build_prompt_v3(report, report_type, render_tables(metrics))
         return self._build_prompt_v2(report, report_type)
     
     @deprecated(reason="Use _build_prompt_v2 instead")
@@ -194,20 +591,75 @@ class ReportAnalyzer:
         
         """
     
-    def generate_analysis(self, report: str, report_type: str = "DAILY") -> str:
-        """Generate analysis of the calendar report using LLM"""
+    def _build_prompt_v3(self, report: str, report_type: str, tables: str) -> str:
+        tmp = "Today" if report_type.upper() == "DAILY" else "This week"
+        return f"""
+        Please write the prose part of a fast, focused evening performance review for the following {report_type.lower()} calendar and time tracking summary.
+        The tables below were computed exactly from the data; do not recompute, repeat or contradict their numbers.
+        ---
+
+        📋 Calendar & Time Tracking Summary:
+        {report}
+
+        📊 Computed Review Tables:
+        {tables}
+
+        ---
+
+        Write only these sections, concisely:
+
+        ### 4️⃣ Tactical Recommendations (Next Day)
+        1–3 practical tips grounded in the tables (overdue reminders, deep work blocks, plan calibration).
+
+        ### 5️⃣ One-Line Self-Debrief
+        > "{tmp} completion rate …, deep work …, ⚠️ backlog … → …"
+
+        ### 6️⃣ Motivation / Positive Feedback
+        > One or two encouraging sentences.
+        """
+    
+    def generate_analysis(self, report: str, report_type: str = "DAILY", metrics: Optional[ReviewMetrics] = None) -> str:
+        """Generate analysis of the calendar report using LLM
+
+        With ``metrics`` the locally computed tables are prepended and the LLM
+        only writes the prose sections. A failed query is raised.
+        """
         if not hasattr(self, "cfg"):
             self._load_config()
         if not hasattr(self, "agent"):
             self._load_agent()
 
-        prompt = self._build_prompt(report, report_type)
+        prompt = self._build_prompt(report, report_type, metrics)
         
         try:
-            analysis = self.agent.query(prompt)
-            return analysis
+            analysis = self.agent.query(prompt, self._labels(report_type, metrics))
+        except Exception as e:
+            # raised, so no caller saves the error message as a journal
+            raise Exception(f"Error generating analysis: {e}") from e
+        if metrics is not None:
+            analysis = render_tables(metrics) + "\n\n" + analysis
+        return analysis
+
+    def generate_analysis_stream(self, report: str, report_type: str = "DAILY", metrics: Optional[ReviewMetrics] = None) -> Iterator[str]:
+        """Generate analysis of the calendar report, yielding text as the LLM produces it
+
+        A failure, also one after part of the text was yielded, is raised so
+        the caller can tell a truncated analysis from a complete one.
+        """
+        if not hasattr(self, "cfg"):
+            self._load_config()
+        if not hasattr(self, "agent"):
+            self._load_agent()
+
+        prompt = self._build_prompt(report, report_type, metrics)
+        if metrics is not None:
+            yield render_tables(metrics) + "\n\n"
+
+        try:
+            for chunk in self.agent.query_stream(prompt, self._labels(report_type, metrics)):
+                yield chunk
         except Exception as e:
-            return f"Error generating analysis: {str(e)}"
+            raise Exception(f"Error generating analysis: {e}") from e
 
 
 def debug():
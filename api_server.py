@@ -0,0 +1,295 @@
+"""Local read-only HTTP API for dashboards and editor plugins
+
+    python cli.py serve                 # http://127.0.0.1:8765
+    curl -s localhost:8765/totals
+
+Endpoints (GET, JSON):
+
+    /summary     today's summary text, as printed by `cli.py summary`
+    /totals      planned and tracked time per calendar today
+    /metrics     the review numbers (tasks, deep work, reminders)
+    /reminders   today's overdue and completed reminders
+    /analysis    the latest saved daily or weekly journal's analysis
+    /archive     aggregates from the local archive, e.g.
+                 /archive?group_by=week,project&since=2026-01-01&project=Growth
+    /health      refresh times and the last refresh error
+
+A background thread re-reads Calendar and Reminders every
+``API_REFRESH_SECONDS`` and serializes every endpoint once; requests are
+answered from those prebuilt bodies. Each body carries an ``ETag``, and a
+request with a matching ``If-None-Match`` gets an empty ``304``. The server
+never calls the LLM; /analysis serves what `wrap-up --save` wrote.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_REFRESH_SECONDS = 300
+ANALYSIS_MARKER = " 🔍 ANALYSIS "
+
+Response = Tuple[int, bytes, Optional[str]]  # status, body, ETag
+
+
+def _encode(payload: Any) -> Tuple[bytes, str]:
+    body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+    return body, f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """``If-None-Match`` check; weak validators compare equal to strong ones"""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def report_day(now: datetime) -> date:
+    """The day a daily report covers; before 06:00 that is still yesterday"""
+    return (now - timedelta(days=1)).date() if now.hour < 6 else now.date()
+
+
+def latest_journal(journal_dir: str) -> Optional[str]:
+    """Path of the newest saved daily or weekly journal"""
+    try:
+        names = [n for n in os.listdir(journal_dir)
+                 if n.endswith(".md") and n.startswith(("DAILY_", "WEEKLY_"))]
+    except OSError:
+        return None
+    if not names:
+        return None
+    return os.path.join(journal_dir, max(names, key=lambda n: (n.split("_", 1)[1], n)))
+
+
+class SummaryService:
+    """Prebuilt endpoint bodies, rebuilt from Calendar and Reminders in the background
+
+    The response table is replaced as a whole, so a request always sees one
+    consistent refresh. Refresh errors keep the last good responses.
+    """
+
+    def __init__(self, summarizer, cfg: Dict[str, Any], refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+                 archive=None):
+        self.summarizer = summarizer
+        self.cfg = cfg
+        self.refresh_seconds = refresh_seconds
+        self.archive = archive
+        self._responses: Dict[str, Tuple[bytes, str]] = {}
+        self._health: Dict[str, Any] = {"refreshed_at": None, "refresh_seconds": refresh_seconds,
+                                        "last_duration": None, "last_error": None, "refreshes": 0}
+        self._stop = threading.Event()
+        self._journal: Tuple[Optional[str], Optional[int], Optional[Tuple[bytes, str]]] = (None, None, None)
+
+    def refresh(self) -> None:
+        from review_metrics import calendar_totals, compute_metrics
+        from summarize_calendar import EventAnalyzer
+
+        t0 = time.perf_counter()
+        now = datetime.now()
+        day = report_day(now)
+        day_str = day.isoformat()
+        start = datetime.combine(day, datetime.min.time())
+        try:
+            events = self.summarizer._get_calendar_events(start, start)
+            reminders = self.summarizer.reminder_source.get_data(start, start)
+            summary = self.summarizer.build_summary(day_str, day_str, events, reminders)
+            metrics = compute_metrics(events, reminders, "DAILY", 1, self.cfg)
+        except Exception as e:
+            self._health["last_error"] = f"{now.isoformat(timespec='seconds')}: {e}"
+            print(f"Refresh failed: {e}", flush=True)
+            return
+
+        generated = now.isoformat(timespec="seconds")
+        totals = calendar_totals(events)
+        categorized = EventAnalyzer.categorize_reminders(reminders)
+        responses = {
+            "/summary": {"day": day_str, "generated_at": generated, "text": summary},
+            "/totals": {
+                "day": day_str,
+                "generated_at": generated,
+                "calendars": totals,
+                "actual_seconds": sum(t["actual_seconds"] for t in totals.values()),
+                "planned_seconds": sum(t["planned_seconds"] for t in totals.values()),
+            },
+            "/metrics": {
+                "day": day_str,
+                "generated_at": generated,
+                **asdict(metrics),
+                "task_rate": metrics.task_rate,
+                "reminder_rate": metrics.reminder_rate,
+                "backlog_status": metrics.backlog_status,
+            },
+            "/reminders": {
+                "day": day_str,
+                "generated_at": generated,
+                **{status: [asdict(r) for r in items] for status, items in categorized.items()},
+            },
+        }
+        # generated_at changes every refresh; the ETag must only change with the data
+        self._responses = {path: self._with_stable_etag(path, payload) for path, payload in responses.items()}
+        self._health.update(refreshed_at=generated, last_duration=round(time.perf_counter() - t0, 3),
+                            last_error=None, refreshes=self._health["refreshes"] + 1)
+
+    def _with_stable_etag(self, path: str, payload: Dict[str, Any]) -> Tuple[bytes, str]:
+        _, etag = _encode({k: v for k, v in payload.items() if k != "generated_at"})
+        previous = self._responses.get(path)
+        if previous is not None and previous[1] == etag:
+            return previous
+        return _encode(payload)[0], etag
+
+    def _analysis(self) -> Optional[Tuple[bytes, str]]:
+        from wrap_up import get_journal_store
+
+        path = latest_journal(get_journal_store().root)
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached_path, cached_mtime, cached = self._journal
+        if (cached_path, cached_mtime) == (path, mtime):
+            return cached
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        analysis = text.split(ANALYSIS_MARKER, 1)[1] if ANALYSIS_MARKER in text else text
+        analysis = analysis.lstrip("=").rstrip().removesuffix("=" * 60).strip()
+        name = os.path.basename(path)
+        response = _encode({
+            "report_type": name.split("_", 1)[0],
+            "day": datetime.strptime(name.split("_", 1)[1][:8], "%Y%m%d").date().isoformat(),
+            "path": path,
+            "saved_at": datetime.fromtimestamp(mtime / 1e9).isoformat(timespec="seconds"),
+            "analysis": analysis,
+        })
+        self._journal = (path, mtime, response)
+        return response
+
+    def _archive_query(self, query: Dict[str, list]) -> Response:
+        from archive import DIMENSIONS
+
+        if self.archive is None:
+            return 404, _encode({"error": "The archive is disabled"})[0], None
+        try:
+            since = date.fromisoformat(query["since"][0]) if "since" in query else None
+            until = date.fromisoformat(query["until"][0]) if "until" in query else None
+            group_by = [g for value in query.get("group_by", []) for g in value.split(",") if g]
+            metric = query.get("metric", ["hours"])[0]
+            where = {name: query[name] for name in DIMENSIONS if name in query}
+            result = self.archive.query(since, until, where, group_by, metric)
+        except ValueError as e:
+            return 400, _encode({"error": str(e)})[0], None
+        body, etag = _encode({"group_by": group_by, "metric": metric,
+                              "rows": [{**dict(zip(group_by, key)), metric: value} for key, value in result]})
+        return 200, body, etag
+
+    def handle(self, path: str, query: Dict[str, list]) -> Response:
+        if path in ("", "/"):
+            body, etag = _encode({"endpoints": ["/summary", "/totals", "/metrics", "/reminders",
+                                                "/analysis", "/archive", "/health"]})
+            return 200, body, etag
+        if path == "/health":
+            return 200, _encode(self._health)[0], None
+        if path == "/analysis":
+            response = self._analysis()
+            if response is None:
+                return 404, _encode({"error": "No saved journal yet"})[0], None
+            return 200, *response
+        if path == "/archive":
+            return self._archive_query(query)
+        response = self._responses.get(path)
+        if response is not None:
+            return 200, *response
+        if path in ("/summary", "/totals", "/metrics", "/reminders"):
+            return 503, _encode({"error": "Not loaded yet", **self._health})[0], None
+        return 404, _encode({"error": f"Unknown endpoint: {path}"})[0], None
+
+    def run_refresher(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def make_handler(service: SummaryService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive for polling clients
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            try:
+                status, body, etag = service.handle(url.path.rstrip("/") or "/", parse_qs(url.query))
+            except Exception as e:
+                status, body, etag = 500, _encode({"error": str(e)})[0], None
+            if etag is not None and status == 200 and etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            if etag is not None:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    import argparse
+    import signal
+
+    from settings import config_path, load_config
+
+    parser = argparse.ArgumentParser(description="Serve summaries, totals and metrics as local JSON endpoints")
+    parser.add_argument("--host", help=f"Address to bind (default: API_HOST or {DEFAULT_HOST}, localhost only)")
+    parser.add_argument("--port", type=int, help=f"Port (default: API_PORT or {DEFAULT_PORT})")
+    parser.add_argument("--refresh-seconds", type=float,
+                        help=f"How often Calendar and Reminders are re-read (default: {DEFAULT_REFRESH_SECONDS})")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    host = args.host or cfg.get("API_HOST", DEFAULT_HOST)
+    port = args.port or cfg.get("API_PORT", DEFAULT_PORT)
+    refresh_seconds = args.refresh_seconds or cfg.get("API_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)
+
+    from archive import Archive
+    from summarize_calendar import CalendarSummarizer
+    from sync import get_executor
+
+    service = SummaryService(CalendarSummarizer(executor=get_executor()), cfg, refresh_seconds,
+                             Archive.from_config(cfg, os.path.dirname(config_path())))
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    threading.Thread(target=service.run_refresher, name="refresh", daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Serving on http://{host}:{port} (refresh every {refresh_seconds:g}s)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
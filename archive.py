@@ -0,0 +1,466 @@
+"""Columnar archive of Toggl time entries for local analytics
+
+    python cli.py archive --group-by week,project --since 2026-01-01
+    python cli.py archive --project Growth --group-by month --metric count
+    python cli.py archive --stats
+
+Every sync (and ``sync --since`` bulk import) adds the entries it fetched.
+Entries are partitioned by local month into one file each, holding typed
+``array`` columns; project, description, tag and account names are
+dictionary-encoded as int codes shared by all partitions. Queries filter and
+group on those int columns, so they never parse timestamps or strings.
+"""
+import bisect
+import json
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import defaultdict
+from datetime import date, datetime
+from itertools import repeat
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+MAGIC = b"TCA1"
+DIMENSIONS = ("project", "description", "account", "tag")
+TIME_GROUPS = ("day", "week", "month", "year", "weekday")
+METRICS = ("hours", "seconds", "count")
+# column → array typecode; int32 everywhere except ids and epoch seconds
+COLUMNS = {
+    "id": "q", "start": "q", "day": "i", "duration": "i",
+    "project": "i", "description": "i", "account": "i",
+    "tag_offsets": "i", "tags": "i",
+}
+# Distinct query shapes whose whole-month totals are kept per partition
+MAX_MEMO_PER_PARTITION = 32
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+Row = Tuple[int, int, int, int, int, int, int, Tuple[int, ...]]
+
+
+class _Dictionary:
+    """Append-only string ↔ code mapping; codes never change once assigned"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = list(values)
+        self.codes: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Partition:
+    """One month of entries as columns, sorted by start"""
+
+    def __init__(self, month: str, columns: Dict[str, array]):
+        self.month = month
+        self.columns = columns
+        self._derived: Dict[str, array] = {}
+        self.aggregates: Dict[tuple, Dict[tuple, int]] = {}  # query shape → totals, see Archive.query
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def column(self, name: str) -> Sequence[int]:
+        """A stored column, or a time bucket derived from ``day`` (cached)"""
+        if name in self.columns:
+            return self.columns[name]
+        if name not in self._derived:
+            day = self.columns["day"]
+            if name == "week":  # ordinal of the Monday; date.fromordinal(1) is a Monday
+                self._derived[name] = array("i", (d - (d - 1) % 7 for d in day))
+            elif name == "weekday":
+                self._derived[name] = array("i", ((d - 1) % 7 for d in day))
+            else:
+                raise KeyError(name)
+        return self._derived[name]
+
+    def rows(self) -> Dict[int, Row]:
+        c = self.columns
+        offsets, tags = c["tag_offsets"], c["tags"]
+        return {
+            c["id"][i]: (c["id"][i], c["start"][i], c["day"][i], c["duration"][i], c["project"][i],
+                         c["description"][i], c["account"][i], tuple(tags[offsets[i]:offsets[i + 1]]))
+            for i in range(len(self))
+        }
+
+    @classmethod
+    def from_rows(cls, month: str, rows: Iterable[Row]) -> "Partition":
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        offsets, tags = columns["tag_offsets"], columns["tags"]
+        offsets.append(0)
+        for row in sorted(rows, key=lambda r: (r[1], r[0])):
+            for name, value in zip(("id", "start", "day", "duration", "project", "description", "account"), row):
+                columns[name].append(value)
+            tags.extend(row[7])
+            offsets.append(len(tags))
+        return cls(month, columns)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "rows": len(self),
+            "byteorder": sys.byteorder,
+            "columns": [[name, col.typecode, len(col)] for name, col in self.columns.items()],
+        }).encode("utf-8")
+        return b"".join([MAGIC, struct.pack("<I", len(header)), header]
+                        + [col.tobytes() for col in self.columns.values()])
+
+    @classmethod
+    def from_bytes(cls, month: str, data: bytes) -> "Partition":
+        if data[:4] != MAGIC:
+            raise ValueError(f"Not an archive partition: {month}")
+        (header_len,) = struct.unpack_from("<I", data, 4)
+        header = json.loads(data[8:8 + header_len])
+        view = memoryview(data)
+        offset = 8 + header_len
+        columns = {}
+        for name, typecode, count in header["columns"]:
+            col = array(typecode)
+            size = count * col.itemsize
+            col.frombytes(view[offset:offset + size])
+            if header["byteorder"] != sys.byteorder:
+                col.byteswap()
+            columns[name] = col
+            offset += size
+        return cls(month, columns)
+
+
+class Archive:
+    """Month-partitioned columnar store of time entries
+
+    ``ingest`` upserts by Toggl entry id: a month's file is only rewritten
+    (atomically) when it gains or changes rows, so re-ingesting the same
+    sync window is a no-op. Loaded partitions are cached per process and
+    reloaded when their file changes. Entries deleted in Toggl are not
+    removed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Tuple[int, int], Partition]] = {}
+        self._dict_stamp = None
+        self.dictionaries: Dict[str, _Dictionary] = {name: _Dictionary() for name in DIMENSIONS}
+
+    @classmethod
+    def from_config(cls, cfg: dict, config_dir: str) -> Optional["Archive"]:
+        """The configured archive, or None when ``ARCHIVE`` is false"""
+        if not cfg.get("ARCHIVE", True):
+            return None
+        return cls(cfg.get("ARCHIVE_DIR") or os.path.join(config_dir, "archive"))
+
+    # ------------------------------------------------------------ storage
+
+    def _dict_path(self) -> str:
+        return os.path.join(self.path, "dictionaries.json")
+
+    def _load_dictionaries(self) -> None:
+        try:
+            st = os.stat(self._dict_path())
+        except FileNotFoundError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._dict_stamp:
+            return
+        with open(self._dict_path(), encoding="utf-8") as f:
+            data = json.load(f)
+        self.dictionaries = {name: _Dictionary(data.get(name, [])) for name in DIMENSIONS}
+        self._dict_stamp = stamp
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def months(self) -> List[str]:
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith(".col"))
+
+    def partition(self, month: str) -> Optional[Partition]:
+        path = os.path.join(self.path, f"{month}.col")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(month)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        with open(path, "rb") as f:
+            part = Partition.from_bytes(month, f.read())
+        self._cache[month] = (stamp, part)
+        return part
+
+    # ------------------------------------------------------------- ingest
+
+    def ingest(self, entries: Iterable[dict], account: str = "default",
+               project_name: Optional[Callable[[dict], Optional[str]]] = None) -> int:
+        """Add or update finished entries; returns how many rows changed
+
+        ``project_name`` maps an entry to the project name to archive
+        (default: the project id). Running entries are skipped until they stop.
+        """
+        with self._lock:
+            self._load_dictionaries()
+            by_month: Dict[str, Dict[int, Row]] = defaultdict(dict)
+            for entry in entries:
+                row = self._row(entry, account, project_name)
+                if row is not None:
+                    day = date.fromordinal(row[2])
+                    by_month[f"{day.year:04d}-{day.month:02d}"][row[0]] = row
+
+            os.makedirs(self.path, exist_ok=True)
+            pending = []
+            changed = 0
+            for month, rows in by_month.items():
+                part = self.partition(month)
+                existing = part.rows() if part is not None else {}
+                updates = {key: row for key, row in rows.items() if existing.get(key) != row}
+                if updates:
+                    existing.update(updates)
+                    changed += len(updates)
+                    pending.append(Partition.from_rows(month, existing.values()))
+            if not pending:
+                return 0
+            # codes must be on disk before any partition that uses them
+            self._write(self._dict_path(), json.dumps(
+                {name: d.values for name, d in self.dictionaries.items()}, ensure_ascii=False).encode("utf-8"))
+            st = os.stat(self._dict_path())
+            self._dict_stamp = (st.st_mtime_ns, st.st_size)
+            for part in pending:
+                path = os.path.join(self.path, f"{part.month}.col")
+                self._write(path, part.to_bytes())
+                st = os.stat(path)
+                self._cache[part.month] = ((st.st_mtime_ns, st.st_size), part)
+            return changed
+
+    def _row(self, entry: dict, account: str,
+             project_name: Optional[Callable[[dict], Optional[str]]]) -> Optional[Row]:
+        duration = entry.get("duration") or 0
+        if not entry.get("id") or not entry.get("start") or not entry.get("stop") or duration < 0:
+            return None
+        try:
+            start = datetime.fromisoformat(entry["start"].replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if project_name is not None:
+            project = project_name(entry)
+        else:
+            project = str(entry["project_id"]) if entry.get("project_id") else None
+        d = self.dictionaries
+        tags = tuple(sorted({d["tag"].code(tag) for tag in entry.get("tags") or []}))
+        return (int(entry["id"]), int(start.timestamp()), start.astimezone().toordinal(), int(duration),
+                d["project"].code(project or ""), d["description"].code((entry.get("description") or "").strip()),
+                d["account"].code(account), tags)
+
+    # -------------------------------------------------------------- query
+
+    def query(self, since: Optional[date] = None, until: Optional[date] = None,
+              where: Optional[Dict[str, Iterable[str]]] = None, group_by: Sequence[str] = (),
+              metric: str = "hours") -> List[Tuple[Tuple[str, ...], float]]:
+        """Aggregate ``metric`` over entries between ``since`` and ``until`` (inclusive, local days)
+
+        ``where`` maps a dimension (project, description, account, tag) to
+        the names to keep; ``group_by`` takes dimensions and time buckets
+        (day, week, month, year, weekday). An entry with several tags counts
+        once under each tag when grouping by tag. Returns (group key, value)
+        pairs sorted by key.
+        """
+        for name in group_by:
+            if name not in DIMENSIONS + TIME_GROUPS:
+                raise ValueError(f"Unknown group: {name}")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        self._load_dictionaries()
+
+        filters: Dict[str, set] = {}
+        for name, values in (where or {}).items():
+            if name not in DIMENSIONS:
+                raise ValueError(f"Unknown filter: {name}")
+            codes = self.dictionaries[name].codes
+            filters[name] = {codes[v] for v in values if v in codes}
+            if not filters[name]:
+                return []
+
+        lo = since.toordinal() if since else None
+        hi = until.toordinal() if until else None
+        first_month = f"{since.year:04d}-{since.month:02d}" if since else ""
+        last_month = f"{until.year:04d}-{until.month:02d}" if until else "9999-99"
+
+        totals: Dict[tuple, int] = defaultdict(int)
+        for month in self.months():
+            if not first_month <= month <= last_month:
+                continue
+            part = self.partition(month)
+            if part is None or not len(part):
+                continue
+            day = part.columns["day"]
+            # rows are sorted by start, so the day range is a slice
+            begin = bisect.bisect_left(day, lo) if lo is not None else 0
+            end = bisect.bisect_right(day, hi) if hi is not None else len(part)
+            if begin >= end:
+                continue
+            if end - begin == len(part):
+                # a whole month's aggregate is reused until its file changes
+                memo_key = (tuple(group_by), metric, tuple(sorted((k, frozenset(v)) for k, v in filters.items())))
+                partial = part.aggregates.get(memo_key)
+                if partial is None:
+                    if len(part.aggregates) >= MAX_MEMO_PER_PARTITION:
+                        part.aggregates.clear()
+                    partial = part.aggregates[memo_key] = self._aggregate(part, range(begin, end), filters,
+                                                                          group_by, metric)
+            else:
+                partial = self._aggregate(part, range(begin, end), filters, group_by, metric)
+            for key, value in partial.items():
+                totals[key] += value
+
+        result = [(self._decode(key, group_by), value / 3600 if metric == "hours" else value)
+                  for key, value in totals.items()]
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def _aggregate(self, part: Partition, rows: Sequence[int], filters: Dict[str, set],
+                   group_by: Sequence[str], metric: str) -> Dict[tuple, int]:
+        totals: Dict[tuple, int] = defaultdict(int)
+        offsets, tags = part.columns["tag_offsets"], part.columns["tags"]
+        for name, codes in filters.items():
+            if name == "tag":
+                rows = [i for i in rows if not codes.isdisjoint(tags[offsets[i]:offsets[i + 1]])]
+            else:
+                col = part.columns[name]
+                rows = [i for i in rows if col[i] in codes]
+            if not rows:
+                return totals
+
+        def take(col: Sequence[int]) -> Sequence[int]:
+            return col[rows.start:rows.stop] if isinstance(rows, range) else [col[i] for i in rows]
+
+        values = take(part.columns["duration"]) if metric != "count" else repeat(1, len(rows))
+        keys = []
+        for name in group_by:
+            if name == "tag":
+                keys.append(None)  # expanded below
+            elif name == "month":
+                keys.append(repeat(part.month, len(rows)))
+            elif name == "year":
+                keys.append(repeat(part.month[:4], len(rows)))
+            else:
+                keys.append(take(part.column(name)))
+
+        if "tag" in group_by:
+            position = list(group_by).index("tag")
+            row_tags = [tags[offsets[i]:offsets[i + 1]] or (-1,) for i in rows]
+            others = [list(k) for k in keys if k is not None]
+            values = list(values)
+            for n, entry_tags in enumerate(row_tags):
+                base = [k[n] for k in others]
+                for tag in entry_tags:
+                    totals[tuple(base[:position] + [tag] + base[position:])] += values[n]
+            return totals
+
+        if not keys:
+            totals[()] += sum(values)
+        elif len(keys) == 1:
+            for key, value in zip(keys[0], values):
+                totals[(key,)] += value
+        else:
+            for key, value in zip(zip(*keys), values):
+                totals[key] += value
+        return totals
+
+    def _decode(self, key: tuple, group_by: Sequence[str]) -> Tuple[str, ...]:
+        out = []
+        for name, value in zip(group_by, key):
+            if name in ("day", "week"):
+                out.append(date.fromordinal(value).isoformat())
+            elif name == "weekday":
+                out.append(f"{value + 1} {WEEKDAYS[value]}")
+            elif name in DIMENSIONS:
+                out.append(self.dictionaries[name].values[value] if value >= 0 else "")
+            else:
+                out.append(value)
+        return tuple(out)
+
+    def stats(self) -> Dict[str, Any]:
+        self._load_dictionaries()
+        months = self.months()
+        rows = sum(len(self.partition(m)) for m in months)
+        size = sum(os.path.getsize(os.path.join(self.path, f"{m}.col")) for m in months)
+        return {
+            "path": self.path,
+            "partitions": len(months),
+            "first_month": months[0] if months else None,
+            "last_month": months[-1] if months else None,
+            "rows": rows,
+            "bytes": size,
+            **{f"{name}s": len(d.values) for name, d in self.dictionaries.items()},
+        }
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    from settings import config_path, load_config
+
+    parser = argparse.ArgumentParser(description="Query the local archive of synced Toggl entries")
+    parser.add_argument("--since", type=date.fromisoformat, metavar="YYYY-MM-DD", help="First day (inclusive)")
+    parser.add_argument("--until", type=date.fromisoformat, metavar="YYYY-MM-DD", help="Last day (inclusive)")
+    for name in DIMENSIONS:
+        parser.add_argument(f"--{name}", action="append", metavar="NAME",
+                            help=f"Only entries with this {name} (repeatable)")
+    parser.add_argument("--group-by", default="", metavar="KEYS",
+                        help=f"Comma-separated: {', '.join(TIME_GROUPS + DIMENSIONS)}")
+    parser.add_argument("--metric", choices=METRICS, default="hours")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    parser.add_argument("--stats", action="store_true", help="Print archive size and partitions, then exit")
+    args = parser.parse_args(argv)
+
+    archive = Archive.from_config(load_config(), os.path.dirname(config_path()))
+    if archive is None:
+        print("The archive is disabled (ARCHIVE is false in config.json)")
+        return
+    if args.stats:
+        for key, value in archive.stats().items():
+            print(f"{key:<13} {value}")
+        return
+
+    group_by = [name.strip() for name in args.group_by.split(",") if name.strip()]
+    where = {name: getattr(args, name) for name in DIMENSIONS if getattr(args, name)}
+    t0 = time.perf_counter()
+    try:
+        result = archive.query(args.since, args.until, where, group_by, args.metric)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - t0
+
+    if args.json:
+        print(json.dumps([{**dict(zip(group_by, key)), args.metric: value} for key, value in result],
+                         ensure_ascii=False, indent=2))
+        return
+    if not result:
+        print("No matching entries.")
+        return
+    fmt = (lambda v: f"{v:10.2f}") if args.metric == "hours" else (lambda v: f"{int(v):10d}")
+    widths = [max(len(name), *(len(str(key[i])) for key, _ in result)) for i, name in enumerate(group_by)]
+    print("  ".join(f"{name:<{w}}" for name, w in zip(group_by, widths)) + f"  {args.metric:>10}")
+    for key, value in result:
+        print("  ".join(f"{k or '—':<{w}}" for k, w in zip(key, widths)) + f"  {fmt(value)}")
+    if group_by and "tag" not in group_by:
+        print("  ".join(" " * w for w in widths) + f"  {fmt(sum(v for _, v in result))}")
+    print(f"\n{len(result)} groups in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,689 @@
+"""Synthetic-workload benchmarks for sync, summarize and analyze
+
+Runs sync.sync(), CalendarSummarizer.generate_summary and
+ReportAnalyzer.generate_analysis against local stand-ins: a fake Toggl API,
+a synthetic osascript executor and a fake OpenAI-compatible LLM server, then
+polls the local API (api_server) from concurrent clients and reads a
+synthetic .ics calendar through IcsDataSource.
+Each workload size runs in a fresh process so peak RSS is per size.
+
+    python benchmark.py --sizes 10,1000,100000 --repeat 3
+    python benchmark.py --compare bench_results/<earlier>.json
+    python benchmark.py --startup 150
+    python benchmark.py --import 100000 --page-size 50
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+
+PROJECTS = {"1001": "Work", "1002": "Growth", "1003": "Personal", "1004": "Hobbies", "1005": "Relationships"}
+ACTIVITIES = ["LeetCode", "Deep work", "Email", "Reading", "Gym", "Meeting", "Paper review", "Course"]
+REMINDER_LISTS = ["Work", "Hobbies", "Relationships", "Growth", "Personal"]
+REPORT_TAGS = {1: "focus", 2: "admin", 3: "study"}
+
+
+# ---------------------------------------------------------------- generators
+
+def generate_toggl_entries(count: int, days: int = 3, seed: int = 0) -> List[dict]:
+    """Toggl /me/time_entries records spread over the last ``days`` days"""
+    rng = random.Random(seed)
+    start_of_range = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    span = days * 24 * 3600
+    entries = []
+    for i in range(count):
+        start = start_of_range + timedelta(seconds=rng.randrange(span))
+        duration = rng.randrange(5, 120) * 60
+        entries.append({
+            "id": 10_000_000 + i,
+            "description": rng.choice(ACTIVITIES),
+            "project_id": int(rng.choice(list(PROJECTS))),
+            "start": start.astimezone().isoformat(),
+            "stop": (start + timedelta(seconds=duration)).astimezone().isoformat(),
+            "duration": duration,
+            "tags": rng.sample(["focus", "admin", "study"], rng.randrange(0, 3)),
+        })
+    return entries
+
+
+def report_row(index: int, origin: datetime, spacing: int, seed: int = 0) -> dict:
+    """Row ``index`` of a Toggl detailed report (ungrouped: one time entry per row)
+
+    Rows are derived from their index, so a fake server can serve any page of
+    a huge report without holding it in memory.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    start = origin + timedelta(seconds=index * spacing)
+    duration = rng.randrange(5, 120) * 60
+    return {
+        "user_id": 1,
+        "username": "bench",
+        "project_id": int(rng.choice(list(PROJECTS))),
+        "task_id": None,
+        "billable": False,
+        "description": rng.choice(ACTIVITIES),
+        "tag_ids": rng.sample(list(REPORT_TAGS), rng.randrange(0, 3)),
+        "time_entries": [{
+            "id": 20_000_000 + index,
+            "seconds": duration,
+            "start": start.astimezone().isoformat(),
+            "stop": (start + timedelta(seconds=duration)).astimezone().isoformat(),
+            "at": start.astimezone().isoformat(),
+        }],
+    }
+
+
+def generate_calendar_rows(count: int, day: datetime, seed: int = 0) -> str:
+    """Output of the calendar AppleScript: planned and Toggl events"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        start = rng.randrange(6 * 60, 22 * 60)
+        end = min(start + rng.randrange(10, 120), 23 * 60 + 59)
+        toggl = rng.random() < 0.7
+        description = f"Imported from Toggl - ID: {i:08x}" if toggl else ""
+        rows.append(
+            f"{day.strftime('%Y-%m-%d')}|{start // 60:02d}:{start % 60:02d}:00|{end // 60:02d}:{end % 60:02d}:00|"
+            f"{rng.choice(ACTIVITIES)}|{rng.choice(list(PROJECTS.values()))}|{description}"
+        )
+    return "\n".join(rows) + "\n"
+
+
+def generate_reminder_rows(count: int, list_name: str, day: datetime, seed: int = 0) -> str:
+    """Output of the reminders AppleScript for one list"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        due = day - timedelta(days=rng.randrange(0, 5))
+        status = "Completed" if due.date() == day.date() and rng.random() < 0.5 else "Overdue"
+        rows.append(
+            f"{due.strftime('%Y-%m-%d')}|{due.strftime('%A, %B %d, %Y')} 00:00:00|Task {i}|{list_name}|"
+            f"{status}|{rng.choice(['0', '1', '5', '9'])}|"
+        )
+    return "\n" + "\n".join(rows)
+
+
+# ---------------------------------------------------------------- stand-ins
+
+def make_synthetic_executor(events: int, reminders: int, latency: float = 0.0):
+    from summarize_calendar import AppleScriptExecutor
+
+    class SyntheticExecutor(AppleScriptExecutor):
+        """Answers each kind of script the project sends with synthetic output"""
+
+        def __init__(self):
+            self.day = datetime.now()
+            self.calendar_output = generate_calendar_rows(events, self.day)
+            per_list = max(1, reminders // len(REMINDER_LISTS))
+            self.reminder_output = {
+                name: generate_reminder_rows(per_list, name, self.day, seed=i)
+                for i, name in enumerate(REMINDER_LISTS)
+            }
+            self.call_latencies: List[float] = []
+            self._lock = threading.Lock()
+
+        def _run(self, script: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+            t0 = time.perf_counter()
+            if latency:
+                time.sleep(latency)
+            if "whose summary is" in script:
+                result = (True, "NOT_EXISTS\n")
+            elif "whose description contains (sourceId" in script:
+                result = (True, "NOT_FOUND\n")
+            elif "make new event" in script:
+                result = (True, "Success: Created event\n")
+            elif "name of every calendar" in script:
+                result = (True, "".join(f"{name}\n" for name in sorted(set(PROJECTS.values()))))
+            elif "display notification" in script:
+                result = (True, "")
+            elif 'tell application "Reminders"' in script:
+                name = next((n for n in REMINDER_LISTS if f'{{"{n}"}}' in script), None)
+                result = (True, self.reminder_output.get(name, ""))
+            elif "every event of theCal" in script:
+                result = (True, self.calendar_output)
+            else:
+                result = (True, "")
+            with self._lock:
+                self.call_latencies.append(time.perf_counter() - t0)
+            return result
+
+    return SyntheticExecutor()
+
+
+def start_server(handler_cls) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def fake_toggl_handler(entries: List[dict]):
+    body = json.dumps(entries).encode("utf-8")
+    projects = json.dumps([{"id": int(pid), "name": name, "active": True} for pid, name in PROJECTS.items()]).encode("utf-8")
+    projects_etag = '"bench-projects"'
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if "/projects" in self.path:
+                if self.headers.get("If-None-Match") == projects_etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(projects)))
+                self.send_header("ETag", projects_etag)
+                self.end_headers()
+                self.wfile.write(projects)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def fake_reports_handler(count: int, origin: datetime, spacing: int, max_page_size: int = 50):
+    """Toggl Reports API detailed search with cursor pagination, plus /tags and /projects
+
+    Row ``i`` starts at ``origin + i * spacing``; a request gets the rows
+    starting within its date range, ``page_size`` at a time, with
+    ``X-Next-ID`` / ``X-Next-Row-Number`` pointing at the next page.
+    """
+    projects = json.dumps([{"id": int(pid), "name": name, "active": True} for pid, name in PROJECTS.items()]).encode("utf-8")
+    tags = json.dumps([{"id": tag_id, "name": name} for tag_id, name in REPORT_TAGS.items()]).encode("utf-8")
+
+    def index_range(start_date: str, end_date: str) -> Tuple[int, int]:
+        lo = (datetime.fromisoformat(start_date) - origin).total_seconds()
+        hi = (datetime.fromisoformat(end_date) + timedelta(days=1) - origin).total_seconds()
+        return max(0, math.ceil(lo / spacing)), min(count, max(0, math.ceil(hi / spacing)))
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._send(tags if "/tags" in self.path else projects)
+
+        def do_POST(self):
+            query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            first, last = index_range(query["start_date"], query["end_date"])
+            begin = first + query.get("first_row_number", 1) - 1
+            end = min(last, begin + min(query.get("page_size", 50), max_page_size))
+            rows = []
+            for i in range(begin, end):
+                row = report_row(i, origin, spacing)
+                row["row_number"] = i - first + 1
+                rows.append(row)
+            headers = {}
+            if end < last:
+                headers = {"X-Next-ID": str(20_000_000 + end), "X-Next-Row-Number": str(end - first + 1)}
+            self._send(json.dumps(rows).encode("utf-8"), headers)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def fake_llm_handler(latency: float):
+    completion = "### 4️⃣ Tactical Recommendations (Next Day)\n1. Keep going.\n"
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            body = json.dumps({
+                "choices": [{"message": {"content": completion}}],
+                "usage": {"prompt_tokens": len(payload["messages"][0]["content"]) // 4, "completion_tokens": 20},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# ---------------------------------------------------------------- runner
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _stats(samples: List[float], items: int) -> Dict[str, float]:
+    return {
+        "p50_s": round(percentile(samples, 50), 6),
+        "p95_s": round(percentile(samples, 95), 6),
+        "throughput_per_s": round(items / statistics.mean(samples), 2) if statistics.mean(samples) else None,
+    }
+
+
+def run_size(size: int, repeat: int, osascript_latency: float, llm_latency: float) -> Dict:
+    """Benchmark one workload size; meant to run in a fresh process"""
+    entries = generate_toggl_entries(size)
+    toggl_server, toggl_url = start_server(fake_toggl_handler(entries))
+    llm_server, llm_url = start_server(fake_llm_handler(llm_latency))
+
+    workdir = tempfile.mkdtemp(prefix="toggl-bench-")
+    config_path = os.path.join(workdir, "config.json")
+    with open(config_path, "w") as f:
+        json.dump({
+            "TOGGL_API_TOKEN": "bench",
+            "TOGGL_WORKSPACE_ID": "1",
+            "TOGGL_API_URL": toggl_url,
+            "TOGGL_REQUESTS_PER_MINUTE": 0,  # local fake server: measure the sync, not the throttle
+            "AGENT_API_KEY": "bench",
+            "AGENT_URL": llm_url,
+            "BUDGETS": ["Work <= 7h/day", "project:Growth >= 5h/week"],
+        }, f)
+    os.environ["TOGGL_CALENDAR_CONFIG"] = config_path
+
+    import budgets
+    import sync
+    from summarize_calendar import CalendarSummarizer
+    from ai_summary import ReportAnalyzer
+
+    executor = make_synthetic_executor(events=size, reminders=max(5, size // 10), latency=osascript_latency)
+    summarizer = CalendarSummarizer(executor=executor)
+    analyzer = ReportAnalyzer(config_path)
+    day = datetime.now().strftime("%Y-%m-%d")
+
+    wal_path = os.path.join(workdir, ".sync_wal.jsonl")
+    timings = {"sync": [], "resync": [], "budgets": [], "summarize": [], "analyze": []}
+    summary = ""
+    for _ in range(repeat):
+        # a fresh write-ahead log so "sync" measures the full check-and-create path;
+        # "resync" then reruns against the log the first run left behind
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(wal_path)
+        sync._accounts = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            sync.sync(executor)
+            t1 = time.perf_counter()
+            sync.sync(executor)
+            t2 = time.perf_counter()
+            # the fake API ignores `since`, so every check sees all entries again
+            budgets.main(["--check"])
+            t3 = time.perf_counter()
+            summary = summarizer.generate_summary(day)
+            t4 = time.perf_counter()
+            analyzer.generate_analysis(summary)
+            t5 = time.perf_counter()
+        timings["sync"].append(t1 - t0)
+        timings["resync"].append(t2 - t1)
+        timings["budgets"].append(t3 - t2)
+        timings["summarize"].append(t4 - t3)
+        timings["analyze"].append(t5 - t4)
+
+    toggl_server.shutdown()
+    llm_server.shutdown()
+    api_latencies = poll_api(summarizer)
+    ics_index, ics_latencies = time_ics(size, workdir)
+
+    return {
+        "size": size,
+        "repeat": repeat,
+        "stages": {
+            "sync": _stats(timings["sync"], size),
+            "resync": _stats(timings["resync"], size),
+            "budgets": _stats(timings["budgets"], size),
+            "summarize": _stats(timings["summarize"], size),
+            "analyze": _stats(timings["analyze"], 1),
+            "api": _stats(api_latencies, 1),
+            "ics_index": _stats([ics_index], size),
+            "ics_query": _stats(ics_latencies, 1),
+        },
+        "osascript_call_p50_s": round(percentile(executor.call_latencies, 50), 6),
+        "osascript_call_p95_s": round(percentile(executor.call_latencies, 95), 6),
+        "osascript_calls": len(executor.call_latencies),
+        "summary_chars": len(summary),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def poll_api(summarizer, clients: int = 8, requests_per_client: int = 50) -> List[float]:
+    """Per-request latency of the local API under concurrent keep-alive polling
+
+    Every other request revalidates with the ETag it was given, like a
+    dashboard would.
+    """
+    import http.client
+    from api_server import SummaryService, make_handler
+
+    service = SummaryService(summarizer, {})
+    with contextlib.redirect_stdout(io.StringIO()):
+        service.refresh()
+    server, _ = start_server(make_handler(service))
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(n: int):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        etags: Dict[str, str] = {}
+        mine = []
+        for i in range(requests_per_client):
+            path = ("/summary", "/totals", "/metrics", "/reminders")[(n + i) % 4]
+            headers = {"If-None-Match": etags[path]} if i % 2 and path in etags else {}
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - t0)
+            etags[path] = response.getheader("ETag") or etags.get(path, "")
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown()
+    return latencies
+
+
+def time_ics(count: int, workdir: str, days: int = 365, queries: int = 20) -> Tuple[float, List[float]]:
+    """IcsDataSource over ``count`` events spread across ``days`` days, plus a few recurring series
+
+    Returns the first read (which builds the offset index) and the latency
+    of single-day reads after it.
+    """
+    from summarize_calendar import IcsDataSource
+
+    rng = random.Random(0)
+    origin = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "X-WR-CALNAME:Bench"]
+    for i in range(count):
+        start = origin + timedelta(minutes=rng.randrange(days * 24 * 60))
+        end = start + timedelta(minutes=rng.randrange(5, 120))
+        toggl = f"Imported from Toggl - ID: {i:08x}" if rng.random() < 0.7 else ""
+        lines += ["BEGIN:VEVENT", f"UID:{i}@bench", f"DTSTART:{start:%Y%m%dT%H%M%S}", f"DTEND:{end:%Y%m%dT%H%M%S}",
+                  f"SUMMARY:{rng.choice(ACTIVITIES)}", f"DESCRIPTION:{toggl}",
+                  f"CATEGORIES:{rng.choice(list(PROJECTS.values()))}", "END:VEVENT"]
+    rules = ("FREQ=DAILY", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR", "FREQ=WEEKLY;INTERVAL=2;BYDAY=TU", "FREQ=MONTHLY;BYDAY=-1FR")
+    for i in range(max(1, count // 500)):  # recurring planned events, expanded per query
+        start = origin + timedelta(hours=rng.randrange(8, 18))
+        excluded = start + timedelta(days=rng.randrange(days))
+        lines += ["BEGIN:VEVENT", f"UID:series-{i}@bench", f"DTSTART:{start:%Y%m%dT%H%M%S}",
+                  f"DTEND:{start + timedelta(minutes=30):%Y%m%dT%H%M%S}", f"RRULE:{rules[i % len(rules)]}",
+                  f"EXDATE:{excluded:%Y%m%dT%H%M%S}", f"SUMMARY:{rng.choice(ACTIVITIES)}",
+                  f"CATEGORIES:{rng.choice(list(PROJECTS.values()))}", "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    path = os.path.join(workdir, "bench.ics")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("\r\n".join(lines) + "\r\n")
+
+    source = IcsDataSource([path], os.path.join(workdir, ".ics_index"))
+    day = origin + timedelta(days=days // 2)
+    t0 = time.perf_counter()
+    source.get_data(day, day)
+    index_seconds = time.perf_counter() - t0
+    latencies = []
+    for _ in range(queries):
+        day = origin + timedelta(days=rng.randrange(days))
+        t0 = time.perf_counter()
+        source.get_data(day, day)
+        latencies.append(time.perf_counter() - t0)
+    return index_seconds, latencies
+
+
+def run_import(count: int, page_size: int, years: int = 3) -> Dict:
+    """Bulk import of ``count`` report rows over ``years``; meant to run in a fresh process
+
+    ``parse`` only streams and normalizes the pages (its allocation peak is
+    measured in a second, traced pass); ``import`` runs the full sync into
+    the synthetic executor and ``reimport`` repeats it against the log. The
+    ``query`` stages aggregate the archive the import filled.
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    origin = today - timedelta(days=365 * years)
+    spacing = max(1, int((today - origin).total_seconds()) // count)
+    server, url = start_server(fake_reports_handler(count, origin, spacing, page_size))
+
+    workdir = tempfile.mkdtemp(prefix="toggl-bench-import-")
+    config_path = os.path.join(workdir, "config.json")
+    cfg = {
+        "TOGGL_API_TOKEN": "bench",
+        "TOGGL_WORKSPACE_ID": "1",
+        "TOGGL_API_URL": url,
+        "TOGGL_REPORTS_URL": url,
+        "TOGGL_REPORTS_PAGE_SIZE": page_size,
+        "TOGGL_REQUESTS_PER_MINUTE": 0,
+        "SYNC_LOG_RETENTION_DAYS": 365 * years + 1,
+    }
+    with open(config_path, "w") as f:
+        json.dump(cfg, f)
+    os.environ["TOGGL_CALENDAR_CONFIG"] = config_path
+
+    import sync
+    from toggl_reports import iter_report_entries
+
+    since, until = origin.date(), today.date()
+    t0 = time.perf_counter()
+    parsed = sum(1 for _ in iter_report_entries(cfg, since, until))
+    parse_s = time.perf_counter() - t0
+    tracemalloc.start()
+    for _ in iter_report_entries(cfg, since, until):
+        pass
+    _, parse_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    executor = make_synthetic_executor(events=10, reminders=5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        t1 = time.perf_counter()
+        first = sync.sync(executor, since=since, until=until)
+        t2 = time.perf_counter()
+        second = sync.sync(executor, since=since, until=until)
+        t3 = time.perf_counter()
+    server.shutdown()
+
+    # aggregates over the whole archive the import filled, from a cold process-level cache
+    archive = sync.get_archive()
+    archive._cache.clear()
+    query_times = []
+    for _ in range(5):
+        t4 = time.perf_counter()
+        weekly = archive.query(since, until, group_by=("week", "project"))
+        query_times.append(time.perf_counter() - t4)
+    t5 = time.perf_counter()
+    archive.query(since, until, where={"project": ["Growth"], "tag": ["focus"]}, group_by=("month",))
+    filtered_s = time.perf_counter() - t5
+
+    return {
+        "size": count,
+        "page_size": page_size,
+        "parsed": parsed,
+        "stages": {
+            "parse": _stats([parse_s], parsed),
+            "import": _stats([t2 - t1], count),
+            "reimport": _stats([t3 - t2], count),
+            "query_cold": _stats(query_times[:1], count),
+            "query_warm": _stats(query_times[1:], count),
+            "query_filtered": _stats([filtered_s], count),
+        },
+        "weekly_groups": len(weekly),
+        "parse_peak_traced_mb": round(parse_peak / (1024 * 1024), 2),
+        "created": first["created"],
+        "reimport_duplicates": second["duplicates"],
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _run_size_star(args):
+    return run_size(*args)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base_by_size = {r["size"]: r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit')}):")
+    for result in current["results"]:
+        base = base_by_size.get(result["size"])
+        if not base:
+            continue
+        for stage, stats in result["stages"].items():
+            if stage not in base["stages"]:
+                continue
+            before = base["stages"][stage]["p50_s"]
+            change = (stats["p50_s"] - before) / before * 100 if before else 0.0
+            print(f"  size {result['size']:>7} {stage:<10} p50 {before:.4f}s → {stats['p50_s']:.4f}s ({change:+.1f}%)")
+
+
+# ------------------------------------------------------------------- startup
+
+# Modules that must stay out of the import path of every CLI command
+HEAVY_MODULES = ("requests", "deprecated", "urllib3")
+
+
+def import_profile(module: str) -> Tuple[float, List[str]]:
+    """Import ``module`` in a fresh interpreter; (total import ms, imported module names)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import cli, {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    total_us, names = 0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        names.append(name.strip())
+        if not name[1:].startswith(" "):  # top-level imports only; nested ones are included in these
+            total_us += int(cumulative)
+    return total_us / 1000, names
+
+
+def check_startup(budget_ms: float, repeat: int = 5) -> bool:
+    """Report import time and `--help` wall time per command; False when over budget"""
+    import cli
+
+    ok = True
+    for command, (module, _) in cli.COMMANDS.items():
+        profiles = [import_profile(module) for _ in range(repeat)]
+        import_ms = min(ms for ms, _ in profiles)
+        heavy = sorted({n for n in profiles[0][1] if n.split(".")[0] in HEAVY_MODULES})
+        walls = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "cli.py", command, "--help"], cwd=HERE,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            walls.append((time.perf_counter() - t0) * 1000)
+        over = import_ms > budget_ms
+        ok = ok and not over and not heavy
+        status = "FAIL" if over or heavy else "ok"
+        extra = f"  eager: {', '.join(heavy)}" if heavy else ""
+        print(f"{command:<10} import {import_ms:6.1f} ms  --help {min(walls):6.1f} ms  [{status}]{extra}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync, summarize and analyze on synthetic workloads")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated event counts (e.g. 10,1000,100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size")
+    parser.add_argument("--osascript-latency", type=float, default=0.0, help="Simulated seconds per osascript call")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM request")
+    parser.add_argument("--output", help="Result file (default bench_results/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare p50 latencies against")
+    parser.add_argument("--import", dest="import_count", type=int, metavar="COUNT",
+                        help="Only benchmark a Reports API bulk import of COUNT entries")
+    parser.add_argument("--page-size", type=int, default=50, help="Report page size for --import")
+    parser.add_argument("--startup", type=float, metavar="BUDGET_MS",
+                        help="Only check CLI startup: fail if a command's imports take longer than BUDGET_MS")
+    args = parser.parse_args()
+
+    if args.startup is not None:
+        sys.exit(0 if check_startup(args.startup) else 1)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    if args.import_count:
+        sizes = []
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_import, (args.import_count, args.page_size))
+        results.append(result)
+        stages = "  ".join(f"{name} {s['p50_s']:.2f}s ({s['throughput_per_s']}/s)" for name, s in result["stages"].items())
+        print(f"import {result['parsed']} entries: {stages}  created {result['created']}  "
+              f"parse peak {result['parse_peak_traced_mb']} MB traced  peak RSS {result['peak_rss_mb']} MB")
+    for size in sizes:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(_run_size_star, ((size, args.repeat, args.osascript_latency, args.llm_latency),))
+        results.append(result)
+        stages = "  ".join(
+            f"{name} p50 {s['p50_s']:.4f}s p95 {s['p95_s']:.4f}s ({s['throughput_per_s']}/s)"
+            for name, s in result["stages"].items()
+        )
+        print(f"size {size:>7}: {stages}  peak RSS {result['peak_rss_mb']} MB")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "params": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
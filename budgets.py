@@ -0,0 +1,320 @@
+"""Rolling daily and weekly time budgets with threshold notifications
+
+    python cli.py budgets            # today's and this week's totals against each budget
+    python cli.py budgets --check    # fetch entries changed since the last check, then notify
+
+Budgets come from ``BUDGETS`` in config.json, either as text or as objects::
+
+    "BUDGETS": [
+        "Work <= 7h/day",
+        "Growth >= 5h/week",
+        {"project": "Hobbies", "max_hours": 10, "period": "week"}
+    ]
+
+Text budgets name a calendar (after routing rules); prefix the name with
+``project:`` to budget a Toggl project instead. ``<=`` / ``≤`` is a limit,
+notified once when the period's total goes over it; ``>=`` / ``≥`` is a
+goal, notified once when it is reached.
+
+Totals are kept per budget and period and updated by the difference each
+new or changed entry makes, so an entry costs a dict lookup per matching
+budget however many entries the period holds. Every sync feeds its entries
+in; ``--check`` asks Toggl only for entries changed since the previous
+check (deletions included), which makes it cheap enough for a
+``SCHEDULE`` job every few minutes.
+"""
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+BUDGET_RE = re.compile(r"^\s*(?P<target>.+?)\s*(?P<op><=|>=|≤|≥)\s*(?P<hours>\d+(?:\.\d+)?)\s*h\s*/\s*(?P<period>day|week)\s*$")
+PERIODS = ("day", "week")
+# Entries older than this are forgotten; it has to cover a whole week
+DEFAULT_RETENTION_DAYS = 14
+# --check asks for entries changed a little before the previous check
+POLL_OVERLAP_SECONDS = 60
+
+# entry id → (local start day ordinal, calendar, project, seconds)
+Contribution = Tuple[int, Optional[str], Optional[str], int]
+
+
+@dataclass(frozen=True)
+class Budget:
+    name: str
+    field: str  # "calendar" or "project"
+    target: str
+    period: str  # "day" or "week"
+    seconds: int
+    is_limit: bool  # True: at most `seconds`; False: a goal of at least `seconds`
+
+    @classmethod
+    def parse(cls, spec) -> "Budget":
+        """A budget from ``"Work <= 7h/day"`` or ``{"calendar": "Work", "max_hours": 7, "period": "day"}``"""
+        if isinstance(spec, str):
+            match = BUDGET_RE.match(spec)
+            if not match:
+                raise ValueError(f"Invalid budget {spec!r}, expected e.g. 'Work <= 7h/day'")
+            target = match["target"]
+            field = "project" if target.startswith("project:") else "calendar"
+            target = target.removeprefix("project:").strip()
+            return cls(spec.strip(), field, target, match["period"], round(float(match["hours"]) * 3600),
+                       match["op"] in ("<=", "≤"))
+
+        field = "project" if "project" in spec else "calendar"
+        if field not in spec:
+            raise ValueError(f"Budget needs a calendar or project: {spec}")
+        if ("max_hours" in spec) == ("min_hours" in spec):
+            raise ValueError(f"Budget needs exactly one of max_hours and min_hours: {spec}")
+        period = spec.get("period", "day")
+        if period not in PERIODS:
+            raise ValueError(f"Budget period must be day or week: {spec}")
+        is_limit = "max_hours" in spec
+        hours = float(spec["max_hours" if is_limit else "min_hours"])
+        name = spec.get("name") or f"{spec[field]} {'<=' if is_limit else '>='} {hours:g}h/{period}"
+        return cls(name, field, spec[field], period, round(hours * 3600), is_limit)
+
+    def period_start(self, day: int) -> int:
+        """Ordinal of the first day of the period containing ``day``"""
+        return day - date.fromordinal(day).weekday() if self.period == "week" else day
+
+
+def entry_seconds(entry: Dict[str, Any], now: float) -> int:
+    """Tracked seconds of an entry; a running entry counts up to ``now``"""
+    duration = entry.get("duration") or 0
+    if duration < 0:  # running: Toggl reports -start as a unix timestamp
+        return max(0, int(now + duration))
+    return int(duration)
+
+
+class BudgetTracker:
+    """Per-period totals for each budget, updated incrementally and persisted as JSON
+
+    ``observe`` replaces an entry's previous contribution with its new one
+    and returns the notifications for thresholds that were crossed in the
+    current day or week. Each threshold is notified at most once per period.
+    """
+
+    def __init__(self, budgets: List[Budget], path: str, retention_days: int = DEFAULT_RETENTION_DAYS):
+        self.budgets = budgets
+        self.path = path
+        self.retention_days = max(8, retention_days)
+        self.entries: Dict[str, Contribution] = {}
+        self.totals: Dict[Tuple[int, int], int] = {}  # (budget index, period start) → seconds
+        self.notified: set = set()  # (budget name, period start)
+        self.running: Dict[str, Tuple[float, Optional[str], Optional[str]]] = {}  # id → (start, calendar, project)
+        self.polled_at: Optional[float] = None
+        self._dirty = False
+        self._pruned_on: Optional[int] = None
+        self._index: Dict[Tuple[str, str], List[int]] = {}
+        for i, budget in enumerate(budgets):
+            self._index.setdefault((budget.field, budget.target), []).append(i)
+        self._load()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], config_dir: str) -> Optional["BudgetTracker"]:
+        """Tracker for ``BUDGETS``, or None when no budget is configured"""
+        specs = cfg.get("BUDGETS")
+        if not specs:
+            return None
+        path = cfg.get("BUDGET_STATE_PATH") or os.path.join(config_dir, ".budgets.json")
+        return cls([Budget.parse(spec) for spec in specs], path,
+                   cfg.get("BUDGET_RETENTION_DAYS", DEFAULT_RETENTION_DAYS))
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.polled_at = data.get("polled_at")
+        self.running = {entry_id: tuple(value) for entry_id, value in data.get("running", {}).items()}
+        names = {budget.name for budget in self.budgets}
+        self.notified = {(name, period) for name, period in data.get("notified", []) if name in names}
+        # totals are derived from the entries, so edited budgets apply to stored history
+        for entry_id, contribution in data.get("entries", {}).items():
+            contribution = tuple(contribution)
+            self.entries[entry_id] = contribution
+            self._apply(contribution, 1)
+
+    def save(self) -> None:
+        """Write the state if it changed; entries past the retention window are dropped first"""
+        self._prune(date.today().toordinal())
+        if not self._dirty:
+            return
+        data = {"polled_at": self.polled_at, "notified": sorted(self.notified), "running": self.running,
+                "entries": self.entries}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _prune(self, today: int) -> None:
+        if self._pruned_on == today:
+            return
+        self._pruned_on = today
+        cutoff = today - self.retention_days
+        for entry_id in [k for k, c in self.entries.items() if c[0] < cutoff]:
+            self._apply(self.entries.pop(entry_id), -1)
+            self._dirty = True
+        for key in [k for k, v in self.totals.items() if not v]:
+            del self.totals[key]
+        self.notified = {(name, period) for name, period in self.notified if period >= cutoff}
+
+    def _keys(self, contribution: Contribution):
+        day, calendar, project, _ = contribution
+        for field, value in (("calendar", calendar), ("project", project)):
+            for i in self._index.get((field, value), ()):
+                yield i, self.budgets[i].period_start(day)
+
+    def _apply(self, contribution: Contribution, sign: int) -> None:
+        for key in self._keys(contribution):
+            self.totals[key] = self.totals.get(key, 0) + sign * contribution[3]
+
+    def mark_polled(self, at: float) -> None:
+        self.polled_at = at
+        self._dirty = True
+
+    def observe(self, entry_id, start: Optional[datetime], seconds: int, calendar: Optional[str],
+                project: Optional[str], today: Optional[date] = None, running: bool = False) -> List[str]:
+        """Record an entry's current state (``start`` None removes it); returns notification texts
+
+        A ``running`` entry is remembered so ``advance`` can keep its total
+        growing while Toggl reports no change to it.
+        """
+        today = (today or date.today()).toordinal()
+        entry_id = str(entry_id)
+        if running and start is not None:
+            self.running[entry_id] = (start.timestamp(), calendar, project)
+        elif self.running.pop(entry_id, None):
+            self._dirty = True
+        new = None
+        if start is not None:
+            day = start.astimezone().date().toordinal()
+            if day >= today - self.retention_days:
+                new = (day, calendar, project, seconds)
+        old = self.entries.get(entry_id)
+        if old == new:
+            return []
+        keys = set(self._keys(old)) if old else set()
+        if new:
+            keys.update(self._keys(new))
+        before = {key: self.totals.get(key, 0) for key in keys}
+        if old:
+            self._apply(old, -1)
+            del self.entries[entry_id]
+        if new:
+            self._apply(new, 1)
+            self.entries[entry_id] = new
+        self._dirty = True
+
+        alerts = []
+        for i, period in keys:
+            budget = self.budgets[i]
+            if period != budget.period_start(today) or (budget.name, period) in self.notified:
+                continue
+            was, now = before[(i, period)], self.totals.get((i, period), 0)
+            if budget.is_limit and was <= budget.seconds < now:
+                alerts.append(f"Over budget: {budget.target} {format_hours(now)} {_period_label(budget)} "
+                              f"(limit {format_hours(budget.seconds)})")
+            elif not budget.is_limit and was < budget.seconds <= now:
+                alerts.append(f"Goal reached: {budget.target} {format_hours(now)} {_period_label(budget)} "
+                              f"(goal {format_hours(budget.seconds)})")
+            else:
+                continue
+            self.notified.add((budget.name, period))
+        return alerts
+
+    def advance(self, now: float, today: Optional[date] = None) -> List[str]:
+        """Count running entries up to ``now``; returns notification texts"""
+        alerts = []
+        for entry_id, (started, calendar, project) in list(self.running.items()):
+            alerts += self.observe(entry_id, datetime.fromtimestamp(started).astimezone(),
+                                   max(0, int(now - started)), calendar, project, today, running=True)
+        return alerts
+
+    def status(self, today: Optional[date] = None) -> List[Tuple[Budget, int]]:
+        """Each budget with its total for the current day or week"""
+        today = (today or date.today()).toordinal()
+        return [(budget, self.totals.get((i, budget.period_start(today)), 0))
+                for i, budget in enumerate(self.budgets)]
+
+
+def _period_label(budget: Budget) -> str:
+    return "today" if budget.period == "day" else "this week"
+
+
+def format_hours(seconds: int) -> str:
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+def fetch_changed_entries(account, since: Optional[float]) -> Optional[List[dict]]:
+    """Entries changed since the unix time ``since`` (deleted ones included), else this week's
+
+    Returns None when the request failed, so the poll time is not advanced.
+    """
+    import requests
+
+    from settings import DEFAULT_TOGGL_API_URL
+    from instrumentation import http_request
+
+    cfg = account.cfg
+    if since:
+        params = {"since": int(since) - POLL_OVERLAP_SECONDS}
+    else:
+        today = date.today()
+        params = {"start_date": (today - timedelta(days=today.weekday())).isoformat(),
+                  "end_date": (today + timedelta(days=1)).isoformat()}
+    account.limiter.acquire()
+    try:
+        response = http_request("GET", f"{cfg.get('TOGGL_API_URL', DEFAULT_TOGGL_API_URL)}/me/time_entries",
+                                params=params, auth=(cfg["TOGGL_API_TOKEN"], "api_token"))
+        response.raise_for_status()
+        return response.json() or []
+    except requests.exceptions.RequestException as e:
+        account.log(f"Error fetching data from Toggl: {e}")
+        return None
+
+
+def print_status(account) -> None:
+    for budget, seconds in account.budgets.status():
+        if budget.is_limit:
+            state = "over" if seconds > budget.seconds else f"{format_hours(budget.seconds - seconds)} left"
+        else:
+            state = "reached" if seconds >= budget.seconds else f"{format_hours(budget.seconds - seconds)} to go"
+        account.log(f"  {budget.name:<28} {format_hours(seconds):>8} {_period_label(budget):<9}  {state}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show time budgets, or check them against Toggl and notify")
+    parser.add_argument("--check", action="store_true",
+                        help="Fetch entries changed since the last check and notify on crossed thresholds")
+    args = parser.parse_args(argv)
+
+    import sync
+
+    accounts = [account for account in sync.get_accounts() if account.budgets is not None]
+    if not accounts:
+        print("No budgets configured; add BUDGETS to config.json")
+        return
+    for account in accounts:
+        if args.check:
+            polled_at = time.time()
+            entries = fetch_changed_entries(account, account.budgets.polled_at)
+            if entries is not None:
+                account.budgets.mark_polled(polled_at)
+            for alert in sync.track_budgets(account, entries or [], polled_at):
+                account.log(f"⏰ {alert}")
+                sync.send_macos_notification("Time budget", alert)
+        print_status(account)
+
+
+if __name__ == "__main__":
+    main()
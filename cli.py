@@ -0,0 +1,48 @@
+"""Single entry point: ``python cli.py <command> [options]``
+
+Only the chosen command's module is imported, so ``--help`` and cheap
+commands do not pay for requests, the LLM client or the AppleScript layer.
+"""
+import importlib
+import sys
+
+# command → (module with a main(argv) function, one-line help)
+COMMANDS = {
+    "sync": ("sync", "Sync recent Toggl entries to Apple Calendar"),
+    "projects": ("get_projects", "List active Toggl projects and their IDs"),
+    "summary": ("summarize_calendar", "Print the calendar and reminders summary"),
+    "wrap-up": ("wrap_up", "Generate the daily or weekly review"),
+    "scheduler": ("scheduler", "Run the configured jobs on a schedule (single instance)"),
+    "archive": ("archive", "Query the local archive of synced time entries"),
+    "serve": ("api_server", "Serve summaries, totals and metrics as local JSON endpoints"),
+    "budgets": ("budgets", "Show daily and weekly time budgets, or check them and notify"),
+    "journal": ("journal", "Search saved journals and show their history"),
+    "stats": ("llm_telemetry", "Summarize LLM latency, tokens and cost per report"),
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = ["usage: cli.py <command> [options]", "", "commands:"]
+    lines += [f"  {name:<{width}}  {help_text}" for name, (_, help_text) in COMMANDS.items()]
+    lines += ["", "Run `cli.py <command> --help` for the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n")
+        print(usage())
+        return 2
+    module = importlib.import_module(COMMANDS[command][0])
+    module.main(rest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import heapq
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def entry_key(entry: dict) -> Hashable:
+    """Entries are merged only when project and description match"""
+    return entry.get('project_id'), (entry.get('description') or '').strip()
+
+
+def coalesce_entries(entries: List[dict], max_gap_seconds: float) -> List[dict]:
+    """Merge runs of same-key entries separated by at most ``max_gap_seconds``
+
+    One pass over the entries sorted by start: each key keeps its open
+    group, and an entry either extends it (the gap to the group's stop is
+    small enough) or starts a new one. A group is closed once an entry with
+    another key starts in its gap, so A, B, A stays three events instead of
+    one A covering B; open groups sit in a heap by stop, so each entry only
+    pops the groups that ended before it. Toggl returns entries newest
+    first, which Timsort turns around in linear time.
+
+    A merged entry spans the first start to the last stop, carries the union
+    of the tags, keeps the first entry's ``id`` and lists every source id in
+    ``merged_ids`` and its ``[start, stop]`` in ``merged_spans``. Running
+    entries (no stop) and entries with unparsable times are passed through
+    unchanged.
+    """
+    if not max_gap_seconds or max_gap_seconds < 0:
+        return entries
+
+    timed = []
+    passthrough = []
+    for entry in entries:
+        start, stop = _parse(entry.get('start')), _parse(entry.get('stop'))
+        if start is None or stop is None:
+            passthrough.append(entry)
+        else:
+            timed.append((start, stop, entry))
+    timed.sort(key=lambda item: item[0])
+
+    groups: List[list] = []  # [start, stop, entries, stop as sent by Toggl]
+    open_groups: Dict[Hashable, list] = {}
+    stops: List[tuple] = []  # (stop, seq, key, group); stale once the group grew or closed
+    for seq, (start, stop, entry) in enumerate(timed):
+        key = entry_key(entry)
+        while stops and stops[0][0] <= start:
+            group_stop, _, other, group = heapq.heappop(stops)
+            if other != key and open_groups.get(other) is group and group[1] == group_stop:
+                del open_groups[other]  # this entry starts in its gap
+        group = open_groups.get(key)
+        if group is not None and (start - group[1]).total_seconds() <= max_gap_seconds:
+            if stop > group[1]:
+                group[1], group[3] = stop, entry['stop']
+            group[2].append(entry)
+        else:
+            group = [start, stop, [entry], entry['stop']]
+            groups.append(group)
+            open_groups[key] = group
+        heapq.heappush(stops, (group[1], seq, key, group))
+
+    coalesced = []
+    for start, stop, members, stop_value in groups:
+        if len(members) == 1:
+            coalesced.append(members[0])
+            continue
+        merged = dict(members[0])
+        tags = []
+        for member in members:
+            tags.extend(t for t in member.get('tags') or [] if t not in tags)
+        merged.update(
+            start=members[0]['start'],
+            stop=stop_value,
+            duration=int((stop - start).total_seconds()),
+            tags=tags,
+            merged_ids=[member.get('id') for member in members],
+            merged_spans=[[member['start'], member['stop']] for member in members],
+        )
+        coalesced.append(merged)
+    return coalesced + passthrough
+
+
+def batches(entries: Iterable[dict], size: int, max_gap_seconds: float = 0) -> Iterator[List[dict]]:
+    """Split a stream of entries ordered by start into lists of about ``size``
+
+    A batch is only cut where the next entry starts more than
+    ``max_gap_seconds`` after every entry so far has stopped, so coalescing
+    each batch on its own merges exactly what coalescing the whole stream
+    would, and merged event IDs stay stable between imports.
+    """
+    batch: List[dict] = []
+    last_stop = None
+    for entry in entries:
+        if len(batch) >= size:
+            start = _parse(entry.get('start'))
+            if start is None or last_stop is None or (start - last_stop).total_seconds() > max_gap_seconds:
+                yield batch
+                batch, last_stop = [], None
+        batch.append(entry)
+        stop = _parse(entry.get('stop'))
+        if stop is not None and (last_stop is None or stop > last_stop):
+            last_stop = stop
+    if batch:
+        yield batch
@@ -0,0 +1,58 @@
+import fcntl
+import os
+import time
+from typing import Optional
+
+
+class LockHeld(Exception):
+    """Another process holds the lock"""
+
+
+class FileLock:
+    """Advisory inter-process lock on a file (``flock``), released on exit or crash
+
+    The lock file records the holder's PID for diagnostics only; the kernel
+    drops the lock when the holding process dies, so there are no stale locks.
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None, poll: float = 0.2):
+        self.path = path
+        self.timeout = timeout  # None waits forever, 0 fails immediately
+        self.poll = poll
+        self._fd: Optional[int] = None
+
+    def holder(self) -> Optional[int]:
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockHeld(f"{self.path} is held by PID {self.holder()}")
+                time.sleep(self.poll)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
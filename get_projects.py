@@ -1,40 +1,36 @@
-import requests
-
-# Replace with your Toggl API token and workspace ID
-import json
 import os
 
-config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-with open(config_path) as f:
-    config = json.load(f)
-TOGGL_API_TOKEN = config["TOGGL_API_TOKEN"]
-WORKSPACE_ID = config["TOGGL_WORKSPACE_ID"]
-
-def get_projects(api_token, workspace_id):
-    url = f"https://api.track.toggl.com/api/v9/workspaces/{workspace_id}/projects?active=true"
-    
-    try:
-        response = requests.get(
-            url,
-            auth=(api_token, "api_token")
-        )
-        response.raise_for_status()
-        projects = response.json()
-        
-        if not projects:
-            print("No projects found.")
-            return
-        
-        print("Project Name --> Project ID")
-        print("=" * 40)
-        for proj in projects:
-            print(f"{proj.get('name')} --> {proj.get('id')}")
-    
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching projects: {e}")
+from project_cache import ProjectCache
+from settings import config_path, load_config
+
+def get_projects(cache: ProjectCache, refresh: bool = False):
+    """Print active projects from the local project cache, fetching it when empty"""
+    if refresh:
+        cache.refresh(full=True)
+    projects = [p for p in cache.all() if p.get("active", True)]
+
+    if not projects:
+        print("No projects found.")
+        return
+
+    print("Project Name --> Project ID")
+    print("=" * 40)
+    for proj in sorted(projects, key=lambda p: p.get("name") or ""):
+        print(f"{proj.get('name')} --> {proj.get('id')}")
+    print(f"\nCached in {cache.path}; sync resolves project names from it automatically.")
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="List active Toggl projects and their IDs")
+    parser.add_argument("--refresh", action="store_true", help="Refetch the full project list instead of using the cache")
+    args = parser.parse_args(argv)
+
+    # Toggl API token and workspace ID come from config.json
+    cache = ProjectCache.from_config(load_config(), os.path.dirname(config_path()))
+    get_projects(cache, refresh=args.refresh)
 
 if __name__ == "__main__":
-    get_projects(TOGGL_API_TOKEN, WORKSPACE_ID)
+    main()
 
 
 """
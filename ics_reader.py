@@ -0,0 +1,425 @@
+"""Range reads from iCalendar files through a memory map and an offset index
+
+The first read of a file scans it once for ``BEGIN:VEVENT`` blocks and
+records each block's start time, byte offset and length, sorted by start,
+in an index file under ``ICS_INDEX_DIR``. Later reads bisect that index for
+the requested range and parse only the blocks inside it, straight out of
+the memory-mapped file, so the cost of a query follows the number of events
+in the range rather than the size of the calendar.
+
+Recurring series (blocks with RRULE or RDATE) are kept out of the start
+index: their offsets are listed separately, each master is parsed once per
+index version, and its occurrences in a range come from ``recurrence``'s
+per-series cache. Detached occurrences (RECURRENCE-ID) are ordinary indexed
+events and are excluded from their master's expansion.
+
+The index records the file's size and mtime. When the file has only grown
+behind the last indexed event (as the ``ics`` sync sink appends), only the
+new tail is scanned; any other change rebuilds the index.
+"""
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from recurrence import CACHE, RecurrenceRule, Series
+
+MAGIC = b"TCI2"
+BEGIN = b"BEGIN:VEVENT"
+END = b"END:VEVENT"
+# Repeated properties whose values are all kept, comma-joined
+MULTI_VALUED = frozenset({"EXDATE", "RDATE"})
+# Events without an end are given this length when nothing else is known
+DEFAULT_DURATION = timedelta(0)
+
+
+class IcsEvent(NamedTuple):
+    start: datetime  # local, timezone-aware
+    end: datetime
+    all_day: bool
+    props: Dict[str, str]  # first value of each property, text unescaped
+    params: Dict[str, str]  # parameters of each property, e.g. "TZID=Europe/Paris"
+
+
+def unfold(text: str) -> str:
+    """Undo RFC 5545 line folding"""
+    return text.replace("\r\n ", "").replace("\r\n\t", "").replace("\n ", "").replace("\n\t", "")
+
+
+def unescape(value: str) -> str:
+    out, i = [], 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append("\n" if nxt in "nN" else nxt)
+            i += 2
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def split_property(line: str) -> Tuple[str, str, str]:
+    """(NAME, params, value) of a content line; params may quote ``:``"""
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            quoted = not quoted
+        elif ch == ":" and not quoted:
+            head, value = line[:i], line[i + 1:]
+            name, _, params = head.partition(";")
+            return name.upper(), params, value
+    return line.upper(), "", ""
+
+
+def parse_block(text: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Properties and their parameters of one VEVENT; nested components are skipped"""
+    props: Dict[str, str] = {}
+    params: Dict[str, str] = {}
+    depth = 0
+    for line in unfold(text).splitlines():
+        if not line:
+            continue
+        name, param, value = split_property(line)
+        if name == "BEGIN":
+            depth += 1
+            continue
+        if name == "END":
+            depth -= 1
+            continue
+        if depth != 1:  # VALARM and friends
+            continue
+        if name in props:  # repeated properties keep the first
+            if name in MULTI_VALUED:
+                props[name] += "," + value
+            continue
+        props[name] = value
+        params[name] = param
+    return props, params
+
+
+@lru_cache(maxsize=64)
+def _zone(tzid: str):
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(tzid.strip('"'))
+    except Exception:
+        return None  # e.g. Windows zone names: treated as local time
+
+
+def _param(params: str, key: str) -> Optional[str]:
+    for part in params.split(";"):
+        name, _, value = part.partition("=")
+        if name.upper() == key:
+            return value
+    return None
+
+
+def parse_wall(value: str, params: str = "") -> Tuple[datetime, Optional[tzinfo], bool]:
+    """Naive wall-clock time of a DATE or DATE-TIME value, its zone (None: floating) and whether it is a date"""
+    value = value.strip()
+    # sliced by hand: strptime dominated building the index
+    day = (int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    if len(value) == 8 or (_param(params, "VALUE") or "").upper() == "DATE":
+        return datetime(*day), None, True
+    if len(value) < 15 or value[8] != "T":
+        raise ValueError(f"Invalid date-time: {value}")
+    dt = datetime(*day, int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if value.endswith("Z"):
+        return dt, timezone.utc, False
+    tzid = _param(params, "TZID")
+    return dt, _zone(tzid) if tzid else None, False
+
+
+def parse_datetime(value: str, params: str = "") -> Tuple[datetime, bool]:
+    """Local aware datetime of a DATE or DATE-TIME value, and whether it is a date"""
+    dt, zone, is_date = parse_wall(value, params)
+    if zone is not None:
+        dt = dt.replace(tzinfo=zone)
+    return dt.astimezone(), is_date  # naive (floating) times are taken as local
+
+
+def parse_series(props: Dict[str, str], params: Dict[str, str]) -> Series:
+    """The recurrence of a master VEVENT: DTSTART, RRULE, RDATE and EXDATE"""
+    start, zone, all_day = parse_wall(props["DTSTART"], params["DTSTART"])
+    if "DTEND" in props:
+        end, end_zone, _ = parse_wall(props["DTEND"], params["DTEND"])
+        if end_zone is not None and end_zone is not zone:
+            end = (end.replace(tzinfo=end_zone).astimezone(zone) if zone else
+                   end.replace(tzinfo=end_zone).astimezone()).replace(tzinfo=None)
+        duration = end - start
+    elif "DURATION" in props:
+        duration = parse_duration(props["DURATION"])
+    else:
+        duration = timedelta(days=1) if all_day else DEFAULT_DURATION
+    series = Series(props.get("UID", ""), RecurrenceRule.parse(props["RRULE"]) if "RRULE" in props else None,
+                    start, duration, zone, all_day)
+
+    def walls(name: str) -> Tuple[datetime, ...]:
+        result = []
+        for value in props.get(name, "").split(","):
+            if value.strip():
+                wall, value_zone, _ = parse_wall(value.split("/")[0], params[name])  # RDATE periods: start only
+                if value_zone is not None and value_zone is not zone:
+                    wall = series.to_wall(wall.replace(tzinfo=value_zone))
+                result.append(wall)
+        return tuple(sorted(set(result)))
+
+    return replace(series, exdates=walls("EXDATE"), rdates=walls("RDATE"))
+
+
+def parse_duration(value: str) -> timedelta:
+    """An RFC 5545 DURATION such as ``PT1H30M`` or ``-P1D``"""
+    sign = -1 if value.startswith("-") else 1
+    number, total, in_time = "", timedelta(), False
+    units = {"W": timedelta(weeks=1), "D": timedelta(days=1), "H": timedelta(hours=1),
+             "M": timedelta(minutes=1), "S": timedelta(seconds=1)}
+    for ch in value.lstrip("+-"):
+        if ch.isdigit():
+            number += ch
+        elif ch == "T":
+            in_time = True
+        elif ch in units and number:
+            if ch == "M" and not in_time:
+                raise ValueError(f"Invalid duration: {value}")
+            total += int(number) * units[ch]
+            number = ""
+    return sign * total
+
+
+def _unescape_text(props: Dict[str, str]) -> None:
+    for name in ("SUMMARY", "DESCRIPTION", "CATEGORIES", "LOCATION"):
+        if name in props:
+            props[name] = unescape(props[name])
+
+
+def _block_start(mm, begin: int, end: int) -> Optional[int]:
+    """Epoch seconds of a block's DTSTART, read without decoding the block"""
+    pos = mm.find(b"\nDTSTART", begin, end)
+    if pos < 0:
+        return None
+    line_end = mm.find(b"\n", pos + 1, end)
+    line = mm[pos + 1:line_end if line_end >= 0 else end]
+    while line_end >= 0 and line_end + 1 < end and mm[line_end + 1] in b" \t":  # folded
+        nxt = mm.find(b"\n", line_end + 1, end)
+        line = line.rstrip(b"\r") + mm[line_end + 2:nxt if nxt >= 0 else end]
+        line_end = nxt
+    try:
+        _, params, value = split_property(line.decode("utf-8", "replace").rstrip("\r"))
+        return int(parse_datetime(value, params)[0].timestamp())
+    except ValueError:
+        return None
+
+
+def _crc(mm, length: int) -> int:
+    with memoryview(mm)[:length] as view:  # no copy of the mapped bytes
+        return zlib.crc32(view)
+
+
+class IcsFile:
+    """One ``.ics`` file with its offset index, loaded once and refreshed when the file changes"""
+
+    def __init__(self, path: str, index_dir: str):
+        self.path = path
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        self.index_path = os.path.join(index_dir, f"{os.path.basename(path)}.{digest}.idx")
+        self.starts = array("q")
+        self.offsets = array("q")
+        self.lengths = array("i")
+        self.meta: Dict = {}
+        self.calendar_name: Optional[str] = None
+        self.series_spans: List[Tuple[int, int]] = []  # recurring masters, kept out of the start index
+        self.override_spans: List[Tuple[int, int]] = []  # detached occurrences, also in the start index
+        self._series: Optional[List[Tuple[Series, Dict[str, str], Dict[str, str]]]] = None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # ------------------------------------------------------------ index
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            if data[:4] != MAGIC:
+                return
+            (header_len,) = struct.unpack_from("<I", data, 4)
+            meta = json.loads(data[8:8 + header_len])
+            pos, count = 8 + header_len, meta["count"]
+            columns = []
+            for typecode in ("q", "q", "i"):
+                column = array(typecode)
+                column.frombytes(data[pos:pos + count * column.itemsize])
+                pos += count * column.itemsize
+                columns.append(column)
+        except (OSError, ValueError, KeyError, struct.error):
+            return
+        self.starts, self.offsets, self.lengths = columns
+        self.meta = meta
+        self.calendar_name = meta.get("calendar_name")
+        self.series_spans = [tuple(span) for span in meta.get("series", [])]
+        self.override_spans = [tuple(span) for span in meta.get("overrides", [])]
+        self._series = None
+
+    def _save_index(self) -> None:
+        header = json.dumps({**self.meta, "count": len(self.starts), "calendar_name": self.calendar_name,
+                             "series": self.series_spans, "overrides": self.override_spans}).encode()
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header)) + header)
+            for column in (self.starts, self.offsets, self.lengths):
+                f.write(column.tobytes())
+        os.replace(tmp_path, self.index_path)
+
+    def _scan(self, mm, start: int) -> int:
+        """Index the VEVENT blocks from ``start``; returns the offset after the last complete one"""
+        found: List[Tuple[int, int, int]] = []
+        pos = scanned = start
+        while True:
+            begin = mm.find(BEGIN, pos)
+            if begin < 0:
+                break
+            end = mm.find(END, begin)
+            if end < 0:
+                break
+            end = mm.find(b"\n", end)
+            end = len(mm) if end < 0 else end + 1
+            if mm.find(b"\nRRULE", begin, end) >= 0 or mm.find(b"\nRDATE", begin, end) >= 0:
+                self.series_spans.append((begin, end - begin))
+                pos = scanned = end
+                continue
+            if mm.find(b"\nRECURRENCE-ID", begin, end) >= 0:
+                self.override_spans.append((begin, end - begin))
+            ts = _block_start(mm, begin, end)
+            if ts is not None:
+                found.append((ts, begin, end - begin))
+            pos = scanned = end
+        if start == 0:
+            first = mm.find(BEGIN)
+            head = mm.find(b"\nX-WR-CALNAME", 0, first if first >= 0 else len(mm))
+            if head >= 0:
+                line_end = mm.find(b"\n", head + 1)
+                _, _, value = split_property(mm[head + 1:line_end].decode("utf-8", "replace").rstrip("\r"))
+                self.calendar_name = unescape(value) or None
+        found.sort()
+        self._series = None
+        if self.starts and found and found[0][0] < self.starts[-1]:
+            found = sorted(list(zip(self.starts, self.offsets, self.lengths)) + found)
+            self.starts, self.offsets, self.lengths = array("q"), array("q"), array("i")
+        for ts, offset, length in found:
+            self.starts.append(ts)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+        return scanned
+
+    def _refresh(self, mm, st) -> None:
+        """Bring the index up to date with the file; called with the file mapped"""
+        if not self._loaded:
+            self._load_index()
+            self._loaded = True
+        meta = self.meta
+        if meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns:
+            return
+        scanned = meta.get("scanned_to", 0)
+        # appended behind the indexed events: the indexed prefix is unchanged
+        if meta and 0 < scanned <= st.st_size and _crc(mm, scanned) == meta.get("crc"):
+            scanned = self._scan(mm, scanned)
+        else:
+            self.starts, self.offsets, self.lengths = array("q"), array("q"), array("i")
+            self.calendar_name = None
+            self.series_spans, self.override_spans = [], []
+            scanned = self._scan(mm, 0)
+        self.meta = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "scanned_to": scanned,
+                     "crc": _crc(mm, scanned)}
+        try:
+            self._save_index()
+        except OSError as e:
+            print(f"Could not save the index of {self.path}: {e}")
+
+    def _load_series(self, mm) -> List[Tuple[Series, Dict[str, str], Dict[str, str]]]:
+        """Parsed recurring masters, their detached occurrences excluded; called with the lock held"""
+        if self._series is not None:
+            return self._series
+        detached: Dict[str, List[datetime]] = {}
+        for offset, length in self.override_spans:
+            props, params = parse_block(mm[offset:offset + length].decode("utf-8", "replace"))
+            try:
+                moment = parse_datetime(props["RECURRENCE-ID"], params["RECURRENCE-ID"])[0]
+            except (KeyError, ValueError):
+                continue
+            detached.setdefault(props.get("UID", ""), []).append(moment)
+        series = []
+        for offset, length in self.series_spans:
+            props, params = parse_block(mm[offset:offset + length].decode("utf-8", "replace"))
+            try:
+                master = parse_series(props, params)
+            except (KeyError, ValueError) as e:
+                print(f"Skipping unreadable recurring event in {self.path}: {e}")
+                continue
+            moved = detached.get(master.uid)
+            if moved:
+                master = replace(master, exdates=tuple(sorted(
+                    set(master.exdates) | {master.to_wall(m) for m in moved})))
+            _unescape_text(props)
+            series.append((master, props, params))
+        self._series = series
+        return series
+
+    # ------------------------------------------------------------ reads
+
+    def events(self, start: datetime, end: datetime) -> Iterator[IcsEvent]:
+        """Events starting in [start, end), recurring ones expanded, oldest first"""
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with self._lock:
+                    self._refresh(mm, st)
+                    lo = bisect_left(self.starts, int(start.timestamp()))
+                    hi = bisect_right(self.starts, int(end.timestamp()) - 1)
+                    spans = [(self.offsets[i], self.lengths[i]) for i in range(lo, hi)]
+                    series = self._load_series(mm)
+                occurrences = sorted(
+                    (IcsEvent(s, e, master.all_day, props, params)
+                     for master, props, params in series for s, e in CACHE.occurrences(master, start, end)),
+                    key=lambda event: event.start)
+                yield from heapq.merge(self._read_spans(mm, spans), occurrences, key=lambda event: event.start)
+
+    def _read_spans(self, mm, spans: List[Tuple[int, int]]) -> Iterator[IcsEvent]:
+        for offset, length in spans:
+            props, params = parse_block(mm[offset:offset + length].decode("utf-8", "replace"))
+            try:
+                event_start, all_day = parse_datetime(props["DTSTART"], params["DTSTART"])
+                if "DTEND" in props:
+                    event_end = parse_datetime(props["DTEND"], params["DTEND"])[0]
+                elif "DURATION" in props:
+                    event_end = event_start + parse_duration(props["DURATION"])
+                else:
+                    event_end = event_start + (timedelta(days=1) if all_day else DEFAULT_DURATION)
+            except (KeyError, ValueError) as e:
+                print(f"Skipping unreadable event in {self.path}: {e}")
+                continue
+            _unescape_text(props)
+            yield IcsEvent(event_start, event_end, all_day, props, params)
+
+    def __len__(self) -> int:
+        return len(self.starts) + len(self.series_spans)
+
+
+def day_range(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """Local [start of ``start_date``, start of the day after ``end_date``)"""
+    start = datetime.combine(start_date, datetime.min.time()).astimezone()
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()).astimezone()
+    return start, end
@@ -0,0 +1,250 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+METRIC_PREFIX = "toggl_calendar"
+TELL_APP_RE = re.compile(r'tell application "([^"]+)"')
+
+
+@dataclass
+class CallRecord:
+    """One external call: an osascript run or an HTTP request"""
+    kind: str
+    name: str
+    duration: float
+    payload_bytes: int
+    outcome: str
+    retries: int = 0
+    span: Optional[str] = None
+    ts: float = field(default_factory=time.time)
+
+
+@dataclass
+class SpanRecord:
+    """One timed stage, e.g. a pipeline stage or a whole sync run"""
+    name: str
+    duration: float
+    ok: bool = True
+    ts: float = field(default_factory=time.time)
+
+
+class Recorder:
+    """Process-wide, thread-safe store of call and span records"""
+
+    def __init__(self):
+        self.calls: List[CallRecord] = []
+        self.spans: List[SpanRecord] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, "spans"):
+            self._local.spans = []
+        return self._local.spans
+
+    @property
+    def current_span(self) -> Optional[str]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @property
+    def current_retries(self) -> int:
+        return getattr(self._local, "retries", 0)
+
+    def record_call(self, kind: str, name: str, duration: float, payload_bytes: int,
+                    outcome: str, retries: Optional[int] = None) -> None:
+        record = CallRecord(kind, name, duration, payload_bytes, outcome,
+                            self.current_retries if retries is None else retries, self.current_span)
+        with self._lock:
+            self.calls.append(record)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time a stage; calls made inside it (in this thread) are tagged with its name"""
+        stack = self._stack()
+        stack.append(name)
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            stack.pop()
+            with self._lock:
+                self.spans.append(SpanRecord(name, time.perf_counter() - t0, ok))
+
+    @contextmanager
+    def retry_attempt(self, attempt: int) -> Iterator[None]:
+        """Mark calls made inside as the given retry/failover attempt (0 = first try)"""
+        previous = self.current_retries
+        self._local.retries = attempt
+        try:
+            yield
+        finally:
+            self._local.retries = previous
+
+    def clear(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.spans.clear()
+
+    def write_jsonl(self, path: str) -> None:
+        """Append every call and span as one JSON object per line"""
+        with self._lock:
+            lines = [json.dumps({"type": "call", **asdict(c)}, ensure_ascii=False) for c in self.calls]
+            lines += [json.dumps({"type": "span", **asdict(s)}, ensure_ascii=False) for s in self.spans]
+        with open(path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+
+    def prometheus_text(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        counts: Dict[tuple, int] = {}
+        durations: Dict[tuple, List[float]] = {}
+        payload: Dict[tuple, int] = {}
+        retries: Dict[tuple, int] = {}
+        with self._lock:
+            for c in self.calls:
+                counts[(c.kind, c.name, c.outcome)] = counts.get((c.kind, c.name, c.outcome), 0) + 1
+                durations.setdefault((c.kind, c.name), []).append(c.duration)
+                payload[(c.kind, c.name)] = payload.get((c.kind, c.name), 0) + c.payload_bytes
+                retries[(c.kind, c.name)] = retries.get((c.kind, c.name), 0) + c.retries
+            spans = list(self.spans)
+
+        def labels(**kv) -> str:
+            return ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in kv.items())
+
+        p = METRIC_PREFIX
+        lines = [
+            f"# HELP {p}_external_calls_total External calls by kind, target and outcome.",
+            f"# TYPE {p}_external_calls_total counter",
+        ]
+        lines += [f"{p}_external_calls_total{{{labels(kind=k, name=n, outcome=o)}}} {v}"
+                  for (k, n, o), v in sorted(counts.items())]
+        lines += [
+            f"# HELP {p}_external_call_duration_seconds Time spent in external calls.",
+            f"# TYPE {p}_external_call_duration_seconds summary",
+        ]
+        for (k, n), samples in sorted(durations.items()):
+            ordered = sorted(samples)
+            for q in (0.5, 0.95):
+                value = ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+                lines.append(f"{p}_external_call_duration_seconds{{{labels(kind=k, name=n, quantile=q)}}} {value:.6f}")
+            lines.append(f"{p}_external_call_duration_seconds_sum{{{labels(kind=k, name=n)}}} {sum(samples):.6f}")
+            lines.append(f"{p}_external_call_duration_seconds_count{{{labels(kind=k, name=n)}}} {len(samples)}")
+        lines += [
+            f"# HELP {p}_external_payload_bytes_total Request plus response bytes of external calls.",
+            f"# TYPE {p}_external_payload_bytes_total counter",
+        ]
+        lines += [f"{p}_external_payload_bytes_total{{{labels(kind=k, name=n)}}} {v}" for (k, n), v in sorted(payload.items())]
+        lines += [
+            f"# HELP {p}_external_call_retries_total Retry or failover attempts of external calls.",
+            f"# TYPE {p}_external_call_retries_total counter",
+        ]
+        lines += [f"{p}_external_call_retries_total{{{labels(kind=k, name=n)}}} {v}" for (k, n), v in sorted(retries.items())]
+        lines += [
+            f"# HELP {p}_stage_duration_seconds Duration of the last run of each stage.",
+            f"# TYPE {p}_stage_duration_seconds gauge",
+        ]
+        last = {s.name: s for s in spans}
+        lines += [f"{p}_stage_duration_seconds{{{labels(stage=s.name, ok=str(s.ok).lower())}}} {s.duration:.6f}"
+                  for s in last.values()]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the textfile atomically so a collector never reads a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+RECORDER = Recorder()
+
+
+def applescript_target(script: str) -> str:
+    """The application an AppleScript talks to, for labelling its calls"""
+    match = TELL_APP_RE.search(script)
+    return match.group(1) if match else "osascript"
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """Process-wide requests.Session, so repeated calls reuse pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        import requests
+
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+    return _session
+
+
+def http_request(method: str, url: str, **kwargs):
+    """Session request with the call recorded; endpoints are labelled without query strings"""
+    import requests
+
+    name = f"{method.upper()} {url.split('?', 1)[0]}"
+    sent = len(json.dumps(kwargs["json"])) if "json" in kwargs else len(kwargs.get("data") or b"")
+    t0 = time.perf_counter()
+    try:
+        response = http_session().request(method, url, **kwargs)
+    except requests.exceptions.Timeout:
+        RECORDER.record_call("http", name, time.perf_counter() - t0, sent, "timeout")
+        raise
+    except requests.exceptions.RequestException:
+        RECORDER.record_call("http", name, time.perf_counter() - t0, sent, "error")
+        raise
+    if kwargs.get("stream"):
+        received = int(response.headers.get("Content-Length", 0) or 0)
+    else:
+        received = len(response.content)
+    outcome = "ok" if response.ok else f"http_{response.status_code}"
+    RECORDER.record_call("http", name, time.perf_counter() - t0, sent + received, outcome)
+    return response
+
+
+def run_instrumented(func: Callable[[], Any], metrics_dir: Optional[str] = None, profile: bool = False) -> Any:
+    """Run a CLI entry point, then export metrics and (optionally) a cProfile report
+
+    Writes ``toggl_calendar.prom`` and appends to ``calls.jsonl`` in
+    ``metrics_dir`` (default: the METRICS_DIR environment variable; nothing
+    is written when neither is set). With ``profile`` a ``.pstats`` file is
+    saved next to them (or in the working directory) and the top functions
+    by cumulative time are printed.
+    """
+    metrics_dir = metrics_dir or os.environ.get("METRICS_DIR")
+    profiler = cProfile.Profile() if profile else None
+    try:
+        with RECORDER.span("total"):
+            if profiler:
+                return profiler.runcall(func)
+            return func()
+    finally:
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+            RECORDER.write_prometheus(os.path.join(metrics_dir, f"{METRIC_PREFIX}.prom"))
+            RECORDER.write_jsonl(os.path.join(metrics_dir, "calls.jsonl"))
+        if profiler:
+            out_dir = metrics_dir or os.getcwd()
+            path = os.path.join(out_dir, f"profile_{datetime.now().strftime('%Y%m%d-%H%M%S')}.pstats")
+            profiler.dump_stats(path)
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(20)
+            print(buffer.getvalue())
+            print(f"Profile saved to {path}")
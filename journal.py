@@ -0,0 +1,425 @@
+"""Saved daily and weekly reports, with a full-text and activity index
+
+    python cli.py journal search "paper review"
+    python cli.py journal search 'NEAR(deep meeting, 5)' --section recommendations --since 2025-01-01
+    python cli.py journal history --activity LeetCode --since 2026-01-01
+    python cli.py journal history --type WEEKLY
+
+Reports are Markdown files named ``{TYPE}_{YYYYMMDD}.md`` in ``JOURNAL_DIR``,
+written atomically so Obsidian or a sync client never sees half a report.
+A SQLite index next to them (``.journal_index.sqlite``) holds every section
+in an FTS5 table, the tracked activities parsed from the summary, and the
+summary's counts. Each save re-indexes only its own file; before a query the
+directory listing is compared with the index by mtime and size, so files
+edited or added by hand are picked up without a rebuild.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_JOURNAL_DIR = '/Users/wsq/Codespace/Obsidian/Work/2025/Journals'
+INDEX_NAME = ".journal_index.sqlite"
+REPORT_TYPES = ("DAILY", "WEEKLY")
+NAME_RE = re.compile(r"^(DAILY|WEEKLY)_(\d{8})\.md$")
+# Section rowids are journal id * SECTION_SLOTS + position, so one journal's
+# sections are a rowid range and can be replaced without scanning the FTS table
+SECTION_SLOTS = 1000
+BANNER_RE = re.compile(r"^=+ *(.*?) *=+$")
+HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+SUMMARY_HEADING_RE = re.compile(r"^\W*\s*([A-Z][\w ()]*):$")
+ACTIVITY_RE = re.compile(r"^\s+(\d{1,2}):(\d{2})(?::(\d{2}))?[–-](\d{1,2}):(\d{2})(?::(\d{2}))? \| (.*?) \| (.*?)(?: \| .*)?$")
+COUNT_RES = {
+    "planned_events": re.compile(r"Calendar Events: (\d+) planned"),
+    "actual_events": re.compile(r"planned, (\d+) actual"),
+    "reminders_total": re.compile(r"Reminders: (\d+) total"),
+    "reminders_overdue": re.compile(r"\((\d+) overdue"),
+    "reminders_completed": re.compile(r"overdue, (\d+) completed"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journals (
+    id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, report_type TEXT NOT NULL,
+    day TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS journals_day ON journals (day);
+CREATE TABLE IF NOT EXISTS activities (
+    journal INTEGER NOT NULL, kind TEXT NOT NULL, calendar TEXT NOT NULL,
+    activity TEXT NOT NULL, seconds INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS activities_journal ON activities (journal);
+CREATE INDEX IF NOT EXISTS activities_activity ON activities (activity COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS metrics (
+    journal INTEGER NOT NULL, name TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (journal, name));
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5 (section, body, tokenize = 'unicode61');
+"""
+
+
+def journal_dir(cfg: Dict[str, Any], config_dir: str) -> str:
+    """``JOURNAL_DIR`` from config.json; relative paths are next to config.json"""
+    return os.path.normpath(os.path.join(config_dir, os.path.expanduser(cfg.get("JOURNAL_DIR") or DEFAULT_JOURNAL_DIR)))
+
+
+def parse_name(name: str) -> Optional[Tuple[str, date]]:
+    """(report type, day) of a journal file name, None for other files"""
+    match = NAME_RE.match(name)
+    if not match:
+        return None
+    try:
+        return match[1], datetime.strptime(match[2], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def split_sections(text: str) -> Iterator[Tuple[str, str]]:
+    """(heading, body) pairs of a report
+
+    Headings are the ``=== 📝 SUMMARY ===`` banners, the summary's
+    ``📅 Planned Calendar Events:`` lines and Markdown headings in the analysis.
+    """
+    heading, lines = "header", []
+    for line in text.splitlines():
+        stripped = line.strip()
+        banner = BANNER_RE.match(stripped)
+        match = (banner if banner and banner[1] else None) or HEADING_RE.match(stripped) or \
+            (SUMMARY_HEADING_RE.match(line) if line and not line[0].isspace() else None)
+        if match:
+            if any(l.strip() for l in lines):
+                yield heading, "\n".join(lines).strip()
+            heading, lines = re.sub(r"^\W+", "", match[1]).strip() or match[1], []
+        elif not banner:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        yield heading, "\n".join(lines).strip()
+
+
+def _seconds(h1, m1, s1, h2, m2, s2) -> int:
+    start = int(h1) * 3600 + int(m1) * 60 + int(s1 or 0)
+    end = int(h2) * 3600 + int(m2) * 60 + int(s2 or 0)
+    return end - start if end >= start else end - start + 86400  # past midnight
+
+
+def parse_report(text: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, str, int]], Dict[str, float]]:
+    """Sections, activities ``(kind, calendar, activity, seconds)`` and counts of a report"""
+    sections = list(split_sections(text))
+    activities = []
+    metrics: Dict[str, float] = {}
+    for heading, body in sections:
+        kind = "actual" if heading.startswith("Actual Events") else \
+            "planned" if heading.startswith("Planned Calendar Events") else None
+        if kind:
+            for line in body.splitlines():
+                match = ACTIVITY_RE.match("  " + line.strip())
+                if match:
+                    activities.append((kind, match[8].strip(), match[7].strip(), _seconds(*match.groups()[:6])))
+        elif heading == "Summary":
+            for name, pattern in COUNT_RES.items():
+                found = pattern.search(body)
+                if found:
+                    metrics[name] = float(found[1])
+    for kind in ("actual", "planned"):
+        metrics[f"{kind}_seconds"] = float(sum(a[3] for a in activities if a[0] == kind))
+    return sections, activities, metrics
+
+
+def fts_query(text: str) -> str:
+    """``text`` as quoted plain terms, for input that is not valid FTS5 syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class JournalStore:
+    """The journal directory and its index
+
+    The index is a cache of the Markdown files: deleting it only costs a
+    rebuild on the next query.
+    """
+
+    def __init__(self, root: str, index_path: Optional[str] = None):
+        self.root = root
+        self.index_path = index_path or os.path.join(root, INDEX_NAME)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # backfill saves from worker threads
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], config_dir: str) -> "JournalStore":
+        return cls(journal_dir(cfg, config_dir), cfg.get("JOURNAL_INDEX_PATH"))
+
+    def path(self, report_type: str, day) -> str:
+        """Path of the journal file for a report"""
+        return os.path.join(self.root, f"{report_type}_{day.strftime('%Y%m%d')}.md")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+            db = sqlite3.connect(self.index_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ------------------------------------------------------------ writes
+
+    def save(self, report_type: str, day, text: str) -> str:
+        """Write a report atomically and index it; returns its path"""
+        path = self.path(report_type, day)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{os.path.basename(path)}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        try:
+            st = os.stat(path)
+            with self._lock:
+                self._index(os.path.basename(path), text, st.st_mtime_ns, st.st_size)
+                self.db.commit()
+        except sqlite3.Error as e:
+            print(f"Could not index {path}: {e}")  # the next query re-indexes it
+        return path
+
+    def _index(self, name: str, text: str, mtime_ns: int, size: int) -> None:
+        report_type, day = parse_name(name)
+        sections, activities, metrics = parse_report(text)
+        db = self.db
+        row = db.execute("SELECT id FROM journals WHERE name = ?", (name,)).fetchone()
+        if row:
+            journal_id = row[0]
+            self._forget(journal_id)
+            db.execute("UPDATE journals SET report_type = ?, day = ?, mtime_ns = ?, size = ? WHERE id = ?",
+                       (report_type, day.isoformat(), mtime_ns, size, journal_id))
+        else:
+            journal_id = db.execute("INSERT INTO journals (name, report_type, day, mtime_ns, size) "
+                                    "VALUES (?, ?, ?, ?, ?)",
+                                    (name, report_type, day.isoformat(), mtime_ns, size)).lastrowid
+        base = journal_id * SECTION_SLOTS
+        db.executemany("INSERT INTO sections (rowid, section, body) VALUES (?, ?, ?)",
+                       [(base + i, heading, body) for i, (heading, body) in enumerate(sections[:SECTION_SLOTS])])
+        db.executemany("INSERT INTO activities (journal, kind, calendar, activity, seconds) VALUES (?, ?, ?, ?, ?)",
+                       [(journal_id, *activity) for activity in activities])
+        db.executemany("INSERT INTO metrics (journal, name, value) VALUES (?, ?, ?)",
+                       [(journal_id, name, value) for name, value in metrics.items()])
+
+    def _forget(self, journal_id: int) -> None:
+        db = self.db
+        base = journal_id * SECTION_SLOTS
+        db.execute("DELETE FROM sections WHERE rowid >= ? AND rowid < ?", (base, base + SECTION_SLOTS))
+        db.execute("DELETE FROM activities WHERE journal = ?", (journal_id,))
+        db.execute("DELETE FROM metrics WHERE journal = ?", (journal_id,))
+
+    def refresh(self, rebuild: bool = False) -> Tuple[int, int]:
+        """Index new and changed journal files and drop deleted ones; returns (indexed, removed)"""
+        try:
+            entries = {e.name: e for e in os.scandir(self.root) if parse_name(e.name)}
+        except FileNotFoundError:
+            entries = {}
+        with self._lock:
+            db = self.db
+            if rebuild:
+                db.execute("DELETE FROM sections")
+                db.execute("DELETE FROM activities")
+                db.execute("DELETE FROM metrics")
+                db.execute("DELETE FROM journals")
+            known = {name: (journal_id, mtime, size) for journal_id, name, mtime, size
+                     in db.execute("SELECT id, name, mtime_ns, size FROM journals")}
+            indexed = removed = 0
+            for name, (journal_id, _, _) in known.items():
+                if name not in entries:
+                    self._forget(journal_id)
+                    db.execute("DELETE FROM journals WHERE id = ?", (journal_id,))
+                    removed += 1
+            for name, entry in entries.items():
+                st = entry.stat()
+                if name in known and known[name][1:] == (st.st_mtime_ns, st.st_size):
+                    continue
+                try:
+                    with open(entry.path, encoding="utf-8") as f:
+                        text = f.read()
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"Could not read {entry.path}: {e}")
+                    continue
+                self._index(name, text, st.st_mtime_ns, st.st_size)
+                indexed += 1
+            db.commit()
+        return indexed, removed
+
+    # ------------------------------------------------------------ queries
+
+    @staticmethod
+    def _filters(report_type: Optional[str], since: Optional[date], until: Optional[date]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if report_type:
+            clauses.append("j.report_type = ?")
+            params.append(report_type.upper())
+        if since:
+            clauses.append("j.day >= ?")
+            params.append(since.isoformat())
+        if until:
+            clauses.append("j.day <= ?")
+            params.append(until.isoformat())
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def search(self, query: str, report_type: Optional[str] = None, since: Optional[date] = None,
+               until: Optional[date] = None, section: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Best-matching sections, newest first among equally good matches
+
+        ``query`` is FTS5 syntax (``deep work``, ``"deep work"``, ``leet*``,
+        ``a OR b``); text that is not valid syntax is searched as plain terms.
+        """
+        where, params = self._filters(report_type, since, until)
+        if section:
+            where += " AND s.section LIKE ?"
+            params.append(f"%{section}%")
+        sql = ("SELECT j.name, j.report_type, j.day, s.section, "
+               "snippet(sections, 1, '[', ']', ' … ', 12) "
+               "FROM sections s JOIN journals j ON j.id = s.rowid / ? "
+               f"WHERE sections MATCH ?{where} ORDER BY bm25(sections), j.day DESC LIMIT ?")
+        with self._lock:
+            try:
+                rows = self.db.execute(sql, (SECTION_SLOTS, query, *params, limit)).fetchall()
+            except sqlite3.OperationalError:
+                rows = self.db.execute(sql, (SECTION_SLOTS, fts_query(query), *params, limit)).fetchall()
+        return [{"path": os.path.join(self.root, name), "report_type": report_type, "day": day,
+                 "section": heading, "snippet": snippet}
+                for name, report_type, day, heading, snippet in rows]
+
+    def history(self, report_type: Optional[str] = None, since: Optional[date] = None, until: Optional[date] = None,
+                activity: Optional[str] = None, calendar: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per journal, oldest first: its counts, or with ``activity`` / ``calendar`` the matching tracked time
+
+        ``activity`` and ``calendar`` match case-insensitively; ``%`` is a wildcard.
+        """
+        where, params = self._filters(report_type, since, until)
+        with self._lock:
+            if activity or calendar:
+                clauses, match = ["a.kind = 'actual'"], []
+                if activity:
+                    clauses.append("a.activity LIKE ?")
+                    match.append(activity)
+                if calendar:
+                    clauses.append("a.calendar LIKE ?")
+                    match.append(calendar)
+                rows = self.db.execute(
+                    "SELECT j.name, j.report_type, j.day, SUM(a.seconds), COUNT(*) "
+                    "FROM journals j JOIN activities a ON a.journal = j.id "
+                    f"WHERE {' AND '.join(clauses)}{where} GROUP BY j.id ORDER BY j.day, j.report_type",
+                    match + params).fetchall()
+                return [{"day": day, "report_type": rtype, "name": name, "actual_seconds": seconds, "entries": count}
+                        for name, rtype, day, seconds, count in rows]
+            rows = self.db.execute(
+                "SELECT j.id, j.name, j.report_type, j.day FROM journals j "
+                f"WHERE 1 = 1{where} ORDER BY j.day, j.report_type", params).fetchall()
+            values: Dict[int, Dict[str, float]] = {}
+            if rows:
+                for journal_id, name, value in self.db.execute(
+                        "SELECT m.journal, m.name, m.value FROM metrics m JOIN journals j ON j.id = m.journal "
+                        f"WHERE 1 = 1{where}", params):
+                    values.setdefault(journal_id, {})[name] = value
+        return [{"day": day, "report_type": rtype, "name": name, **values.get(journal_id, {})}
+                for journal_id, name, rtype, day in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            journals, first, last = self.db.execute("SELECT COUNT(*), MIN(day), MAX(day) FROM journals").fetchone()
+            sections = self.db.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+            activities = self.db.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+        return {"journals": journals, "first": first, "last": last, "sections": sections,
+                "activities": activities, "directory": self.root, "index": self.index_path,
+                "index_bytes": os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0}
+
+
+def _hours(seconds: Optional[float]) -> str:
+    return "—" if seconds is None else f"{seconds / 3600:.1f}h"
+
+
+def _print_history(rows: Iterable[Dict[str, Any]], filtered: bool) -> None:
+    rows = list(rows)
+    if not rows:
+        print("No matching journals.")
+        return
+    if filtered:
+        for row in rows:
+            print(f"{row['day']}  {row['report_type']:<6}  {_hours(row['actual_seconds']):>7}  "
+                  f"{row['entries']:>3} entries")
+        print(f"{'':<18}  {_hours(sum(r['actual_seconds'] for r in rows)):>7}")
+        return
+    print(f"{'day':<10}  {'type':<6}  {'tracked':>7}  {'planned':>7}  {'overdue':>7}  {'done':>4}")
+    for row in rows:
+        overdue, done = row.get("reminders_overdue"), row.get("reminders_completed")
+        print(f"{row['day']}  {row['report_type']:<6}  {_hours(row.get('actual_seconds')):>7}  "
+              f"{_hours(row.get('planned_seconds')):>7}  {'—' if overdue is None else int(overdue):>7}  "
+              f"{'—' if done is None else int(done):>4}")
+
+
+def main(argv=None):
+    import argparse
+    import json
+    import time
+
+    from settings import config_path, load_config
+
+    parser = argparse.ArgumentParser(description="Search and summarize saved daily and weekly journals")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--type", choices=[t.lower() for t in REPORT_TYPES], help="Only daily or weekly reports")
+        p.add_argument("--since", type=date.fromisoformat, metavar="YYYY-MM-DD", help="First day (inclusive)")
+        p.add_argument("--until", type=date.fromisoformat, metavar="YYYY-MM-DD", help="Last day (inclusive)")
+        p.add_argument("--json", action="store_true", help="Print the result as JSON")
+
+    search = commands.add_parser("search", help="Full-text search over every section of every journal")
+    search.add_argument("query", help="Words, \"a phrase\", prefix* or FTS5 syntax (AND, OR, NOT, NEAR)")
+    search.add_argument("--section", help="Only sections whose heading contains this, e.g. analysis")
+    search.add_argument("--limit", type=int, default=20)
+    add_filters(search)
+    history = commands.add_parser("history", help="Counts and tracked time per journal over time")
+    history.add_argument("--activity", help="Only time tracked on this activity (%% is a wildcard)")
+    history.add_argument("--calendar", help="Only time tracked in this calendar (%% is a wildcard)")
+    add_filters(history)
+    reindex = commands.add_parser("reindex", help="Rebuild the index from the journal files")
+    reindex.add_argument("--stats", action="store_true", help="Only print index statistics")
+    args = parser.parse_args(argv)
+
+    store = JournalStore.from_config(load_config(), os.path.dirname(config_path()))
+    t0 = time.perf_counter()
+    if args.command == "reindex":
+        if not args.stats:
+            indexed, removed = store.refresh(rebuild=True)
+            print(f"Indexed {indexed} journals in {time.perf_counter() - t0:.2f}s")
+        for key, value in store.stats().items():
+            print(f"{key:<12} {value}")
+        return
+
+    indexed, removed = store.refresh()
+    if indexed or removed:
+        print(f"Index updated: {indexed} journals indexed, {removed} removed")
+    t1 = time.perf_counter()
+    if args.command == "search":
+        result = store.search(args.query, args.type, args.since, args.until, args.section, args.limit)
+    else:
+        result = store.history(args.type, args.since, args.until, args.activity, args.calendar)
+    elapsed = time.perf_counter() - t1
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    if args.command == "history":
+        _print_history(result, bool(args.activity or args.calendar))
+    elif not result:
+        print("No matches.")
+    else:
+        for hit in result:
+            print(f"{hit['day']}  {hit['report_type']:<6}  {hit['section']}")
+            print(f"    {' '.join(hit['snippet'].split())}")
+    print(f"\n{len(result)} results in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Per-call LLM telemetry and the ``stats`` command
+
+    python cli.py stats                  # last 30 days
+    python cli.py stats --days 7 --by backend
+
+Every chat completion, including hedged duplicates and failed attempts,
+appends one JSON line to ``LLM_TELEMETRY_PATH`` (default
+``.llm_calls.jsonl`` next to config.json). The line records backend, model,
+prompt version and compaction budget, the report it belongs to, tokens in
+and out, time to first token, total latency and outcome. Prompts and
+completions are not stored.
+
+Token counts come from the API's ``usage``. When a server does not report
+it (some stream without it), the local estimate from ``prompt_compaction``
+is stored and flagged as estimated. Costs use ``LLM_PRICES``, in dollars
+per million tokens per model, e.g.
+``{"gpt-4o-mini": {"input": 0.15, "output": 0.6}}``.
+
+``RoutedAssistant`` seeds its per-backend latency trackers from this file,
+so hedging uses real percentiles from the first query of a new process.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_PATH_NAME = ".llm_calls.jsonl"
+DEFAULT_DAYS = 30
+
+
+@dataclass
+class LlmCall:
+    """One chat completion attempt"""
+    backend: str
+    model: str
+    latency: float
+    outcome: str  # ok, error, timeout or cancelled
+    stream: bool = False
+    ttft: Optional[float] = None  # streaming only: seconds until the first content chunk
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    tokens_estimated: bool = False
+    report_type: Optional[str] = None
+    report_id: Optional[str] = None  # shared by every attempt made for one report
+    prompt_version: Optional[str] = None
+    token_budget: Optional[int] = None
+    ts: float = field(default_factory=time.time)
+
+
+FIELD_NAMES = {f.name for f in fields(LlmCall)}
+
+
+class LlmTelemetry:
+    """Append-only JSON-lines log of ``LlmCall`` records; thread-safe"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._warned = False
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], config_dir: Optional[str] = None) -> "LlmTelemetry":
+        if config_dir is None:
+            from settings import config_path
+            config_dir = os.path.dirname(config_path())
+        return cls(cfg.get("LLM_TELEMETRY_PATH") or os.path.join(config_dir, DEFAULT_PATH_NAME))
+
+    def record(self, call: LlmCall) -> None:
+        line = json.dumps(asdict(call), ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                if not self._warned:  # telemetry must never fail a query
+                    print(f"Could not record LLM telemetry in {self.path}: {e}")
+                    self._warned = True
+
+    def load(self, since: Optional[float] = None) -> Iterator[LlmCall]:
+        """Recorded calls, oldest first; unreadable lines are skipped"""
+        try:
+            f = open(self.path, encoding="utf-8")
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    call = LlmCall(**{k: v for k, v in data.items() if k in FIELD_NAMES})
+                except (ValueError, TypeError):
+                    continue
+                if since is None or call.ts >= since:
+                    yield call
+
+    def recent_latencies(self, window: int) -> Dict[str, List[float]]:
+        """Latencies of the last ``window`` completed calls per backend
+
+        Hedged queries are streamed, so streamed calls count as well; failed
+        calls count too, the way the live latency trackers sample them.
+        """
+        latencies: Dict[str, List[float]] = {}
+        for call in self.load():
+            if call.outcome != "cancelled":
+                samples = latencies.setdefault(call.backend, [])
+                samples.append(call.latency)
+                if len(samples) > 2 * window:
+                    del samples[:-window]
+        return {backend: samples[-window:] for backend, samples in latencies.items()}
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def call_cost(call: LlmCall, prices: Dict[str, Dict[str, float]]) -> Optional[float]:
+    """Estimated dollars for one call, or None without a price for its model"""
+    price = prices.get(call.model)
+    if price is None or call.prompt_tokens is None:
+        return None
+    return (call.prompt_tokens * price.get("input", 0)
+            + (call.completion_tokens or 0) * price.get("output", 0)) / 1_000_000
+
+
+def summarize(calls: List[LlmCall], by: str, prices: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
+    """One row per value of ``by`` (an ``LlmCall`` field): calls, latency, tokens and cost"""
+    groups: Dict[Any, List[LlmCall]] = {}
+    for call in calls:
+        key = getattr(call, by)
+        if by == "prompt_version" and call.token_budget is not None:
+            key = f"{key}@{call.token_budget}"
+        groups.setdefault(key, []).append(call)
+    rows = []
+    for key, group in sorted(groups.items(), key=lambda kv: str(kv[0])):
+        ok = [c for c in group if c.outcome == "ok"]
+        reports = {c.report_id for c in group if c.report_id} or None
+        costs = [call_cost(c, prices) for c in group]
+        known_costs = [c for c in costs if c is not None]
+        rows.append({
+            by: key,
+            "calls": len(group),
+            "failed": len(group) - len(ok),
+            "reports": len(reports) if reports else None,
+            "p50": percentile([c.latency for c in ok], 50),
+            "p95": percentile([c.latency for c in ok], 95),
+            "ttft_p50": percentile([c.ttft for c in ok if c.ttft is not None], 50),
+            "tokens_in": sum(c.prompt_tokens or 0 for c in group),
+            "tokens_out": sum(c.completion_tokens or 0 for c in group),
+            "estimated": any(c.tokens_estimated for c in group),
+            "cost": sum(known_costs) if known_costs else None,
+        })
+    return rows
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "—" if value is None else f"{value:.2f}s"
+
+
+def _dollars(value: Optional[float]) -> str:
+    if value is None:
+        return "—"
+    return f"${value:.2f}" if value >= 1 else f"${value:.5f}"
+
+
+def print_table(rows: List[Dict[str, Any]], by: str) -> None:
+    header = f"{by:<16} {'calls':>5} {'fail':>4} {'p50':>7} {'p95':>7} {'ttft':>7} " \
+             f"{'tok in':>8} {'tok out':>8} {'tok/report':>10} {'cost':>9} {'$/report':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        tokens = row["tokens_in"] + row["tokens_out"]
+        per_report = f"{tokens / row['reports']:.0f}" if row["reports"] else "—"
+        cost = _dollars(row["cost"])
+        cost_per_report = _dollars(row["cost"] / row["reports"]) if row["cost"] is not None and row["reports"] else "—"
+        mark = "~" if row["estimated"] else ""
+        print(f"{str(row[by])[:16]:<16} {row['calls']:>5} {row['failed']:>4} {_seconds(row['p50']):>7} "
+              f"{_seconds(row['p95']):>7} {_seconds(row['ttft_p50']):>7} {mark + str(row['tokens_in']):>8} "
+              f"{mark + str(row['tokens_out']):>8} {per_report:>10} {cost:>9} {cost_per_report:>9}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize LLM latency, tokens and cost per report")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS,
+                        help=f"Only calls from the last N days (default: {DEFAULT_DAYS})")
+    parser.add_argument("--by", choices=("prompt_version", "report_type", "model", "backend"),
+                        default="prompt_version", help="Group rows by this field (default: prompt_version)")
+    args = parser.parse_args(argv)
+
+    from settings import load_config
+
+    cfg = load_config()
+    telemetry = LlmTelemetry.from_config(cfg)
+    since = datetime.now() - timedelta(days=args.days)
+    calls = list(telemetry.load(since.timestamp()))
+    if not calls:
+        print(f"No LLM calls recorded since {since:%Y-%m-%d} ({telemetry.path})")
+        return
+    outcomes: Dict[str, int] = {}
+    for call in calls:
+        outcomes[call.outcome] = outcomes.get(call.outcome, 0) + 1
+    print(f"LLM calls since {since:%Y-%m-%d}: {len(calls)} "
+          f"({', '.join(f'{n} {outcome}' for outcome, n in sorted(outcomes.items()))})\n")
+    print_table(summarize(calls, args.by, cfg.get("LLM_PRICES", {})), args.by)
+    if any(call.tokens_estimated for call in calls):
+        print("\n~ includes local token estimates where the API reported no usage")
+
+
+if __name__ == "__main__":
+    main()
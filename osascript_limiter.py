@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, Optional
+
+# Script kinds whose baseline latency is remembered; the oldest is forgotten first
+MAX_BASELINES = 256
+
+
+class AdaptiveLimiter:
+    """Bounds in-flight work with an AIMD-adjusted limit and a FIFO wait queue
+
+    After each call the limit grows additively (about +1 per ``limit``
+    fast calls) and shrinks multiplicatively when a call fails or takes
+    longer than ``tolerance`` × the observed baseline latency. Baselines
+    are kept per call ``kind`` (a 0.2 s existence check says nothing about
+    how long a calendar query should take), each a slowly decaying minimum
+    of that kind's latencies; ``target_latency``, when given, replaces them.
+    Waiters are admitted strictly in arrival order.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 8,
+                 target_latency: Optional[float] = None, tolerance: float = 2.0,
+                 decrease: float = 0.7):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.baselines: Dict[Hashable, float] = {}
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            ticket = threading.Event()
+            self._waiters.append(ticket)
+        # the releaser increments in_flight on our behalf before setting the ticket
+        ticket.wait()
+
+    def release(self, latency: float, ok: bool = True, kind: Hashable = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._adjust(latency, ok, kind)
+            while self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                self._waiters.popleft().set()
+
+    def _adjust(self, latency: float, ok: bool, kind: Hashable = None) -> None:
+        if self.target_latency is not None:
+            slow = latency > self.target_latency
+        else:
+            baseline = self.baselines.get(kind)
+            slow = baseline is not None and latency > baseline * self.tolerance
+            if ok:
+                # decaying minimum: follows real improvements, drifts up slowly otherwise
+                self.baselines[kind] = latency if baseline is None else min(latency, baseline * 1.05)
+                if len(self.baselines) > MAX_BASELINES:
+                    del self.baselines[next(iter(self.baselines))]
+        if not ok or slow:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "waiting": len(self._waiters), "baselines": len(self.baselines)}
+
+
+class OsascriptLimiter:
+    """Process-wide cap on concurrent osascript processes, optionally per target app
+
+    Callers take the per-app slot first and the global slot second, always in
+    that order, so the two levels cannot deadlock.
+    """
+
+    def __init__(self, max_concurrency: int = 4, min_concurrency: int = 1,
+                 per_app: Optional[Dict[str, int]] = None, target_latency: Optional[float] = None):
+        self.global_limiter = AdaptiveLimiter(max_concurrency, min_concurrency, max_concurrency, target_latency)
+        self.app_limiters = {
+            app: AdaptiveLimiter(limit, min_concurrency, limit, target_latency)
+            for app, limit in (per_app or {}).items()
+        }
+
+    @classmethod
+    def from_config(cls, cfg: Optional[dict]) -> "OsascriptLimiter":
+        """Build from the ``OSASCRIPT_CONCURRENCY`` config section
+
+        ``{"max": 4, "min": 1, "per_app": {"Calendar": 2, "Reminders": 3}, "target_latency": null}``
+        """
+        settings = (cfg or {}).get("OSASCRIPT_CONCURRENCY", {})
+        return cls(
+            max_concurrency=settings.get("max", 4),
+            min_concurrency=settings.get("min", 1),
+            per_app=settings.get("per_app", {"Calendar": 2, "Reminders": 3}),
+            target_latency=settings.get("target_latency"),
+        )
+
+    @contextmanager
+    def slot(self, app: str, kind: Hashable = None) -> Iterator[dict]:
+        """Hold the app and global slots; both limiters see the same call latency
+
+        ``kind`` groups calls that should take about as long as each other
+        (e.g. scripts built from one template), for the latency baselines.
+        """
+        limiters = [l for l in (self.app_limiters.get(app), self.global_limiter) if l is not None]
+        for limiter in limiters:
+            limiter.acquire()
+        result = {"ok": True}
+        t0 = time.perf_counter()
+        try:
+            yield result
+        except BaseException:
+            result["ok"] = False
+            raise
+        finally:
+            latency = time.perf_counter() - t0
+            for limiter in reversed(limiters):
+                limiter.release(latency, result["ok"], kind)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        snapshot = {"global": self.global_limiter.snapshot()}
+        snapshot.update({app: limiter.snapshot() for app, limiter in self.app_limiters.items()})
+        return snapshot
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from instrumentation import RECORDER
+
+
+@dataclass
+class Stage:
+    """A unit of blocking work and the names of the stages it depends on"""
+    name: str
+    func: Callable[..., Any]
+    deps: Sequence[str] = ()
+
+
+@dataclass
+class StageTiming:
+    """When a stage started and finished, relative to the pipeline start"""
+    name: str
+    start: float
+    end: float
+    ok: bool = True
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class Pipeline:
+    """Run stages concurrently as soon as their dependencies have finished
+
+    Each stage function receives the results of its dependencies as keyword
+    arguments and runs in a worker thread, so blocking osascript and HTTP
+    calls overlap. Wall-clock time approaches the longest dependency chain.
+    """
+    stages: Dict[str, Stage] = field(default_factory=dict)
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+
+    def add(self, name: str, func: Callable[..., Any], deps: Sequence[str] = ()) -> "Pipeline":
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dep}")
+        self.stages[name] = Stage(name, func, tuple(deps))
+        return self
+
+    async def run_async(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            deps = await asyncio.gather(*(tasks[d] for d in stage.deps))
+            start = time.perf_counter() - t0
+            try:
+                result = await asyncio.to_thread(self._run_in_span, stage, dict(zip(stage.deps, deps)))
+            except Exception:
+                self.timings[stage.name] = StageTiming(stage.name, start, time.perf_counter() - t0, ok=False)
+                raise
+            self.timings[stage.name] = StageTiming(stage.name, start, time.perf_counter() - t0)
+            return result
+
+        # stages were added in dependency order, so every dep task already exists
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks.keys(), results))
+
+    @staticmethod
+    def _run_in_span(stage: Stage, kwargs: Dict[str, Any]) -> Any:
+        with RECORDER.span(stage.name):
+            return stage.func(**kwargs)
+
+    def run(self) -> Dict[str, Any]:
+        """Run the pipeline to completion and return each stage's result"""
+        return asyncio.run(self.run_async())
+
+    def critical_path(self) -> List[str]:
+        """Stages on the longest finished dependency chain"""
+        path: List[str] = []
+        name: Optional[str] = max(self.timings, key=lambda n: self.timings[n].end, default=None)
+        while name is not None:
+            path.append(name)
+            deps = [d for d in self.stages[name].deps if d in self.timings]
+            name = max(deps, key=lambda n: self.timings[n].end, default=None)
+        return list(reversed(path))
+
+    def format_timings(self) -> str:
+        parts = [f"{t.name} {t.duration:.2f}s" + ("" if t.ok else " ✗") for t in self.timings.values()]
+        wall = max((t.end for t in self.timings.values()), default=0.0)
+        busy = sum(t.duration for t in self.timings.values())
+        chain = " → ".join(self.critical_path())
+        return f"⏱️ Stages: {', '.join(parts)} | wall {wall:.2f}s (sequential {busy:.2f}s) | critical path: {chain}"
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from instrumentation import http_request
+from rate_limit import RateLimiter
+from settings import DEFAULT_TOGGL_API_URL
+
+# Toggl serves at most 200 projects per page
+PROJECTS_PER_PAGE = 200
+
+
+class ProjectCache:
+    """Toggl project metadata persisted to a local JSON file
+
+    Lookups are plain dict reads. The workspace project list, archived and
+    inactive projects included, is fetched page by page with conditional
+    requests: ``If-None-Match`` with the stored ETag on the first page, and
+    ``since`` so only projects changed after the last fetch are returned and
+    merged in. A refresh only happens when the cache is empty or a lookup
+    misses; an id that is still unknown after a refresh is not retried for
+    ``miss_ttl`` seconds, so a deleted project cannot trigger a fetch per entry.
+    """
+
+    def __init__(self, path: str, api_token: str, workspace_id, api_url: str = DEFAULT_TOGGL_API_URL,
+                 miss_ttl: float = 3600, limiter: Optional[RateLimiter] = None):
+        self.path = path
+        self.limiter = limiter  # shared with the account's other Toggl calls
+        self.api_token = api_token
+        self.workspace_id = workspace_id
+        self.api_url = api_url
+        self.miss_ttl = miss_ttl
+        self.projects: Dict[str, dict] = {}
+        self.etag: Optional[str] = None
+        self.fetched_at: Optional[int] = None
+        self._misses: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_config(cls, cfg: dict, config_dir: str, limiter: Optional[RateLimiter] = None) -> "ProjectCache":
+        path = cfg.get("PROJECT_CACHE_PATH") or os.path.join(config_dir, ".toggl_projects.json")
+        return cls(path, cfg["TOGGL_API_TOKEN"], cfg["TOGGL_WORKSPACE_ID"],
+                   cfg.get("TOGGL_API_URL", DEFAULT_TOGGL_API_URL), limiter=limiter)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if str(data.get("workspace_id")) != str(self.workspace_id):
+            return
+        self.projects = data.get("projects", {})
+        if data.get("active") == "both":  # older caches lack archived projects: fetch everything once
+            self.etag = data.get("etag")
+            self.fetched_at = data.get("fetched_at")
+
+    def _save(self) -> None:
+        data = {"workspace_id": str(self.workspace_id), "active": "both", "etag": self.etag,
+                "fetched_at": self.fetched_at, "projects": self.projects}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, full: bool = False) -> bool:
+        """Fetch changed projects; returns True when the cache changed
+
+        ``full`` ignores the stored ETag and ``since`` and replaces the cache.
+        Errors are printed and leave the cache as it was.
+        """
+        import requests
+
+        headers = {}
+        # entries on archived projects still need their name
+        params = {"active": "both", "per_page": PROJECTS_PER_PAGE}
+        if not full and self.projects:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.fetched_at:
+                params["since"] = self.fetched_at
+        started = int(time.time())
+        changed = []
+        etag = None
+        page = 1
+        try:
+            while True:
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                response = http_request(
+                    "GET",
+                    f"{self.api_url}/workspaces/{self.workspace_id}/projects",
+                    params={**params, "page": page},
+                    headers=headers if page == 1 else {},
+                    auth=(self.api_token, "api_token")
+                )
+                if response.status_code == 304:
+                    return False
+                response.raise_for_status()
+                batch = response.json() or []
+                if page == 1:
+                    etag = response.headers.get("ETag")
+                changed.extend(batch)
+                if len(batch) < PROJECTS_PER_PAGE:
+                    break
+                page += 1
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching projects from Toggl: {e}")
+            return False
+
+        with self._lock:
+            projects = {} if full else dict(self.projects)
+            for project in changed:
+                project_id = str(project.get("id"))
+                if project.get("server_deleted_at"):
+                    projects.pop(project_id, None)
+                else:
+                    projects[project_id] = {
+                        "name": project.get("name"),
+                        "active": project.get("active", True),
+                        "client_id": project.get("client_id"),
+                        "client_name": project.get("client_name"),
+                    }
+            self.projects = projects
+            self.etag = etag
+            self.fetched_at = started
+            self._save()
+        return True
+
+    def get(self, project_id) -> Optional[dict]:
+        """Project metadata by id, refreshing once when the id is unknown"""
+        project_id = str(project_id)
+        project = self.projects.get(project_id)
+        if project is not None:
+            return project
+        missed_at = self._misses.get(project_id)
+        if missed_at is not None and time.monotonic() - missed_at < self.miss_ttl:
+            return None
+        self.refresh()
+        project = self.projects.get(project_id)
+        if project is None:
+            self._misses[project_id] = time.monotonic()
+        return project
+
+    def name(self, project_id) -> Optional[str]:
+        project = self.get(project_id)
+        return project["name"] if project else None
+
+    def all(self) -> List[dict]:
+        if not self.projects:
+            self.refresh(full=True)
+        return [{"id": project_id, **project} for project_id, project in self.projects.items()]
@@ -0,0 +1,134 @@
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+# Default prompt budget for the embedded report, in estimated tokens
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Sections whose items are "start–end | summary | calendar" activity lines
+ACTIVITY_SECTIONS = ("📅 Planned Calendar Events:", "⏱️ Actual Events (Toggl):")
+
+TOGGL_NOTE_RE = re.compile(r"\s*\|\s*Note: Imported from Toggl - ID:.*$")
+EMPTY_BODY_RE = re.compile(r"\s*\(\s*\)$")
+TIME_FORMATS = ("%H:%M:%S", "%H:%M", "%I:%M:%S %p", "%I:%M %p")
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate: ~4 ASCII chars per token, 1 token per other char"""
+    n_ascii = len(text.encode("ascii", "ignore"))
+    n_other = len(text) - n_ascii
+    return (n_ascii + 3) // 4 + n_other
+
+
+def parse_clock_time(value: str) -> Optional[datetime]:
+    """Parse a Calendar time string in 24h or 12h form"""
+    value = value.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def duration_seconds(start: str, end: str) -> Optional[int]:
+    """Seconds between two clock times, wrapping past midnight"""
+    start_time, end_time = parse_clock_time(start), parse_clock_time(end)
+    if start_time is None or end_time is None:
+        return None
+    if end_time < start_time:
+        end_time += timedelta(days=1)
+    return int((end_time - start_time).total_seconds())
+
+
+def format_duration(seconds: int) -> str:
+    hours, minutes = seconds // 3600, (seconds % 3600) // 60
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+
+def _split_sections(report: str) -> List[Tuple[str, List[str]]]:
+    """Split a report into (heading, item lines); items are the indented lines"""
+    sections: List[Tuple[str, List[str]]] = []
+    for line in report.splitlines():
+        if line.startswith("  ") and sections:
+            sections[-1][1].append(line)
+        else:
+            sections.append((line, []))
+    return sections
+
+
+def _strip_noise(line: str) -> str:
+    line = TOGGL_NOTE_RE.sub("", line)
+    return EMPTY_BODY_RE.sub("", line)
+
+
+def _collapse_activities(items: List[str]) -> List[Tuple[str, int]]:
+    """Collapse repeated (summary, calendar) activities into one aggregate line
+
+    Returns (line, weight) pairs ordered by first occurrence; the weight is the
+    total tracked seconds and is used to decide what to drop under budget.
+    """
+    groups = {}
+    for item in items:
+        parts = [p.strip() for p in item.split("|")]
+        if len(parts) < 3 or "–" not in parts[0]:
+            groups.setdefault(item, [item, None, 0, 0])
+            continue
+        start, _, end = parts[0].partition("–")
+        key = (parts[1], parts[2])
+        group = groups.setdefault(key, [item, key, 0, 0])
+        group[2] += 1
+        group[3] += duration_seconds(start, end) or 0
+
+    lines = []
+    for first_line, key, count, seconds in groups.values():
+        if key is None or count == 1:
+            lines.append((first_line, seconds))
+        else:
+            total = f" | total {format_duration(seconds)}" if seconds else ""
+            lines.append((f"  {key[0]} | {key[1]} | {count}×{total}", seconds))
+    return lines
+
+
+def compact_report(report: str, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """Compact a comprehensive report so it fits a prompt token budget
+
+    Import-ID notes are stripped, repeated activities are collapsed into
+    aggregates, and if the result is still over budget the longest sections
+    are trimmed to their heaviest items with a "… N more" line.
+    """
+    sections = []
+    for heading, items in _split_sections(report):
+        items = [_strip_noise(item) for item in items]
+        if heading.strip() in ACTIVITY_SECTIONS:
+            weighted = _collapse_activities(items)
+        else:
+            weighted = [(item, 0) for item in items]
+        sections.append([heading, weighted, 0, 0])  # heading, items, dropped, dropped seconds
+
+    def render() -> str:
+        lines = []
+        for heading, weighted, dropped, dropped_seconds in sections:
+            lines.append(heading)
+            lines.extend(item for item, _ in weighted)
+            if dropped:
+                extra = f" ({format_duration(dropped_seconds)})" if dropped_seconds else ""
+                lines.append(f"  … {dropped} more{extra}")
+        return "\n".join(lines)
+
+    compacted = render()
+    while token_budget and estimate_tokens(compacted) > token_budget:
+        section = max(sections, key=lambda s: len(s[1]))
+        if len(section[1]) <= 1:
+            break
+        # keep the heaviest half, in original order
+        keep = len(section[1]) // 2
+        ranked = sorted(range(len(section[1])), key=lambda i: -section[1][i][1])
+        kept = set(ranked[:keep])
+        removed = [section[1][i] for i in range(len(section[1])) if i not in kept]
+        section[1] = [section[1][i] for i in sorted(kept)]
+        section[2] += len(removed)
+        section[3] += sum(weight for _, weight in removed)
+        compacted = render()
+
+    return compacted
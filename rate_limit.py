@@ -0,0 +1,37 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting how often callers may proceed
+
+    ``rate`` is the number of permits per second; ``burst`` how many can be
+    taken back to back. A rate of 0 or None disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, count: Optional[float], burst: int = 1) -> "RateLimiter":
+        return cls(count / 60.0 if count else None, burst)
+
+    def acquire(self) -> None:
+        """Block until a permit is available"""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
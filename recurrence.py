@@ -0,0 +1,289 @@
+"""Local expansion of recurring events (RFC 5545 RRULE, RDATE and EXDATE)
+
+Calendar sources hand over each recurring series once, as its first
+occurrence plus the rule, and the occurrences in a requested range are
+generated here. Expansions are cached per series: the cache key is the
+series itself (rule, first start, zone, excluded and extra dates), so an
+edited rule or a new exception is a different key and never sees a stale
+expansion. A cached expansion covers a window; a request inside it is a
+bisect. Misses expand whole months, and only the part of them the cached
+window lacks when the two overlap.
+
+Supported: FREQ DAILY/WEEKLY/MONTHLY/YEARLY with INTERVAL, COUNT, UNTIL,
+BYDAY (with ordinals such as ``1MO`` / ``-1FR``), BYMONTHDAY, BYMONTH,
+BYSETPOS and WKST. BYHOUR, BYMINUTE, BYWEEKNO and BYYEARDAY are ignored.
+"""
+import calendar
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Iterator, List, Optional, Tuple
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+FREQS = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+# Periods tried in a row without a single occurrence before a rule is given up (e.g. BYMONTHDAY=30 in February only)
+MAX_EMPTY_PERIODS = 1000
+MAX_CACHED_SERIES = 512
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[str] = None  # raw UNTIL value; its meaning depends on the series zone
+    byday: Tuple[Tuple[Optional[int], int], ...] = ()  # (ordinal or None, weekday)
+    bymonthday: Tuple[int, ...] = ()
+    bymonth: Tuple[int, ...] = ()
+    bysetpos: Tuple[int, ...] = ()
+    wkst: int = 0
+
+    @classmethod
+    def parse(cls, text: str) -> "RecurrenceRule":
+        """A rule from ``FREQ=WEEKLY;BYDAY=MO,WE`` (an ``RRULE:`` prefix is allowed)"""
+        parts = dict(part.split("=", 1) for part in text.strip().removeprefix("RRULE:").split(";") if "=" in part)
+        parts = {k.upper(): v.strip() for k, v in parts.items()}
+        freq = parts.get("FREQ", "").upper()
+        if freq not in FREQS:
+            raise ValueError(f"Unsupported recurrence frequency: {text}")
+
+        def ints(key):
+            return tuple(int(v) for v in parts[key].split(",") if v) if key in parts else ()
+
+        byday = []
+        for value in parts.get("BYDAY", "").split(","):
+            value = value.strip().upper()
+            if value:
+                if value[-2:] not in WEEKDAYS:
+                    raise ValueError(f"Invalid BYDAY in {text}")
+                byday.append((int(value[:-2]) if value[:-2] not in ("", "+") else None, WEEKDAYS[value[-2:]]))
+        return cls(
+            freq=freq,
+            interval=max(1, int(parts.get("INTERVAL", 1))),
+            count=int(parts["COUNT"]) if "COUNT" in parts else None,
+            until=parts.get("UNTIL"),
+            byday=tuple(byday),
+            bymonthday=ints("BYMONTHDAY"),
+            bymonth=ints("BYMONTH"),
+            bysetpos=ints("BYSETPOS"),
+            wkst=WEEKDAYS.get(parts.get("WKST", "MO").upper(), 0),
+        )
+
+
+@dataclass(frozen=True)
+class Series:
+    """A recurring event: first start as zone wall-clock time, and its exceptions
+
+    ``zone`` None means floating (local) time. ``exdates`` and ``rdates``
+    are wall-clock times in the same zone.
+    """
+    uid: str
+    rule: Optional[RecurrenceRule]
+    start: datetime  # naive wall-clock
+    duration: timedelta
+    zone: Optional[tzinfo] = None
+    all_day: bool = False
+    exdates: Tuple[datetime, ...] = ()
+    rdates: Tuple[datetime, ...] = ()
+
+    def to_wall(self, moment: datetime) -> datetime:
+        """``moment`` (aware, or naive local) as this series' wall-clock time"""
+        if moment.tzinfo is None:
+            moment = moment.astimezone()
+        return moment.astimezone(self.zone).replace(tzinfo=None) if self.zone else \
+            moment.astimezone().replace(tzinfo=None)
+
+    def to_local(self, wall: datetime) -> datetime:
+        """A wall-clock time of this series as an aware local datetime"""
+        return (wall.replace(tzinfo=self.zone) if self.zone else wall).astimezone()
+
+    def until_wall(self) -> Optional[datetime]:
+        until = self.rule.until if self.rule else None
+        if not until:
+            return None
+        if len(until) == 8:
+            return datetime.strptime(until, "%Y%m%d") + timedelta(days=1, microseconds=-1)
+        moment = datetime.strptime(until[:15], "%Y%m%dT%H%M%S")
+        if until.endswith("Z"):
+            return self.to_wall(moment.replace(tzinfo=timezone.utc))
+        return moment
+
+
+def _nth_weekdays(days: List[date], byday) -> List[date]:
+    """Days of a month or year matching BYDAY, ordinals counted within ``days``"""
+    if not byday:
+        return days
+    result = set()
+    by_weekday = {}
+    for day in days:
+        by_weekday.setdefault(day.weekday(), []).append(day)
+    for ordinal, weekday in byday:
+        matches = by_weekday.get(weekday, [])
+        if ordinal is None:
+            result.update(matches)
+        elif -len(matches) <= ordinal <= len(matches) and ordinal:
+            result.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+    return sorted(result)
+
+
+def _month_days(year: int, month: int, rule: RecurrenceRule, first: date) -> List[date]:
+    length = calendar.monthrange(year, month)[1]
+    days = [date(year, month, d) for d in range(1, length + 1)]
+    if rule.bymonthday:
+        wanted = {d if d > 0 else length + d + 1 for d in rule.bymonthday}
+        days = [d for d in days if d.day in wanted]
+    if rule.byday:
+        days = _nth_weekdays(days, rule.byday)
+    elif not rule.bymonthday:
+        days = [d for d in days if d.day == first.day]
+    return days
+
+
+def _period_days(rule: RecurrenceRule, period: int, first: date) -> List[date]:
+    """Candidate days of the ``period``-th period after the one containing ``first``"""
+    if rule.freq == "DAILY":
+        days = [first + timedelta(days=period)]
+        if rule.byday:
+            days = [d for d in days if d.weekday() in {w for _, w in rule.byday}]
+        if rule.bymonthday:
+            days = [d for d in days if d.day in rule.bymonthday or
+                    d.day - calendar.monthrange(d.year, d.month)[1] - 1 in rule.bymonthday]
+    elif rule.freq == "WEEKLY":
+        week_start = first - timedelta(days=(first.weekday() - rule.wkst) % 7) + timedelta(weeks=period)
+        weekdays = {w for _, w in rule.byday} or {first.weekday()}
+        days = [week_start + timedelta(days=i) for i in range(7) if (rule.wkst + i) % 7 in weekdays]
+    elif rule.freq == "MONTHLY":
+        year, month = divmod(first.year * 12 + first.month - 1 + period, 12)
+        days = _month_days(year, month + 1, rule, first)
+    else:
+        year = first.year + period
+        if rule.bymonth or rule.bymonthday or not rule.byday:
+            months = rule.bymonth or (first.month,)
+            days = [d for m in sorted(months) for d in _month_days(year, m, rule, first)]
+        else:  # BYDAY over the whole year, e.g. the 20th Monday
+            days = _nth_weekdays([date(year, 1, 1) + timedelta(days=i)
+                                  for i in range(366 if calendar.isleap(year) else 365)], rule.byday)
+    if rule.bymonth and rule.freq != "YEARLY":
+        days = [d for d in days if d.month in rule.bymonth]
+    if rule.bysetpos and days:
+        days = sorted({days[p - 1 if p > 0 else p] for p in rule.bysetpos if -len(days) <= p <= len(days) and p})
+    return days
+
+
+def _periods_between(rule: RecurrenceRule, first: date, target: date) -> int:
+    if rule.freq == "DAILY":
+        return (target - first).days
+    if rule.freq == "WEEKLY":
+        return ((target - first).days + (first.weekday() - rule.wkst) % 7) // 7
+    if rule.freq == "MONTHLY":
+        return (target.year - first.year) * 12 + target.month - first.month
+    return target.year - first.year
+
+
+def _iter_rule(series: Series, window_start: datetime) -> Iterator[datetime]:
+    """Wall-clock starts of the rule, ascending, from the first one that can reach ``window_start``"""
+    rule, start = series.rule, series.start
+    first = start.date()
+    period = 0
+    if rule.count is None and window_start.date() > first:
+        # without COUNT nothing before the window matters: jump to its period
+        period = max(0, _periods_between(rule, first, window_start.date()) - 1)
+        period -= period % rule.interval
+    produced = empty = 0
+    while empty < MAX_EMPTY_PERIODS:
+        days = _period_days(rule, period, first)
+        found = False
+        for day in days:
+            moment = datetime.combine(day, start.time())
+            if moment < start:
+                continue
+            found = True
+            yield moment
+            produced += 1
+            if rule.count is not None and produced >= rule.count:
+                return
+        empty = 0 if found else empty + 1
+        period += rule.interval
+
+
+def expand(series: Series, window_start: datetime, window_end: datetime) -> List[datetime]:
+    """Wall-clock starts of ``series`` in [window_start, window_end), exceptions applied"""
+    result = set()
+    if series.rule is not None:
+        until = series.until_wall()
+        for moment in _iter_rule(series, window_start):
+            if moment >= window_end or (until is not None and moment > until):
+                break
+            if moment >= window_start:
+                result.add(moment)
+    result.update(d for d in series.rdates if window_start <= d < window_end)
+    if window_start <= series.start < window_end:
+        result.add(series.start)  # DTSTART is always an occurrence
+    result.difference_update(series.exdates)
+    return sorted(result)
+
+
+def _month_floor(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def _month_ceil(moment: datetime) -> datetime:
+    floor = _month_floor(moment)
+    if floor == moment:
+        return floor
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+class OccurrenceCache:
+    """Expanded occurrences per series, for the window each was expanded over; thread-safe LRU"""
+
+    def __init__(self, max_series: int = MAX_CACHED_SERIES):
+        self.max_series = max_series
+        self._entries: "OrderedDict[Series, Tuple[datetime, datetime, List[datetime]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def starts(self, series: Series, window_start: datetime, window_end: datetime) -> List[datetime]:
+        """Like ``expand``, served from the cached window when it covers the request"""
+        with self._lock:
+            cached = self._entries.get(series)
+            if cached is not None:
+                self._entries.move_to_end(series)
+                covered_from, covered_to, starts = cached
+                if covered_from <= window_start and window_end <= covered_to:
+                    self.hits += 1
+                    return starts[bisect_left(starts, window_start):bisect_left(starts, window_end)]
+            self.misses += 1
+        # whole months, so that neighbouring days and month reports share one expansion
+        expand_from, expand_to = _month_floor(window_start), _month_ceil(window_end)
+        if cached is not None and expand_from <= covered_to and covered_from <= expand_to:
+            # overlapping: expand only what the cached window lacks
+            before = expand(series, expand_from, covered_from) if expand_from < covered_from else []
+            after = expand(series, covered_to, expand_to) if covered_to < expand_to else []
+            expand_from, expand_to = min(expand_from, covered_from), max(expand_to, covered_to)
+            expanded = before + starts + after
+        else:
+            expanded = expand(series, expand_from, expand_to)
+        with self._lock:
+            self._entries[series] = (expand_from, expand_to, expanded)
+            self._entries.move_to_end(series)
+            while len(self._entries) > self.max_series:
+                self._entries.popitem(last=False)
+        return expanded[bisect_left(expanded, window_start):bisect_left(expanded, window_end)]
+
+    def occurrences(self, series: Series, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """(start, end) of each occurrence starting in [start, end), as aware local datetimes"""
+        window_start, window_end = series.to_wall(start), series.to_wall(end)
+        result = []
+        for wall in self.starts(series, window_start, window_end):
+            if series.all_day:
+                result.append((series.to_local(wall), series.to_local(wall + series.duration)))
+            else:
+                local = series.to_local(wall)
+                result.append((local, local + series.duration))
+        return result
+
+
+CACHE = OccurrenceCache()
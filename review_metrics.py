@@ -0,0 +1,249 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from summarize_calendar import CalendarEvent, Reminder, EventAnalyzer
+from prompt_compaction import parse_clock_time, format_duration
+
+DEFAULT_DEEP_WORK_MIN_MINUTES = 50
+DEFAULT_WORK_CALENDARS = ["Work", "Growth"]
+
+# Ideal daily ranges from the review template, in hours (None = unbounded)
+DEEP_WORK_RANGE = (3, 5)
+SHALLOW_RANGE = (None, 2)
+TOTAL_WORK_RANGE = (5, 7)
+REST_RANGE = (7, 8)
+
+
+@dataclass
+class ReviewMetrics:
+    """Every numeric cell of the review template, computed locally"""
+    report_type: str
+    days: int
+    tasks_planned: int = 0
+    tasks_completed: int = 0
+    missed_tasks: List[str] = field(default_factory=list)
+    reminders_completed: int = 0
+    reminders_overdue: int = 0
+    overdue_names: List[str] = field(default_factory=list)
+    deep_work_seconds: int = 0
+    deep_blocks: int = 0
+    shallow_seconds: int = 0
+    shallow_blocks: int = 0
+    total_work_seconds: int = 0
+    rest_seconds: Optional[int] = None  # average overnight gap between tracked days
+
+    @property
+    def task_rate(self) -> Optional[float]:
+        return self.tasks_completed / self.tasks_planned if self.tasks_planned else None
+
+    @property
+    def reminder_rate(self) -> Optional[float]:
+        planned = self.reminders_completed + self.reminders_overdue
+        return self.reminders_completed / planned if planned else None
+
+    @property
+    def backlog_status(self) -> str:
+        if self.reminders_overdue == 0:
+            return "Clean"
+        return "Manageable" if self.reminders_overdue <= 3 else "Needs triage"
+
+
+def _interval(event: CalendarEvent) -> Optional[Tuple[int, int]]:
+    """Start/end of a timed event in minutes since midnight"""
+    start, end = parse_clock_time(event.start), parse_clock_time(event.end)
+    if start is None or end is None:
+        return None
+    start_min = start.hour * 60 + start.minute
+    end_min = end.hour * 60 + end.minute
+    if end_min < start_min:
+        end_min += 24 * 60
+    return start_min, end_min
+
+
+def compute_metrics(
+    events: List[CalendarEvent],
+    reminders: List[Reminder],
+    report_type: str = "DAILY",
+    days: int = 1,
+    cfg: Optional[Dict[str, Any]] = None
+) -> ReviewMetrics:
+    """Compute the review template numbers from parsed events and reminders
+
+    A planned event counts as completed when a Toggl event on the same day and
+    calendar has the same title or overlaps it in time. Actual events in the
+    work calendars (``WORK_CALENDARS``) count as deep work when at least
+    ``DEEP_WORK_MIN_MINUTES`` long and as shallow otherwise.
+    """
+    cfg = cfg or {}
+    deep_min = cfg.get("DEEP_WORK_MIN_MINUTES", DEFAULT_DEEP_WORK_MIN_MINUTES)
+    work_calendars = set(cfg.get("WORK_CALENDARS", DEFAULT_WORK_CALENDARS))
+
+    metrics = ReviewMetrics(report_type=report_type.upper(), days=max(1, days))
+    planned, actual = EventAnalyzer.split_events(events)
+
+    # (day, calendar) → actual titles and intervals, for O(1) matching per planned event
+    actual_index: Dict[Tuple[Optional[str], str], Tuple[set, list]] = {}
+    # day → (first start, last end) of tracked time, for the overnight rest estimate
+    day_bounds: Dict[str, List[int]] = {}
+    for e in actual:
+        titles, intervals = actual_index.setdefault((e.date, e.calendar), (set(), []))
+        titles.add(e.summary.strip().casefold())
+        interval = _interval(e)
+        if interval is None:
+            continue
+        intervals.append(interval)
+
+        seconds = (interval[1] - interval[0]) * 60
+        if e.calendar in work_calendars:
+            metrics.total_work_seconds += seconds
+            if seconds >= deep_min * 60:
+                metrics.deep_work_seconds += seconds
+                metrics.deep_blocks += 1
+            else:
+                metrics.shallow_seconds += seconds
+                metrics.shallow_blocks += 1
+        if e.date:
+            bounds = day_bounds.setdefault(e.date, [interval[0], interval[1]])
+            bounds[0] = min(bounds[0], interval[0])
+            bounds[1] = max(bounds[1], interval[1])
+
+    for e in planned:
+        metrics.tasks_planned += 1
+        titles, intervals = actual_index.get((e.date, e.calendar), (set(), []))
+        interval = _interval(e)
+        done = e.summary.strip().casefold() in titles or (
+            interval is not None and any(s < interval[1] and interval[0] < t for s, t in intervals)
+        )
+        if done:
+            metrics.tasks_completed += 1
+        else:
+            metrics.missed_tasks.append(e.summary)
+
+    categorized = EventAnalyzer.categorize_reminders(reminders)
+    metrics.reminders_completed = len(categorized["completed"])
+    metrics.reminders_overdue = len(categorized["overdue"])
+    metrics.overdue_names = [r.name for r in categorized["overdue"]]
+
+    gaps = []
+    for day, (first_start, last_end) in day_bounds.items():
+        next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        if next_day in day_bounds:
+            gaps.append((24 * 60 - last_end + day_bounds[next_day][0]) * 60)
+    if gaps:
+        metrics.rest_seconds = sum(gaps) // len(gaps)
+
+    return metrics
+
+
+def calendar_totals(events: List[CalendarEvent]) -> Dict[str, Dict[str, int]]:
+    """Planned and tracked (Toggl) seconds and event counts per calendar"""
+    totals: Dict[str, Dict[str, int]] = {}
+    for e in events:
+        cell = totals.setdefault(e.calendar, {"actual_seconds": 0, "actual_events": 0,
+                                              "planned_seconds": 0, "planned_events": 0})
+        kind = "actual" if e.is_toggl else "planned"
+        cell[f"{kind}_events"] += 1
+        interval = _interval(e)
+        if interval is not None:
+            cell[f"{kind}_seconds"] += (interval[1] - interval[0]) * 60
+    return totals
+
+
+def _rate_cell(rate: Optional[float]) -> Tuple[str, str]:
+    if rate is None:
+        return "—", "—"
+    status = "✅" if rate >= 0.8 else "⚠️" if rate >= 0.5 else "✖️"
+    return f"{rate:.0%}", status
+
+
+def _range_status(seconds: Optional[int], ideal: Tuple[Optional[float], Optional[float]], days: int) -> str:
+    if seconds is None:
+        return "—"
+    hours = seconds / 3600 / days
+    low, high = ideal
+    miss = max((low or 0) - hours, hours - high if high is not None else 0, 0)
+    return "✅" if miss == 0 else "⚠️" if miss <= 1 else "✖️"
+
+
+def _hours_cell(seconds: Optional[int], days: int) -> str:
+    if seconds is None:
+        return "—"
+    if days == 1:
+        return format_duration(seconds)
+    return f"{format_duration(seconds)} (avg {format_duration(seconds // days)}/day)"
+
+
+def _period(metrics: ReviewMetrics) -> str:
+    return "Today" if metrics.report_type == "DAILY" else "This week"
+
+
+def render_tables(metrics: ReviewMetrics) -> str:
+    """Sections 1–3 of the review template with every numeric cell filled"""
+    tmp = _period(metrics)
+    days = metrics.days
+    task_rate, task_status = _rate_cell(metrics.task_rate)
+    reminder_rate, reminder_status = _rate_cell(metrics.reminder_rate)
+    missed = ", ".join(metrics.missed_tasks[:3]) or "—"
+    missed_note = f"missed: {missed}" if metrics.missed_tasks else "—"
+    overdue_note = f"{metrics.reminders_overdue} overdue" if metrics.reminders_overdue else "—"
+    rest_note = "untracked overnight gap (upper bound)" if metrics.rest_seconds is not None else "not tracked"
+
+    lines = [
+        f"### 1️⃣ {tmp} Execution Overview",
+        "",
+        "| Category    | Planned | Completed | Completion Rate | Status | Notes / Keywords |",
+        "|-----------|--------|----------|----------------|--------|----------------|",
+        f"| Tasks      | {metrics.tasks_planned} | {metrics.tasks_completed} | {task_rate} | {task_status} | {missed_note} |",
+        f"| Reminders  | {metrics.reminders_completed + metrics.reminders_overdue} | {metrics.reminders_completed} | {reminder_rate} | {reminder_status} | {overdue_note} |",
+        "",
+        "### 2️⃣ Workload & Pace",
+        "",
+        f"| Metric                 | {tmp} Data   | Ideal Range | Status | Notes |",
+        "|-----------------------|--------------|------------|--------|-------|",
+        f"| Deep Work Hours        | {_hours_cell(metrics.deep_work_seconds, days)} | 3–5h | {_range_status(metrics.deep_work_seconds, DEEP_WORK_RANGE, days)} | {metrics.deep_blocks} blocks |",
+        f"| Shallow / Fragmented   | {_hours_cell(metrics.shallow_seconds, days)} | ≤2h | {_range_status(metrics.shallow_seconds, SHALLOW_RANGE, days)} | {metrics.shallow_blocks} blocks |",
+        f"| Total Work Hours       | {_hours_cell(metrics.total_work_seconds, days)} | 5–7h | {_range_status(metrics.total_work_seconds, TOTAL_WORK_RANGE, days)} | — |",
+        f"| Rest / Sleep           | {_hours_cell(metrics.rest_seconds, 1)} | 7–8h | {_range_status(metrics.rest_seconds, REST_RANGE, 1)} | {rest_note} |",
+        "",
+        "### 3️⃣ Reminders / Backlog Quick Check",
+        "",
+        f"- ✅ Completed: {metrics.reminders_completed}",
+        f"- ⚠️ Overdue: {metrics.reminders_overdue}" + (" → Prioritize first thing tomorrow" if metrics.reminders_overdue else ""),
+        "",
+        f"> Backlog status: {metrics.backlog_status}",
+    ]
+    return "\n".join(lines)
+
+
+def render_offline_review(metrics: ReviewMetrics) -> str:
+    """The full review template filled without an LLM, using rule-based recommendations"""
+    tmp = _period(metrics)
+    days = metrics.days
+    recommendations = []
+    if metrics.reminders_overdue:
+        top = ", ".join(metrics.overdue_names[:3])
+        recommendations.append(f"Handle {metrics.reminders_overdue} overdue reminders first ({top})")
+    if metrics.deep_work_seconds / 3600 / days < DEEP_WORK_RANGE[0]:
+        recommendations.append("Deep work → Reserve a continuous 2h block, no fragmentation")
+    if metrics.shallow_seconds / 3600 / days > SHALLOW_RANGE[1]:
+        recommendations.append("Shallow work → Batch short tasks into one slot")
+    if metrics.missed_tasks:
+        recommendations.append(f"Plan calibration → Reschedule or drop: {', '.join(metrics.missed_tasks[:3])}")
+    if not recommendations:
+        recommendations.append("Keep the current plan and protect the deep work blocks")
+
+    task_rate, _ = _rate_cell(metrics.task_rate)
+    lines = [
+        render_tables(metrics),
+        "",
+        "### 4️⃣ Tactical Recommendations (Next Day)",
+        "",
+        *[f"{i}. {rec}" for i, rec in enumerate(recommendations, 1)],
+        "",
+        "### 5️⃣ One-Line Self-Debrief",
+        "",
+        f"> \"{tmp} completion rate {task_rate}, deep work {format_duration(metrics.deep_work_seconds)}, "
+        f"⚠️ backlog {metrics.reminders_overdue} ({metrics.backlog_status}).\"",
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,238 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Pattern
+
+WORD_RE = re.compile(r"\w+")
+# Group names, backreferences and inline flags change meaning inside a combined alternation
+UNCOMBINABLE_RE = re.compile(r"\(\?P|\(\?[aiLmsux-]|\\\d")
+REGEX_META = frozenset(".^$*+?{}[]\\|()")
+
+# Match keys that are looked up in a dict, in the order used to pick a rule's dispatch key
+DISPATCH_KEYS = ("project", "client", "tag", "keyword")
+
+
+@dataclass
+class Route:
+    """Where and how one time entry is written to Calendar"""
+    calendar: Optional[str]
+    title: str
+    notes: str
+    rule: Optional[int] = None  # index of the matching rule, None for the default route
+    skip: bool = False
+
+
+@dataclass
+class _Rule:
+    index: int
+    project: Optional[FrozenSet[str]]
+    client: Optional[FrozenSet[str]]
+    tag: Optional[FrozenSet[str]]
+    keyword: Optional[FrozenSet[str]]
+    description: Optional[Pattern]
+    calendar: Optional[str]
+    title: Optional[str]
+    notes: Optional[str]
+    skip: bool
+
+    def matches(self, fields: Dict[str, Any], tags: FrozenSet[str], words: FrozenSet[str]) -> bool:
+        if self.project is not None and fields["project"].casefold() not in self.project:
+            return False
+        if self.client is not None and fields["client"].casefold() not in self.client:
+            return False
+        if self.tag is not None and not (self.tag & tags):
+            return False
+        if self.keyword is not None and not (self.keyword & words):
+            return False
+        if self.description is not None and not self.description.search(fields["description"]):
+            return False
+        return True
+
+
+class _Fields(dict):
+    """Template fields; unknown placeholders render as empty strings"""
+    def __missing__(self, key):
+        return ""
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Literal text every match of ``pattern`` starts with (lowercased), or "" if unknown"""
+    if "|" in pattern:
+        return ""
+    i = 1 if pattern.startswith("^") else 0
+    prefix = []
+    while i < len(pattern) and pattern[i] not in REGEX_META:
+        prefix.append(pattern[i])
+        i += 1
+    if prefix and i < len(pattern) and pattern[i] in "*?{":
+        prefix.pop()  # the last literal is optional or repeated
+    return "".join(prefix).lower()
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex matching any of ``words``, factored as a trie so alternation branches per character"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+def _values(value) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    return frozenset(str(v).casefold() for v in value)
+
+
+class RoutingRules:
+    """Config-driven routing of Toggl entries to calendars, titles and notes
+
+    ``ROUTING_RULES`` in config.json is an ordered list; the first matching
+    rule wins::
+
+        {"match": {"project": "Work", "tag": ["deep", "focus"]}, "calendar": "Deep Work",
+         "title": "{description}", "notes": "{tags}"}
+
+    Match keys (all optional, all must hold, case-insensitive): ``project``,
+    ``client`` and ``tag`` take a name or a list of names, ``keyword`` a word
+    or list of words contained in the description, and ``description`` a
+    regular expression searched in the description. ``title`` and ``notes``
+    are format templates over ``description``, ``project``, ``client``,
+    ``tags`` and ``calendar``. ``"skip": true`` drops matching entries.
+
+    Rules compile once: each rule is indexed under the values of its first
+    dict-dispatchable key, and regex-only rules are indexed by their literal
+    prefix, found with a single trie-shaped regex (patterns without one share
+    a combined alternation), so an entry is only checked against the few
+    rules that can match it rather than the whole list. Patterns using group
+    names, backreferences or inline flags are checked on every entry.
+    """
+
+    def __init__(self, rules: Iterable[dict]):
+        self.rules: List[_Rule] = []
+        self._index: Dict[str, Dict[str, List[int]]] = {key: {} for key in DISPATCH_KEYS}
+        self._regex_by_prefix: Dict[str, List[int]] = {}
+        self._regex_only: List[int] = []
+        self._regex_unguarded: List[int] = []
+        self._catch_all: List[int] = []
+
+        patterns = []
+        for i, spec in enumerate(rules):
+            match = spec.get("match", {})
+            unknown = set(match) - set(DISPATCH_KEYS) - {"description"}
+            if unknown:
+                raise ValueError(f"Routing rule {i}: unknown match keys {sorted(unknown)}")
+            rule = _Rule(
+                index=i,
+                project=_values(match.get("project")),
+                client=_values(match.get("client")),
+                tag=_values(match.get("tag")),
+                keyword=_values(match.get("keyword")),
+                description=re.compile(match["description"], re.IGNORECASE) if "description" in match else None,
+                calendar=spec.get("calendar"),
+                title=spec.get("title"),
+                notes=spec.get("notes"),
+                skip=bool(spec.get("skip", False)),
+            )
+            self.rules.append(rule)
+
+            dispatch = next((key for key in DISPATCH_KEYS if getattr(rule, key) is not None), None)
+            if dispatch is not None:
+                for value in getattr(rule, dispatch):
+                    self._index[dispatch].setdefault(value, []).append(i)
+            elif rule.description is not None and UNCOMBINABLE_RE.search(match["description"]):
+                self._regex_unguarded.append(i)
+            elif rule.description is not None and len(_literal_prefix(match["description"])) >= 2:
+                self._regex_by_prefix.setdefault(_literal_prefix(match["description"]), []).append(i)
+            elif rule.description is not None:
+                self._regex_only.append(i)
+                patterns.append(f"(?:{match['description']})")
+            else:
+                self._catch_all.append(i)
+
+        # Regex rules with a literal prefix: one trie-shaped lookahead finds, at every
+        # position, the longest prefix present; shorter prefixes are prefixes of it
+        self._prefix_lengths = sorted({len(p) for p in self._regex_by_prefix})
+        self._prefix_regex = (
+            re.compile(f"(?=({_trie_pattern(self._regex_by_prefix)}))", re.IGNORECASE)
+            if self._regex_by_prefix else None
+        )
+        # The remaining regex-only rules share one combined alternation
+        self._any_regex = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+
+    @classmethod
+    def from_config(cls, cfg: Optional[dict]) -> "RoutingRules":
+        return cls((cfg or {}).get("ROUTING_RULES", []))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, project: str = "", client: str = "", tags: Iterable[str] = (),
+              description: str = "") -> Optional[_Rule]:
+        """The first rule (in config order) matching these entry fields"""
+        fields = {"project": project or "", "client": client or "", "description": description or ""}
+        tag_set = frozenset(t.casefold() for t in tags)
+        words = frozenset(w.casefold() for w in WORD_RE.findall(fields["description"]))
+
+        candidates = set(self._catch_all)
+        candidates.update(self._regex_unguarded)
+        index = self._index
+        candidates.update(index["project"].get(fields["project"].casefold(), ()))
+        candidates.update(index["client"].get(fields["client"].casefold(), ()))
+        for tag in tag_set:
+            candidates.update(index["tag"].get(tag, ()))
+        for word in words:
+            candidates.update(index["keyword"].get(word, ()))
+        if self._prefix_regex is not None:
+            by_prefix = self._regex_by_prefix
+            for found in self._prefix_regex.findall(fields["description"]):
+                found = found.lower()
+                for length in self._prefix_lengths:
+                    if length > len(found):
+                        break
+                    candidates.update(by_prefix.get(found[:length], ()))
+        if self._any_regex is not None and self._any_regex.search(fields["description"]):
+            candidates.update(self._regex_only)
+
+        for i in sorted(candidates):
+            rule = self.rules[i]
+            if rule.matches(fields, tag_set, words):
+                return rule
+        return None
+
+    def route(self, default_calendar: Optional[str], project: str = "", client: str = "",
+              tags: Iterable[str] = (), description: str = "") -> Route:
+        """Calendar, title and notes for an entry; unmatched entries keep the defaults
+
+        The default route is the project's calendar, the description as title
+        and the tags (``#tag1, #tag2``) as notes.
+        """
+        tags = list(tags)
+        fields = _Fields(
+            description=description or "",
+            project=project or "",
+            client=client or "",
+            tags=", ".join(f"#{tag}" for tag in tags),
+        )
+        rule = self.match(project, client, tags, description)
+        if rule is None:
+            return Route(default_calendar, fields["description"], fields["tags"])
+        fields["calendar"] = rule.calendar or default_calendar or ""
+        return Route(
+            calendar=rule.calendar or default_calendar,
+            title=rule.title.format_map(fields).strip() if rule.title else fields["description"],
+            notes=rule.notes.format_map(fields).strip() if rule.notes else fields["tags"],
+            rule=rule.index,
+            skip=rule.skip,
+        )
@@ -0,0 +1,274 @@
+"""Resident scheduler for the sync and wrap-up jobs
+
+    python cli.py scheduler            # run in the foreground (launchd/systemd keeps it alive)
+    python cli.py scheduler --status   # last run time, duration and outcome per job
+
+Jobs come from ``SCHEDULE`` in config.json::
+
+    "SCHEDULE": [
+        {"name": "sync", "command": "sync", "every_minutes": 30, "jitter_seconds": 60},
+        {"name": "daily", "command": "wrap-up", "args": ["--daily", "--sync", "--save"],
+         "at": "21:30", "jitter_seconds": 120}
+    ]
+
+``command`` is any cli.py command. Jobs run one at a time in this process,
+so modules, config, the osascript limiter, the project cache and HTTP/LLM
+clients stay warm between runs. A job that comes due while another job (or
+an earlier run of itself) is running is run once afterwards, however many
+times it came due meanwhile.
+"""
+import importlib
+import json
+import os
+import random
+import signal
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from file_lock import FileLock, LockHeld
+from instrumentation import METRIC_PREFIX
+from settings import config_path, load_config
+
+DEFAULT_SCHEDULE = [
+    {"name": "sync", "command": "sync", "every_minutes": 30, "jitter_seconds": 60},
+]
+
+
+@dataclass
+class JobStats:
+    """Run history of one job, persisted to the scheduler state file"""
+    runs: int = 0
+    failures: int = 0
+    coalesced: int = 0  # due times folded into a single run
+    last_start: Optional[str] = None
+    last_duration: Optional[float] = None
+    last_outcome: Optional[str] = None
+    next_run: Optional[str] = None
+
+
+@dataclass
+class Job:
+    name: str
+    command: str
+    args: List[str] = field(default_factory=list)
+    every_minutes: Optional[float] = None
+    at: Optional[str] = None  # HH:MM, daily
+    jitter_seconds: float = 0
+    stats: JobStats = field(default_factory=JobStats)
+    slot: Optional[datetime] = None  # next scheduled time, before jitter
+    due: Optional[datetime] = None
+
+    @property
+    def step(self) -> timedelta:
+        return timedelta(minutes=self.every_minutes) if self.every_minutes else timedelta(days=1)
+
+    def start(self, now: datetime) -> None:
+        if self.every_minutes:
+            self.slot = now + self.step
+        else:
+            hour, minute = (int(part) for part in self.at.split(":"))
+            self.slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if self.slot <= now:
+                self.slot += self.step
+        self._set_due()
+
+    def advance(self, now: datetime) -> int:
+        """Move to the first slot after ``now``; returns how many slots were passed"""
+        passed = int((now - self.slot) / self.step) + 1 if now >= self.slot else 0
+        self.slot += passed * self.step
+        self._set_due()
+        return passed
+
+    def _set_due(self) -> None:
+        # jitter is applied per run and never accumulates into the slot grid
+        self.due = self.slot + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+        self.stats.next_run = self.due.isoformat(timespec="seconds")
+
+
+def load_jobs(cfg: dict) -> List[Job]:
+    import cli
+
+    jobs = []
+    for spec in cfg.get("SCHEDULE", DEFAULT_SCHEDULE):
+        job = Job(
+            name=spec.get("name", spec["command"]),
+            command=spec["command"],
+            args=list(spec.get("args", [])),
+            every_minutes=spec.get("every_minutes"),
+            at=spec.get("at"),
+            jitter_seconds=spec.get("jitter_seconds", 0),
+        )
+        if job.command not in cli.COMMANDS or job.command == "scheduler":
+            raise ValueError(f"Job {job.name}: unknown command {job.command!r}")
+        if not job.every_minutes and not job.at:
+            raise ValueError(f"Job {job.name}: needs every_minutes or at")
+        jobs.append(job)
+    return jobs
+
+
+def state_path(cfg: dict) -> str:
+    return cfg.get("SCHEDULER_STATE_PATH") or os.path.join(os.path.dirname(config_path()), ".scheduler_state.json")
+
+
+class Scheduler:
+    """Runs due jobs sequentially; due times missed during a run collapse into one run"""
+
+    def __init__(self, jobs: List[Job], state_file: str):
+        self.jobs = jobs
+        self.state_file = state_file
+        self._stopping = False
+        self._restore()
+
+    def _restore(self) -> None:
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                saved = json.load(f).get("jobs", {})
+        except (OSError, ValueError):
+            return
+        for job in self.jobs:
+            if job.name in saved:
+                job.stats = JobStats(**{**asdict(JobStats()), **saved[job.name]})
+
+    def save_state(self) -> None:
+        data = {
+            "pid": os.getpid(),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "jobs": {job.name: asdict(job.stats) for job in self.jobs},
+        }
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+        metrics_dir = os.environ.get("METRICS_DIR")
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+            self.write_prometheus(os.path.join(metrics_dir, f"{METRIC_PREFIX}_scheduler.prom"))
+
+    def write_prometheus(self, path: str) -> None:
+        """Job counters and last-run gauges as a node_exporter textfile"""
+        p = f"{METRIC_PREFIX}_job"
+        lines = [
+            f"# TYPE {p}_runs_total counter", f"# TYPE {p}_failures_total counter",
+            f"# TYPE {p}_coalesced_total counter", f"# TYPE {p}_last_duration_seconds gauge",
+            f"# TYPE {p}_last_success gauge",
+        ]
+        for job in self.jobs:
+            s, label = job.stats, f'{{job="{job.name}"}}'
+            lines += [f"{p}_runs_total{label} {s.runs}", f"{p}_failures_total{label} {s.failures}",
+                      f"{p}_coalesced_total{label} {s.coalesced}"]
+            if s.last_duration is not None:
+                lines += [f"{p}_last_duration_seconds{label} {s.last_duration}",
+                          f"{p}_last_success{label} {int(s.last_outcome == 'ok')}"]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def stop(self, *_) -> None:
+        """Finish the running job, then exit"""
+        self._stopping = True
+
+    def run_job(self, job: Job) -> None:
+        import cli
+        from instrumentation import RECORDER
+
+        started = datetime.now()
+        t0 = time.perf_counter()
+        print(f"[{started.strftime('%Y-%m-%d %H:%M:%S')}] ▶ {job.name}: {job.command} {' '.join(job.args)}", flush=True)
+        try:
+            module = importlib.import_module(cli.COMMANDS[job.command][0])
+            module.main(job.args)
+            outcome = "ok"
+        except SystemExit as e:
+            # commands exit with a message (or a status) when their run failed
+            if not e.code:
+                outcome = "ok"
+            elif isinstance(e.code, int):
+                outcome = f"exit {e.code}"
+            else:
+                outcome = f"failed: {e.code}"
+        except Exception as e:
+            outcome = f"error: {e}"
+        duration = time.perf_counter() - t0
+        # records were exported by the command's own run_instrumented; keep memory flat
+        RECORDER.clear()
+
+        stats = job.stats
+        stats.runs += 1
+        stats.failures += outcome != "ok"
+        stats.last_start = started.isoformat(timespec="seconds")
+        stats.last_duration = round(duration, 3)
+        stats.last_outcome = outcome
+        print(f"  {job.name} finished in {duration:.1f}s: {outcome}", flush=True)
+
+    def run_forever(self, poll: float = 1.0) -> None:
+        now = datetime.now()
+        for job in self.jobs:
+            job.start(now)
+        self.save_state()
+
+        while not self._stopping:
+            now = datetime.now()
+            due = sorted((job for job in self.jobs if job.due <= now), key=lambda j: j.due)
+            if not due:
+                next_due = min(job.due for job in self.jobs)
+                time.sleep(max(0.0, min(poll, (next_due - now).total_seconds())))
+                continue
+            for job in due:
+                if self._stopping:
+                    break
+                self.run_job(job)
+                # every slot that passed while it (or an earlier job) ran is served by this run
+                job.stats.coalesced += job.advance(datetime.now()) - 1
+                self.save_state()
+
+
+def print_status(path: str) -> None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        print(f"No scheduler state at {path}")
+        return
+    print(f"Scheduler PID {state.get('pid')}, updated {state.get('updated')}")
+    print(f"{'job':<12} {'runs':>5} {'fail':>5} {'coal':>5}  {'last start':<20} {'took':>8}  {'next run':<20} outcome")
+    for name, s in state.get("jobs", {}).items():
+        took = f"{s['last_duration']:.1f}s" if s.get("last_duration") is not None else "—"
+        print(f"{name:<12} {s['runs']:>5} {s['failures']:>5} {s['coalesced']:>5}  {s.get('last_start') or '—':<20} "
+              f"{took:>8}  {s.get('next_run') or '—':<20} {s.get('last_outcome') or '—'}")
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the sync and wrap-up jobs on a schedule (single instance)")
+    parser.add_argument("--status", action="store_true", help="Print job run times and outcomes, then exit")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    if args.status:
+        print_status(state_path(cfg))
+        return
+
+    lock = FileLock(os.path.join(os.path.dirname(config_path()), ".scheduler.lock"), timeout=0)
+    try:
+        lock.acquire()
+    except LockHeld as e:
+        print(f"Scheduler already running: {e}")
+        raise SystemExit(1)
+
+    scheduler = Scheduler(load_jobs(cfg), state_path(cfg))
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    print(f"Scheduler started with jobs: {', '.join(job.name for job in scheduler.jobs)}", flush=True)
+    try:
+        scheduler.run_forever()
+    finally:
+        scheduler.save_state()
+        lock.release()
+
+
+if __name__ == "__main__":
+    main()
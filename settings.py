@@ -0,0 +1,22 @@
+import json
+import os
+from typing import Any, Dict
+
+DEFAULT_TOGGL_API_URL = "https://api.track.toggl.com/api/v9"
+
+_config = None
+
+def config_path() -> str:
+    """Path of config.json; TOGGL_CALENDAR_CONFIG overrides the default next to the scripts"""
+    return os.environ.get(
+        "TOGGL_CALENDAR_CONFIG",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    )
+
+def load_config() -> Dict[str, Any]:
+    """Read config.json on first use and cache it for the rest of the process"""
+    global _config
+    if _config is None:
+        with open(config_path()) as f:
+            _config = json.load(f)
+    return _config
@@ -1,13 +1,21 @@
 import subprocess
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import re
+import threading
 import time
 
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 
+from instrumentation import RECORDER, applescript_target
+from osascript_limiter import OsascriptLimiter
+
 @dataclass
 class CalendarEvent:
     """日历事件数据类"""
@@ -19,6 +27,7 @@ class CalendarEvent:
     is_toggl: bool = False
     full_start: Optional[str] = None
     full_end: Optional[str] = None
+    date: Optional[str] = None  # YYYY-MM-DD of the start date
 
 @dataclass
 class Reminder:
@@ -29,23 +38,199 @@ class Reminder:
     status: str
     priority: str = ""
     body: str = ""
+    due_day: Optional[str] = None  # YYYY-MM-DD of the due date
+
+ISO_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def applescript_iso_day(date_var: str) -> str:
+    """AppleScript expression rendering a date variable as YYYY-MM-DD"""
+    return (f'((year of {date_var}) as string) & "-" & '
+            f'text -2 thru -1 of ("0" & ((month of {date_var}) as integer)) & "-" & '
+            f'text -2 thru -1 of ("0" & (day of {date_var}))')
+
+# 脚本每行输出一个事件: 描述里的换行转义为 \n (反斜杠本身转义为 \\), 由 unescape_field 还原
+APPLESCRIPT_ONE_LINE = r"""
+        on oneLine(theText)
+            if theText is missing value then return ""
+            set theText to theText as string
+            set savedDelimiters to AppleScript's text item delimiters
+            repeat with pair in {{"\\", "\\\\"}, {return & linefeed, "\\n"}, {return, "\\n"}, {linefeed, "\\n"}}
+                set AppleScript's text item delimiters to item 1 of pair
+                set theItems to text items of theText
+                set AppleScript's text item delimiters to item 2 of pair
+                set theText to theItems as string
+            end repeat
+            set AppleScript's text item delimiters to savedDelimiters
+            return theText
+        end oneLine
+"""
+ESCAPED_FIELD_RE = re.compile(r"\\([\\n])")
+
+
+def unescape_field(text: str) -> str:
+    """还原 oneLine 转义过的字段"""
+    return ESCAPED_FIELD_RE.sub(lambda m: "\n" if m.group(1) == "n" else "\\", text)
+
+
+def _optional_config() -> dict:
+    """config.json 的内容; 文件不存在或无法解析时为空配置"""
+    from settings import load_config
+
+    try:
+        return load_config()
+    except (OSError, ValueError):
+        return {}
+
+_limiter: Optional[OsascriptLimiter] = None
+_limiter_lock = threading.Lock()
+
+def osascript_limiter() -> OsascriptLimiter:
+    """进程级 osascript 并发限制器
+
+    首次使用时按 config.json 的 OSASCRIPT_CONCURRENCY 创建, 之后不再替换,
+    因此进行中的计数和等待队列不会丢失。
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = OsascriptLimiter.from_config(_optional_config())
+    return _limiter
 
 class AppleScriptExecutor:
-    """AppleScript执行器"""
+    """AppleScript执行器
+
+    所有实例共享进程级并发限制器 ``limiter``（见 osascript_limiter）, 限制同时运行的
+    osascript 进程数 (按目标应用分别限流, 并根据延迟自适应调整)。
+    """
     
-    @staticmethod
-    def execute(script: str) -> str:
-        """执行AppleScript并返回结果"""
+    @property
+    def limiter(self) -> OsascriptLimiter:
+        return osascript_limiter()
+    
+    def run(self, script: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """执行AppleScript, 返回 (是否成功, 标准输出或错误信息), 并记录耗时"""
+        t0 = time.perf_counter()
+        with self.limiter.slot(applescript_target(script), script_kind(script)) as slot:
+            ok, output = self._run(script, timeout)
+            slot["ok"] = ok
+        if ok:
+            outcome = "ok"
+        else:
+            outcome = "timeout" if output == "AppleScript timeout" else "error"
+        RECORDER.record_call("osascript", applescript_target(script), time.perf_counter() - t0,
+                             len(script) + len(output), outcome)
+        return ok, output
+    
+    def _run(self, script: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """通过 osascript 子进程执行"""
         try:
-            osa_cmd = ['osascript', '-e', script]
-            output = subprocess.check_output(osa_cmd, text=True, stderr=subprocess.PIPE)
-            
-            return output
-        except subprocess.CalledProcessError as e:
-            print(f"AppleScript 执行失败: {e}")
-            if hasattr(e, 'stderr') and e.stderr:
-                print(f"错误输出: {e.stderr}")
+            result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False, "AppleScript timeout"
+        except Exception as e:
+            return False, f"Subprocess error: {e}"
+        
+        if result.returncode == 0:
+            return True, result.stdout
+        return False, result.stderr.strip()
+    
+    def execute(self, script: str) -> str:
+        """执行AppleScript并返回结果"""
+        ok, output = self.run(script)
+        if not ok:
+            print("AppleScript 执行失败")
+            if output:
+                print(f"错误输出: {output}")
             return ""
+        return output
+
+def script_key(script: str) -> str:
+    """脚本指纹: 忽略缩进和空行差异"""
+    normalized = "\n".join(line.strip() for line in script.strip().splitlines() if line.strip())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+SCRIPT_LITERAL_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\d+')
+
+def script_kind(script: str) -> str:
+    """脚本类别: 忽略字符串和数字字面量 (日期、标题、日历名), 同一模板生成的脚本属于同一类"""
+    normalized = "\n".join(line.strip() for line in script.strip().splitlines() if line.strip())
+    return hashlib.sha256(SCRIPT_LITERAL_RE.sub("", normalized).encode("utf-8")).hexdigest()[:16]
+
+class RecordingExecutor(AppleScriptExecutor):
+    """在真实 Mac 上执行并把 脚本 → 输出 记录为 fixture 文件"""
+    
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+    
+    def _run(self, script: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        t0 = time.perf_counter()
+        ok, output = super()._run(script, timeout)
+        fixture = {
+            "script": script,
+            "ok": ok,
+            "output": output,
+            "latency": round(time.perf_counter() - t0, 4),
+        }
+        path = os.path.join(self.fixture_dir, f"{script_key(script)}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        return ok, output
+
+class ReplayExecutor(AppleScriptExecutor):
+    """从 fixture 文件确定性地回放 AppleScript 输出, 可模拟延迟
+
+    ``latency`` 为固定延迟秒数; 为 ``"recorded"`` 时使用录制时的实际耗时。
+    """
+    
+    def __init__(self, fixture_dir: str, latency=0.0):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.fixtures: Dict[str, dict] = {}
+        if os.path.isdir(fixture_dir):
+            for name in os.listdir(fixture_dir):
+                if name.endswith(".json"):
+                    with open(os.path.join(fixture_dir, name), encoding="utf-8") as f:
+                        self.fixtures[name[:-len(".json")]] = json.load(f)
+    
+    def _run(self, script: str, timeout: Optional[float] = None) -> Tuple[bool, str]:
+        fixture = self.fixtures.get(script_key(script))
+        if fixture is None:
+            return False, f"No recorded fixture for script {script_key(script)}"
+        
+        delay = fixture.get("latency", 0.0) if self.latency == "recorded" else float(self.latency or 0)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return False, "AppleScript timeout"
+        time.sleep(delay)
+        return fixture["ok"], fixture["output"]
+
+def build_executor(cfg: Optional[dict] = None) -> AppleScriptExecutor:
+    """按环境变量或配置选择执行器
+
+    APPLESCRIPT_EXECUTOR: live (默认) / record / replay
+    APPLESCRIPT_FIXTURES: fixture 目录 (默认 ./fixtures/applescript)
+    APPLESCRIPT_REPLAY_LATENCY: 回放延迟秒数, 或 "recorded"
+    环境变量优先于 config.json 中的同名键。
+    并发限制器是进程级的, 不在这里配置（见 osascript_limiter）。
+    """
+    cfg = cfg or {}
+    
+    def setting(key, default):
+        return os.environ.get(key, cfg.get(key, default))
+    
+    mode = setting("APPLESCRIPT_EXECUTOR", "live").lower()
+    fixture_dir = setting("APPLESCRIPT_FIXTURES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "applescript"))
+    
+    if mode == "live":
+        return AppleScriptExecutor()
+    if mode == "record":
+        return RecordingExecutor(fixture_dir)
+    if mode == "replay":
+        latency = setting("APPLESCRIPT_REPLAY_LATENCY", 0.0)
+        return ReplayExecutor(fixture_dir, latency if latency == "recorded" else float(latency))
+    raise ValueError(f"未知的 AppleScript 执行器: {mode}")
 
 class DataSource(ABC):
     """数据源抽象基类"""
@@ -79,7 +264,7 @@ class CalendarDataSource(DataSource):
             print("日历AppleScript返回空输出")
             return []
         
-        return self._parse_calendar_output(output)
+        return self._parse_calendar_output(output, start_date, end_date)
     
     def get_data_simple(self, start_date: datetime, end_date: datetime) -> List[CalendarEvent]:
         """获取日历事件（简化版）"""
@@ -96,7 +281,7 @@ class CalendarDataSource(DataSource):
         """构建日历AppleScript"""
         calendar_list = '", "'.join(self.calendar_names)
         
-        return f'''
+        return APPLESCRIPT_ONE_LINE + f'''
         set output to ""
         
         set startDate to (current date)
@@ -148,11 +333,40 @@ class CalendarDataSource(DataSource):
                                 end try
                             end if
                             
-                            set output to output & eventStart & "|" & eventEnd & "|" & eventSummary & "|" & (calName as string) & "|" & eventDescription & linefeed
+                            set eventDay to {applescript_iso_day("eventStartDate")}
+                            set output to output & eventDay & "|" & eventStart & "|" & eventEnd & "|" & my oneLine(eventSummary) & "|" & (calName as string) & "|" & my oneLine(eventDescription) & linefeed
                         on error eventErr
                             set output to output & "ERROR processing event in " & (calName as string) & ": " & eventErr & linefeed
                         end try
                     end repeat
+                    
+                    -- 重复事件只返回主事件及其规则，各次发生由 Python 端展开
+                    try
+                        set theSeries to every event of theCal whose recurrence is not missing value and start date ≤ endDate
+                    on error
+                        set theSeries to {{}}
+                    end try
+                    repeat with theEvent in theSeries
+                        try
+                            set eventStartDate to start date of theEvent
+                            set eventExcluded to ""
+                            try
+                                repeat with excludedDate in (excluded dates of theEvent)
+                                    set excludedDate to contents of excludedDate
+                                    set eventExcluded to eventExcluded & {applescript_iso_day("excludedDate")} & "@" & (time of excludedDate) & ","
+                                end repeat
+                            end try
+                            try
+                                set eventDescription to description of theEvent
+                            on error
+                                set eventDescription to ""
+                            end try
+                            set eventDay to {applescript_iso_day("eventStartDate")}
+                            set output to output & "RECUR|" & (uid of theEvent) & "|" & eventDay & "|" & (time of eventStartDate) & "|" & ((end date of theEvent) - eventStartDate) & "|" & (allday event of theEvent) & "|" & (recurrence of theEvent) & "|" & eventExcluded & "|" & my oneLine(summary of theEvent) & "|" & (calName as string) & "|" & my oneLine(eventDescription) & linefeed
+                        on error eventErr
+                            set output to output & "ERROR processing recurring event in " & (calName as string) & ": " & eventErr & linefeed
+                        end try
+                    end repeat
                 on error calErr
                     set output to output & "ERROR accessing calendar " & (calName as string) & ": " & calErr & linefeed
                 end try
@@ -166,7 +380,7 @@ class CalendarDataSource(DataSource):
         """构建简化日历AppleScript"""
         calendar_list = '", "'.join(self.calendar_names)
         
-        return f'''
+        return APPLESCRIPT_ONE_LINE + f'''
         set output to ""
         
         set startDate to (current date)
@@ -211,7 +425,7 @@ class CalendarDataSource(DataSource):
                                 set eventTimeInfo to "Timed"
                             end if
                             
-                            set output to output & eventTimeInfo & "|" & eventStartDate & "|" & eventEndDate & "|" & eventSummary & "|" & (calName as string) & "|" & eventDescription & linefeed
+                            set output to output & eventTimeInfo & "|" & eventStartDate & "|" & eventEndDate & "|" & my oneLine(eventSummary) & "|" & (calName as string) & "|" & my oneLine(eventDescription) & linefeed
                         on error eventErr
                             set output to output & "ERROR_EVENT|" & (calName as string) & "|" & eventErr & linefeed
                         end try
@@ -225,32 +439,90 @@ class CalendarDataSource(DataSource):
         return output
         '''
     
-    def _parse_calendar_output(self, output: str) -> List[CalendarEvent]:
-        """解析日历输出"""
+    def _parse_calendar_output(self, output: str, start_date: datetime = None,
+                               end_date: datetime = None) -> List[CalendarEvent]:
+        """解析日历输出；给定日期范围时，RECUR 行（重复事件）展开为范围内的各次发生"""
         events = []
+        recurring = []
         for line in output.strip().split("\n"):
             if not line.strip() or line.startswith("ERROR"):
                 if line.startswith("ERROR"):
                     print("⚠️", line)
                 continue
             
+            if line.startswith("RECUR|"):
+                if start_date is not None:
+                    try:
+                        recurring.extend(self._expand_recurring(line.strip(), start_date, end_date))
+                    except (ValueError, IndexError) as e:
+                        print(f"解析重复事件失败: {line}, 错误: {e}")
+                continue
+            
             try:
                 parts = line.strip().split("|")
+                date = parts.pop(0) if ISO_DAY_RE.match(parts[0]) else None
                 if len(parts) >= 5:
-                    start, end, summary, calendar, description = parts[0], parts[1], parts[2], parts[3], parts[4]
+                    start, end, summary, calendar = parts[0], parts[1], unescape_field(parts[2]), parts[3]
+                    description = unescape_field("|".join(parts[4:]))
                     events.append(CalendarEvent(
                         start=start,
                         end=end,
                         summary=summary,
                         calendar=calendar,
                         description=description,
-                        is_toggl="Imported from Toggl - ID" in description
+                        is_toggl="Imported from Toggl - ID" in description,
+                        date=date
                     ))
             except (ValueError, IndexError) as e:
                 print(f"解析日历事件失败: {line}, 错误: {e}")
         
+        if recurring:
+            from prompt_compaction import parse_clock_time
+
+            # 按日期查询时，重复系列的首次发生也会出现在普通事件里（时间格式随系统区域设置）
+            def key(e):
+                return e.date, parse_clock_time(e.start) if e.start != "All Day" else e.start, e.summary, e.calendar
+
+            seen = {key(e) for e in recurring}
+            events = [e for e in events if key(e) not in seen] + recurring
         return events
     
+    @staticmethod
+    def _expand_recurring(line: str, start_date: datetime, end_date: datetime) -> List[CalendarEvent]:
+        """展开一行 RECUR|uid|日期|秒|时长秒|全天|规则|排除日期|标题|日历|描述"""
+        from recurrence import CACHE, RecurrenceRule, Series
+
+        parts = line.split("|", 10)
+        uid, day, seconds, duration, all_day, rule, excluded, summary, calendar = parts[1:10]
+        summary = unescape_field(summary)
+        description = unescape_field(parts[10]) if len(parts) > 10 else ""
+
+        def wall(day_text: str, seconds_text: str) -> datetime:
+            return datetime.fromisoformat(day_text) + timedelta(seconds=int(float(seconds_text)))
+
+        series = Series(
+            uid=uid,
+            rule=RecurrenceRule.parse(rule),
+            start=wall(day, seconds),
+            duration=timedelta(seconds=int(float(duration))),
+            all_day=all_day == "true",
+            exdates=tuple(sorted(wall(*item.split("@")) for item in excluded.split(",") if "@" in item)),
+        )
+        window_start = datetime.combine(start_date.date(), datetime.min.time())
+        window_end = datetime.combine(end_date.date() + timedelta(days=1), datetime.min.time())
+        return [
+            CalendarEvent(
+                start="All Day" if series.all_day else occurrence_start.strftime("%H:%M:%S"),
+                end="All Day" if series.all_day else occurrence_end.strftime("%H:%M:%S"),
+                summary=summary,
+                calendar=calendar,
+                description=description,
+                is_toggl="Imported from Toggl - ID" in description,
+                date=occurrence_start.date().isoformat(),
+            )
+            for occurrence_start, occurrence_end in CACHE.occurrences(series, window_start, window_end)
+        ]
+    
     def _parse_simple_calendar_output(self, output: str) -> List[CalendarEvent]:
         """解析简化日历输出"""
         events = []
@@ -263,7 +535,9 @@ class CalendarDataSource(DataSource):
             try:
                 parts = line.strip().split("|")
                 if len(parts) >= 6:
-                    event_type, start_str, end_str, summary, calendar, description = parts[0], parts[1], parts[2], parts[3], parts[4], parts[5]
+                    event_type, start_str, end_str, calendar = parts[0], parts[1], parts[2], parts[4]
+                    summary = unescape_field(parts[3])
+                    description = unescape_field("|".join(parts[5:]))
                     
                     if event_type == "AllDay":
                         start_time = "All Day"
@@ -311,6 +585,86 @@ class CalendarDataSource(DataSource):
         else:
             print("无法访问日历应用")
 
+class IcsDataSource(DataSource):
+    """iCalendar 文件数据源（导出或订阅的 .ics 文件，不需要 AppleScript）
+
+    files: 路径列表，或 {"path": ..., "calendar": ...}；未指定 calendar 时，
+    事件的日历依次取 CATEGORIES、X-WR-CALNAME、文件名。
+    文件通过 mmap 读取，首次读取时在 index_dir 下建立按开始时间排序的偏移索引，
+    之后每次查询只解析日期范围内的事件（见 ics_reader）。
+    """
+
+    def __init__(self, files: List, index_dir: str, calendar_names: List[str] = None,
+                 executor: Optional[AppleScriptExecutor] = None):
+        from ics_reader import IcsFile
+
+        super().__init__(executor)
+        self.calendar_names = set(calendar_names) if calendar_names else None
+        self.files = []
+        for spec in files:
+            spec = {"path": spec} if isinstance(spec, str) else spec
+            self.files.append((IcsFile(spec["path"], index_dir), spec.get("calendar")))
+
+    @classmethod
+    def from_config(cls, cfg: dict, config_dir: str, calendar_names: List[str] = None,
+                    executor: Optional[AppleScriptExecutor] = None) -> Optional["IcsDataSource"]:
+        """按 ICS_FILES 创建（相对路径以 config.json 所在目录为基准），未配置时返回 None"""
+        specs = cfg.get("ICS_FILES")
+        if not specs:
+            return None
+        files = []
+        for spec in specs:
+            spec = {"path": spec} if isinstance(spec, str) else dict(spec)
+            spec["path"] = os.path.join(config_dir, os.path.expanduser(spec["path"]))
+            files.append(spec)
+        index_dir = cfg.get("ICS_INDEX_DIR") or os.path.join(config_dir, ".ics_index")
+        return cls(files, index_dir, calendar_names, executor)
+
+    def get_data(self, start_date: datetime, end_date: datetime) -> List[CalendarEvent]:
+        """获取 start_date 当天到 end_date 当天开始的事件"""
+        from ics_reader import day_range
+
+        start, end = day_range(start_date.date(), end_date.date())
+        events = []
+        for ics, calendar in self.files:
+            try:
+                for event in ics.events(start, end):
+                    events.append(self._to_calendar_event(event, calendar, ics))
+            except OSError as e:
+                print(f"读取 {ics.path} 失败: {e}")
+        if self.calendar_names is not None:
+            events = [e for e in events if e.calendar in self.calendar_names]
+        return events
+
+    @staticmethod
+    def _to_calendar_event(event, calendar: Optional[str], ics) -> CalendarEvent:
+        props = event.props
+        if not calendar:
+            calendar = (props.get("CATEGORIES", "").split(",")[0].strip() or ics.calendar_name
+                        or os.path.splitext(os.path.basename(ics.path))[0])
+        description = props.get("DESCRIPTION", "")
+        return CalendarEvent(
+            start="All Day" if event.all_day else event.start.strftime("%H:%M:%S"),
+            end="All Day" if event.all_day else event.end.strftime("%H:%M:%S"),
+            summary=props.get("SUMMARY", ""),
+            calendar=calendar,
+            description=description,
+            is_toggl="Imported from Toggl - ID" in description,
+            date=event.start.date().isoformat(),
+        )
+
+    def debug_access(self) -> None:
+        """打印各文件的事件数和索引位置"""
+        from ics_reader import day_range
+
+        for ics, calendar in self.files:
+            try:
+                list(ics.events(*day_range(datetime.now().date(), datetime.now().date())))
+                print(f"- {ics.path}: {len(ics)} 个事件, 日历 {calendar or ics.calendar_name or '(CATEGORIES)'}, "
+                      f"索引 {ics.index_path}")
+            except OSError as e:
+                print(f"- {ics.path}: 无法读取 ({e})")
+
 class ReminderDataSource(DataSource):
     """提醒数据源"""
     
@@ -399,13 +753,14 @@ class ReminderDataSource(DataSource):
                     set reminderStatus to "Overdue" 
                     
                     set dueDateStr to (date string of reminderDueDate) & " " & (time string of reminderDueDate)
+                    set dueDay to {applescript_iso_day("reminderDueDate")}
 
                     if reminderBody is missing value then 
                         set reminderBody to ""
                     else
                         set reminderBody to (reminderBody as text)
                     end if
-                    set outputLines to outputLines & "\n" & dueDateStr & "|" & reminderName & "|" & listName & "|" & reminderStatus & "|" & reminderPriority & "|" & reminderBody
+                    set outputLines to outputLines & "\n" & dueDay & "|" & dueDateStr & "|" & reminderName & "|" & listName & "|" & reminderStatus & "|" & reminderPriority & "|" & reminderBody
                 end repeat
                 
                 set completed_rem to properties of (reminders in currentList whose due date is greater than or equal to startDate and due date is less than or equal to endDate and completed is true)
@@ -419,6 +774,7 @@ class ReminderDataSource(DataSource):
                     set reminderStatus to "Completed" 
                     
                     set dueDateStr to (date string of reminderDueDate) & " " & (time string of reminderDueDate)
+                    set dueDay to {applescript_iso_day("reminderDueDate")}
                     
 
                     if reminderBody is missing value then 
@@ -427,7 +783,7 @@ class ReminderDataSource(DataSource):
                         set reminderBody to (reminderBody as text)
                     end if
                     
-                    set outputLines to outputLines & "\n" & dueDateStr & "|" & reminderName & "|" & listName & "|" & reminderStatus & "|" & reminderPriority & "|" & reminderBody
+                    set outputLines to outputLines & "\n" & dueDay & "|" & dueDateStr & "|" & reminderName & "|" & listName & "|" & reminderStatus & "|" & reminderPriority & "|" & reminderBody
                 end repeat
             end repeat
             
@@ -451,6 +807,7 @@ class ReminderDataSource(DataSource):
             
             try:
                 parts = line.strip().split("|")
+                due_day = parts.pop(0) if ISO_DAY_RE.match(parts[0]) else None
                 if len(parts) >= 6:
                     due_date, name, list_name, status, priority, body = parts[0], parts[1], parts[2], parts[3], parts[4], parts[5]
                     reminders.append(Reminder(
@@ -459,7 +816,8 @@ class ReminderDataSource(DataSource):
                         list_name=list_name,
                         status=status,
                         priority=priority,
-                        body=body
+                        body=body,
+                        due_day=due_day
                     ))
             except (ValueError, IndexError) as e:
                 print(f"解析提醒失败: {line}, 错误: {e}")
@@ -529,7 +887,7 @@ class ReportGenerator:
             for e in planned:
                 event_line = f"  {e.start}–{e.end} | {e.summary} | {e.calendar}"
                 if show_descriptions and e.description:
-                    event_line += f" | Note: {e.description[:50]}..."
+                    event_line += f" | Note: {' '.join(e.description.split())[:50]}..."
                 lines.append(event_line)
         else:
             lines.append("  (none)")
@@ -539,7 +897,7 @@ class ReportGenerator:
             for e in actual:
                 event_line = f"  {e.start}–{e.end} | {e.summary} | {e.calendar}"
                 if show_descriptions and e.description:
-                    event_line += f" | Note: {e.description[:50]}..."
+                    event_line += f" | Note: {' '.join(e.description.split())[:50]}..."
                 lines.append(event_line)
         else:
             lines.append("  (none)")
@@ -578,12 +936,20 @@ class ReportGenerator:
         else:
             lines.append("  (none)")
 
+def default_calendar_source(executor: AppleScriptExecutor, calendar_names: List[str] = None) -> DataSource:
+    """config.json 配置了 ICS_FILES 时读取 .ics 文件，否则通过 AppleScript 读取日历应用"""
+    from settings import config_path
+
+    source = IcsDataSource.from_config(_optional_config(), os.path.dirname(config_path()), calendar_names, executor)
+    return source or CalendarDataSource(executor, calendar_names)
+
 class CalendarSummarizer:
     """日历摘要生成器主类"""
     
-    def __init__(self, calendar_names: List[str] = None):
-        self.executor = AppleScriptExecutor()
-        self.calendar_source = CalendarDataSource(self.executor, calendar_names)
+    def __init__(self, calendar_names: List[str] = None, executor: Optional[AppleScriptExecutor] = None,
+                 calendar_source: Optional[DataSource] = None):
+        self.executor = executor or build_executor(_optional_config())
+        self.calendar_source = calendar_source or default_calendar_source(self.executor, calendar_names)
         self.reminder_source = ReminderDataSource(self.executor)
         self.analyzer = EventAnalyzer()
         self.report_generator = ReportGenerator()
@@ -619,16 +985,12 @@ class CalendarSummarizer:
         
         # 获取数据
         events, reminders = self._get_data(start_date, end_date)
-        # t0 = time.perf_counter()
-        # events = self._get_calendar_events(start_date, end_date)
-        # print(f"找到 {len(events)} 个日历事件")
-        # t1 = time.perf_counter()
-        # print(f"花费 {t1-t0} 秒")
-        # reminders = self.reminder_source.get_data(start_date, end_date)
-        # t2 = time.perf_counter()
-        # print(f"找到 {len(reminders)} 个相关提醒")
-        # print(f"花费 {t2-t1} 秒")
 
+        return self.build_summary(start_date_str, end_date_str, events, reminders)
+
+    def build_summary(self, start_date_str: str, end_date_str: str,
+                      events: List[CalendarEvent], reminders: List[Reminder]) -> str:
+        """由已获取的事件和提醒生成摘要"""
         # 分析数据
         planned, actual = self.analyzer.split_events(events)
         reminders_dict = self.analyzer.categorize_reminders(reminders)
@@ -643,7 +1005,7 @@ class CalendarSummarizer:
         # 尝试标准方法
         events = self.calendar_source.get_data(start_date, end_date)
         
-        if not events:
+        if not events and isinstance(self.calendar_source, CalendarDataSource):
             print("尝试简化方法...")
             events = self.calendar_source.get_data_simple(start_date, end_date)
         
@@ -656,8 +1018,14 @@ class CalendarSummarizer:
         print("\n检查提醒权限和可用列表...")
         self.reminder_source.debug_access()
 
-def main():
+def main(argv=None):
     """主函数"""
+    import argparse
+    parser = argparse.ArgumentParser(description="生成日历与提醒事项摘要")
+    parser.add_argument("start", nargs="?", help="开始日期 YYYY-MM-DD（默认：昨天）")
+    parser.add_argument("end", nargs="?", help="结束日期 YYYY-MM-DD（默认：与开始日期相同）")
+    args = parser.parse_args(argv)
+
     # 创建摘要生成器
     summarizer = CalendarSummarizer()
     
@@ -665,12 +1033,12 @@ def main():
     # summarizer.debug_permissions()
     # print("\n" + "="*50 + "\n")
     
-    # 获取昨天的日期
-    date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    # 默认使用昨天的日期
+    date = args.start or (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
     
     # 生成摘要
     print("生成日程摘要...")
-    summary = summarizer.generate_summary(date)
+    summary = summarizer.generate_summary(date, args.end)
     print(summary)
 
 if __name__ == "__main__":
@@ -1,44 +1,101 @@
-import requests
-import json
-from datetime import datetime, timedelta
-import subprocess
+from datetime import date, datetime, timedelta, timezone
 import sys
 import hashlib
+import os
+import threading
+import time
+from typing import Dict, Tuple
 
-import json
+from summarize_calendar import AppleScriptExecutor, build_executor
+from instrumentation import RECORDER, http_request, run_instrumented
+from settings import DEFAULT_TOGGL_API_URL, config_path, load_config
+from project_cache import ProjectCache
+from routing_rules import Route, RoutingRules
+from coalesce import batches, coalesce_entries
+from sync_wal import SyncAction, SyncLog
+from file_lock import FileLock, LockHeld
+from accounts import Account, load_accounts
+from toggl_reports import iter_report_entries
+from archive import Archive
+from budgets import entry_seconds
 
-import os
+# Config-backed module attributes, resolved on first access rather than at import
+_CONFIG_ATTRS = {
+    "config": lambda cfg: cfg,
+    "TOGGL_API_TOKEN": lambda cfg: cfg["TOGGL_API_TOKEN"],
+    "TOGGL_WORKSPACE_ID": lambda cfg: cfg["TOGGL_WORKSPACE_ID"],
+    "id_to_name": lambda cfg: cfg.get("id_to_name", {}),
+    "TOGGL_API_URL": lambda cfg: cfg.get("TOGGL_API_URL", DEFAULT_TOGGL_API_URL),
+}
+
+def __getattr__(name):
+    if name in _CONFIG_ATTRS:
+        return _CONFIG_ATTRS[name](load_config())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_default_executor = None
+
+def get_executor() -> AppleScriptExecutor:
+    """Executor used for osascript calls when none is passed in (see build_executor)"""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = build_executor(load_config())
+    return _default_executor
+
+# Entries planned and written at a time by a bulk import
+DEFAULT_IMPORT_BATCH_SIZE = 1000
 
-config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-with open(config_path) as f:
-    config = json.load(f)
-TOGGL_API_TOKEN = config["TOGGL_API_TOKEN"]
-TOGGL_WORKSPACE_ID = config["TOGGL_WORKSPACE_ID"]
-id_to_name = config["id_to_name"]
+_accounts = None
 
-def get_last_week_entries(start_date=None, end_date=None):
+def get_accounts():
+    """Accounts to sync (see accounts.load_accounts), built once per process"""
+    global _accounts
+    if _accounts is None:
+        _accounts = load_accounts(load_config(), os.path.dirname(config_path()))
+    return _accounts
+
+_archive = None
+
+def get_archive():
+    """Columnar history archive fed by every sync, or None when ARCHIVE is false"""
+    global _archive
+    if _archive is None:
+        _archive = Archive.from_config(load_config(), os.path.dirname(config_path())) or False
+    return _archive or None
+
+def get_project_cache() -> ProjectCache:
+    """Project metadata cache of the first account (see ProjectCache)"""
+    return get_accounts()[0].project_cache
+
+def get_last_week_entries(start_date=None, end_date=None, account=None):
     """Fetch time entries from the last week using Toggl API"""
+    account = account or get_accounts()[0]
 
-    print(f"Fetching entries from {start_date} to {end_date}")
+    account.log(f"Fetching entries from {start_date} to {end_date}")
     
+    import requests
+
     # Toggl API endpoint
-    url = f"https://api.track.toggl.com/api/v9/me/time_entries"
+    cfg = account.cfg
+    url = f"{cfg.get('TOGGL_API_URL', DEFAULT_TOGGL_API_URL)}/me/time_entries"
     params = {
         "start_date": start_date,
         "end_date": end_date
     }
     
     # Make API request
+    account.limiter.acquire()
     try:
-        response = requests.get(
+        response = http_request(
+            "GET",
             url,
             params=params,
-            auth=(TOGGL_API_TOKEN, "api_token")
+            auth=(cfg["TOGGL_API_TOKEN"], "api_token")
         )
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from Toggl: {e}")
+        account.log(f"Error fetching data from Toggl: {e}")
         return []
 
 
@@ -49,8 +106,11 @@ def get_yesterday_entries():
     start_date = yesterday.strftime("%Y-%m-%dT00:00:00.000Z")
     end_date = yesterday.strftime("%Y-%m-%dT23:59:59.999Z")
     
+    import requests
+
     # Toggl API endpoint
-    url = f"https://api.track.toggl.com/api/v9/me/time_entries"
+    cfg = load_config()
+    url = f"{cfg.get('TOGGL_API_URL', DEFAULT_TOGGL_API_URL)}/me/time_entries"
     params = {
         "start_date": start_date,
         "end_date": end_date
@@ -58,10 +118,11 @@ def get_yesterday_entries():
     
     # Make API request
     try:
-        response = requests.get(
+        response = http_request(
+            "GET",
             url,
             params=params,
-            auth=(TOGGL_API_TOKEN, "api_token")
+            auth=(cfg["TOGGL_API_TOKEN"], "api_token")
         )
         response.raise_for_status()
         return response.json()
@@ -69,13 +130,57 @@ def get_yesterday_entries():
         print(f"Error fetching data from Toggl: {e}")
         return []
 
-def get_project_name(entry):
-    """Extract project name from time entry"""
+def get_project_name(entry, account=None):
+    """Calendar name for a time entry's project
+
+    ``id_to_name`` entries in config.json take precedence; otherwise the
+    project name comes from the Toggl project cache and is mapped through
+    ``PROJECT_CALENDARS`` (project name → calendar name), defaulting to the
+    project name itself. The sync skips entries whose calendar does not
+    exist (see CalendarSink.has_calendar) instead of failing on every run.
+    """
     if 'project_id' in entry and entry['project_id']:
+        account = account or get_accounts()[0]
         project_id = str(entry['project_id'])  # Ensure it's a string
-        return id_to_name.get(project_id)
+        cfg = account.cfg
+        overrides = cfg.get("id_to_name", {})
+        if project_id in overrides:
+            return overrides[project_id]
+        name = account.project_cache.name(project_id)
+        if name is None:
+            return None
+        return cfg.get("PROJECT_CALENDARS", {}).get(name, name)
     return None
 
+def get_sync_log() -> SyncLog:
+    """Write-ahead log of the first account (see SyncLog)"""
+    return get_accounts()[0].sync_log
+
+def get_routing_rules() -> RoutingRules:
+    """Compiled ROUTING_RULES of the first account"""
+    return get_accounts()[0].routing_rules
+
+def route_entry(entry, account=None) -> Route:
+    """Calendar, title and notes for a time entry (see RoutingRules)"""
+    account = account or get_accounts()[0]
+    calendar = get_project_name(entry, account)
+    rules = account.routing_rules
+    if not len(rules):
+        return Route(calendar, entry.get('description', 'No description'), get_tags(entry))
+
+    project = client = ""
+    if entry.get('project_id'):
+        info = account.project_cache.get(entry['project_id']) or {}
+        project = info.get("name") or calendar or ""
+        client = info.get("client_name") or ""
+    return rules.route(
+        calendar,
+        project=project,
+        client=client,
+        tags=entry.get('tags') or [],
+        description=entry.get('description', 'No description'),
+    )
+
 def get_tags(entry)-> str:
     """Extract tags from time entry to #tag1, #tag2 format"""
     if 'tags' in entry and entry['tags']:
@@ -88,18 +193,32 @@ def parse_datetime(iso_string):
         dt = datetime.fromisoformat(iso_string.replace('Z', '+00:00'))
         # Convert to local timezone
         return dt.astimezone()
-    except ValueError as e:
-        print(f"Error parsing datetime {iso_string}: {e}")
-        return None
+    except ValueError:
+        return None  # callers log the skipped entry under its account
+
+# Event IDs are hex digits of an MD5. Eight digits collided within large
+# imports, so new events get sixteen; events written before carry the first
+# eight, which only count as a match together with the event's times or title.
+EVENT_ID_LENGTH = 16
+LEGACY_EVENT_ID_LENGTH = 8
 
 def generate_event_id(title, start_time, end_time):
     """Generate a unique ID for the event based on title and time"""
     # Create a unique string from event details
     event_string = f"{title}_{start_time.isoformat()}_{end_time.isoformat()}"
     # Generate a hash
-    return hashlib.md5(event_string.encode()).hexdigest()[:8]
+    return hashlib.md5(event_string.encode()).hexdigest()[:EVENT_ID_LENGTH]
+
+def generate_merged_event_id(title, merged_ids):
+    """ID for a coalesced event, keyed on its first source entry so it stays the
+    same when later fragments extend the run"""
+    return hashlib.md5(f"{title}_toggl_{merged_ids[0]}".encode()).hexdigest()[:EVENT_ID_LENGTH]
+
+def legacy_event_id(event_id):
+    """The shorter ID the same event was written with by earlier versions"""
+    return event_id[:LEGACY_EVENT_ID_LENGTH]
 
-def check_existing_event(calendar_name, title, start_time, end_time):
+def check_existing_event(calendar_name, title, start_time, end_time, executor=None, event_id=None):
     """Check if an event already exists in the calendar"""
     
     # Format dates for AppleScript
@@ -120,7 +239,8 @@ def check_existing_event(calendar_name, title, start_time, end_time):
     safe_calendar = calendar_name.replace('"', '\\"')
     
     # Generate unique event ID
-    event_id = generate_event_id(title, start_time, end_time)
+    event_id = event_id or generate_event_id(title, start_time, end_time)
+    legacy_id = legacy_event_id(event_id)
     
     # AppleScript to check for existing event
     applescript = f'''
@@ -148,10 +268,12 @@ tell application "Calendar"
         -- Check for existing events with same title, start time, and end time
         set existingEvents to (every event of targetCalendar whose summary is "{safe_title}" and start date is startDate and end date is endDate)
         
-        -- Also check for events with our unique ID in the description
+        -- Also check for events with our unique ID in the description; the shorter
+        -- legacy ID is not unique enough on its own, so it must come with the times
         set existingEventsById to (every event of targetCalendar whose description contains "{event_id}")
+        set existingEventsByLegacyId to (every event of targetCalendar whose start date is startDate and end date is endDate and description contains "{legacy_id}")
         
-        if (count of existingEvents) > 0 or (count of existingEventsById) > 0 then
+        if (count of existingEvents) > 0 or (count of existingEventsById) > 0 or (count of existingEventsByLegacyId) > 0 then
             return "EXISTS"
         else
             return "NOT_EXISTS"
@@ -163,26 +285,22 @@ tell application "Calendar"
 end tell
 '''
     
-    try:
-        result = subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if result.returncode == 0:
-            return result.stdout.strip()
-        else:
-            return f"ERROR: {result.stderr.strip()}"
-            
-    except subprocess.TimeoutExpired:
-        return "ERROR: AppleScript timeout"
-    except Exception as e:
-        return f"ERROR: Subprocess error: {e}"
-
-def create_calendar_event(calendar_name, title, start_time, end_time, tag_str=""):
-    """Create calendar event using AppleScript"""
+    ok, output = (executor or get_executor()).run(applescript, timeout=30)
+    if ok:
+        return output.strip()
+    else:
+        return f"ERROR: {output}"
+
+def _event_description(event_id, tag_str=""):
+    """Event notes with the unique ID, escaped for an AppleScript string; the ID
+    line is what duplicate checks look for"""
+    description = f"Imported from Toggl - ID: {event_id}"
+    if tag_str:
+        description += f"\n{tag_str}"
+    return description.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def create_calendar_event(calendar_name, title, start_time, end_time, tag_str="", executor=None, event_id=None):
+    """Create calendar event using AppleScript; ``tag_str`` is added to the notes below the ID line"""
     
     # Format dates for AppleScript using proper date construction
     start_year = start_time.year
@@ -197,17 +315,13 @@ def create_calendar_event(calendar_name, title, start_time, end_time, tag_str=""
     end_hour = end_time.hour
     end_minute = end_time.minute
     
-    print(f"  Debug: Creating event from {start_time} to {end_time}")
-    
     # Escape quotes in title and calendar name for AppleScript
     safe_title = title.replace('"', '\\"')
     safe_calendar = calendar_name.replace('"', '\\"')
     
     # Generate unique event ID
-    event_id = generate_event_id(title, start_time, end_time)
-
-    # Generate description with unique ID
-    description = f"Imported from Toggl - ID: {event_id} \n{tag_str}"
+    event_id = event_id or generate_event_id(title, start_time, end_time)
+    safe_description = _event_description(event_id, tag_str)
     
     # AppleScript to create calendar event
     applescript = f'''
@@ -252,7 +366,7 @@ tell application "Calendar"
         
         -- Set description with unique ID to prevent future duplicates
         try
-            set description of newEvent to "Imported from Toggl - ID: {event_id}"
+            set description of newEvent to "{safe_description}"
         on error
             -- Continue without description if it fails
         end try
@@ -264,23 +378,94 @@ tell application "Calendar"
 end tell
 '''
     
-    try:
-        result = subprocess.run(
-            ['osascript', '-e', applescript],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if result.returncode == 0:
-            return True, result.stdout.strip()
-        else:
-            return False, result.stderr.strip()
-            
-    except subprocess.TimeoutExpired:
-        return False, "AppleScript timeout"
-    except Exception as e:
-        return False, f"Subprocess error: {e}"
+    ok, output = (executor or get_executor()).run(applescript, timeout=30)
+    return ok, output.strip()
+
+def update_calendar_event(calendar_name, title, start_time, end_time, source_ids, tag_str="", executor=None,
+                          event_id=None):
+    """Move the event written for any of ``source_ids`` to this span and ID
+
+    Used when fragments of a merged entry were synced on their own before,
+    or the merged event grew: the first event found is updated in place and
+    further matches (events of the other fragments) are deleted. Events
+    written with a legacy ID must also carry the title. Only events starting
+    inside the new span are searched. Returns UPDATED, NOT_FOUND or ERROR: ….
+    """
+    safe_title = title.replace('"', '\\"')
+    safe_calendar = calendar_name.replace('"', '\\"')
+    event_id = event_id or generate_event_id(title, start_time, end_time)
+    safe_description = _event_description(event_id, tag_str)
+    ids = list(dict.fromkeys([event_id, *source_ids]))
+    id_list = '", "'.join(ids)
+    legacy_id_list = '", "'.join(dict.fromkeys(legacy_event_id(i) for i in ids))
+
+    applescript = f'''
+tell application "Calendar"
+    try
+        set targetCalendar to calendar "{safe_calendar}"
+
+        set startDate to (current date)
+        set year of startDate to {start_time.year}
+        set month of startDate to {start_time.month}
+        set day of startDate to {start_time.day}
+        set hours of startDate to {start_time.hour}
+        set minutes of startDate to {start_time.minute}
+        set seconds of startDate to 0
+
+        set endDate to (current date)
+        set year of endDate to {end_time.year}
+        set month of endDate to {end_time.month}
+        set day of endDate to {end_time.day}
+        set hours of endDate to {end_time.hour}
+        set minutes of endDate to {end_time.minute}
+        set seconds of endDate to 0
+
+        -- the fragments and any earlier span all start inside the new span
+        set matches to {{}}
+        repeat with sourceId in {{"{id_list}"}}
+            set matches to matches & (every event of targetCalendar whose start date ≥ startDate and start date ≤ endDate and description contains (sourceId as string))
+        end repeat
+        repeat with legacyId in {{"{legacy_id_list}"}}
+            set matches to matches & (every event of targetCalendar whose start date ≥ startDate and start date ≤ endDate and summary is "{safe_title}" and description contains (legacyId as string))
+        end repeat
+        if (count of matches) is 0 then return "NOT_FOUND"
+
+        set theEvent to item 1 of matches
+        set keptId to uid of theEvent
+        set summary of theEvent to "{safe_title}"
+        set start date of theEvent to startDate
+        set end date of theEvent to endDate
+        set description of theEvent to "{safe_description}"
+        repeat with duplicateEvent in (rest of matches)
+            if uid of duplicateEvent is not keptId then delete duplicateEvent
+        end repeat
+        return "UPDATED"
+    on error errMsg
+        return "ERROR: " & errMsg
+    end try
+end tell
+'''
+    ok, output = (executor or get_executor()).run(applescript, timeout=30)
+    if ok:
+        return output.strip()
+    else:
+        return f"ERROR: {output}"
+
+def list_calendars(executor=None):
+    """Names of the calendars in Calendar.app, or None when they cannot be listed"""
+    applescript = '''
+tell application "Calendar"
+    set output to ""
+    repeat with calName in (name of every calendar)
+        set output to output & calName & linefeed
+    end repeat
+    return output
+end tell
+'''
+    ok, output = (executor or get_executor()).run(applescript, timeout=30)
+    names = {line.strip() for line in output.splitlines() if line.strip()} if ok else set()
+    return names or None
+
 
 def format_duration(seconds):
     """Format duration in seconds to readable format"""
@@ -291,108 +476,576 @@ def format_duration(seconds):
     else:
         return f"{minutes}m"
     
-def send_macos_notification(title, message):
-    """Send a native macOS notification using AppleScript"""
+def send_macos_notification(title, message, executor=None, log=print):
+    """Send a native macOS notification using AppleScript; failures go to ``log``"""
     script = f'display notification "{message}" with title "{title}"'
+    ok, output = (executor or get_executor()).run(script)
+    if not ok:
+        log(f"Notification failed: {output}")
+
+class CalendarSink:
+    """Writes events to Calendar.app through ``executor`` (the default sink)"""
+
+    def __init__(self, executor: AppleScriptExecutor, prefix: str = ""):
+        self.executor = executor
+        self.prefix = prefix
+        self._calendars = False  # not listed yet; None when listing failed
+
+    def has_calendar(self, calendar: str):
+        """Whether the target calendar exists, listed once per sink; None when unknown"""
+        if self._calendars is False:
+            self._calendars = list_calendars(self.executor)
+        if self._calendars is None:
+            return None
+        return self.prefix + calendar in self._calendars
+
+    def exists(self, action: SyncAction) -> str:
+        return check_existing_event(self.prefix + action.calendar, action.title, action.start_time,
+                                    action.end_time, self.executor, action.key)
+
+    def create(self, action: SyncAction):
+        return create_calendar_event(self.prefix + action.calendar, action.title, action.start_time,
+                                     action.end_time, action.notes, self.executor, action.key)
+
+    def update(self, action: SyncAction) -> str:
+        return update_calendar_event(self.prefix + action.calendar, action.title, action.start_time,
+                                     action.end_time, action.replaces, action.notes, self.executor, action.key)
+
+
+
+def _ics_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_utc(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_fold(line: str) -> str:
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:  # do not split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts)
+
+
+class IcsSink:
+    """Writes events to an iCalendar file instead of Calendar.app
+
+    The event ID doubles as the UID, so existence checks are a set lookup.
+    Events written with a legacy (shorter) ID only match when their times
+    match too. New events are written in place of the closing
+    ``END:VCALENDAR`` line, keeping each create O(1) and the file valid
+    after every write.
+    """
+
+    FOOTER = "END:VCALENDAR\r\n"
+
+    def __init__(self, path: str, calendar_name: str = "Toggl"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._uids = set()
+        self._legacy: Dict[str, Tuple[str, str]] = {}  # legacy UID → (DTSTART, DTEND)
+        if os.path.exists(path):
+            uid = start = None
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("UID:"):
+                        uid = line[4:].strip().split("@", 1)[0]
+                        self._uids.add(uid)
+                    elif line.startswith("DTSTART:"):
+                        start = line[8:].strip()
+                    elif line.startswith("DTEND:") and uid and len(uid) == LEGACY_EVENT_ID_LENGTH:
+                        self._legacy[uid] = (start, line[6:].strip())
+                    elif line.startswith("END:VEVENT"):
+                        uid = start = None
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//toggl-calendar//sync//EN\r\n"
+                        f"X-WR-CALNAME:{_ics_escape(calendar_name)}\r\n" + self.FOOTER)
+
+    def has_calendar(self, calendar: str) -> bool:
+        return True  # calendars are only CATEGORIES here
+
+    def exists(self, action: SyncAction) -> str:
+        if action.key in self._uids:
+            return "EXISTS"
+        span = (_ics_utc(action.start_time), _ics_utc(action.end_time))
+        return "EXISTS" if self._legacy.get(legacy_event_id(action.key)) == span else "NOT_EXISTS"
+
+    def create(self, action: SyncAction) -> Tuple[bool, str]:
+        notes = f"Imported from Toggl - ID: {action.key}" + (f"\n{action.notes}" if action.notes else "")
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:{action.key}@toggl-calendar",
+            f"DTSTAMP:{_ics_utc(datetime.now(timezone.utc))}",
+            f"DTSTART:{_ics_utc(action.start_time)}",
+            f"DTEND:{_ics_utc(action.end_time)}",
+            f"SUMMARY:{_ics_escape(action.title)}",
+            f"DESCRIPTION:{_ics_escape(notes)}",
+            f"CATEGORIES:{_ics_escape(action.calendar)}",
+            "END:VEVENT",
+        ]
+        event = "".join(_ics_fold(line) + "\r\n" for line in lines)
+        footer = self.FOOTER.encode("utf-8")
+        with self._lock:
+            with open(self.path, "r+b") as f:
+                f.seek(-len(footer), os.SEEK_END)
+                if f.read() != footer:
+                    return False, f"Error: {self.path} does not end with END:VCALENDAR"
+                f.seek(-len(footer), os.SEEK_END)
+                f.write(event.encode("utf-8") + footer)
+                f.flush()
+                os.fsync(f.fileno())
+            self._uids.add(action.key)
+        return True, f"Success: Created event '{action.title}'"
+
+    def update(self, action: SyncAction) -> str:
+        """Replace the events of ``action.replaces`` (and its own key) with ``action``
+
+        The file is rewritten without them, so this is O(file) and meant for
+        the occasional merged event whose fragments were written before.
+        Events with a legacy ID are only replaced when the title matches.
+        """
+        from ics_reader import unfold
+
+        old = {action.key, *action.replaces}
+        legacy = {legacy_event_id(key) for key in old} & set(self._legacy)
+        summary = f"SUMMARY:{_ics_escape(action.title)}"
+        if not old & self._uids and not legacy:
+            return "NOT_FOUND"
+        with self._lock:
+            kept, event, removed = [], [], set()
+            with open(self.path, encoding="utf-8", newline="") as f:
+                for line in f:
+                    if line.startswith("BEGIN:VEVENT"):
+                        event = [line]
+                    elif event:
+                        event.append(line)
+                        if line.startswith("END:VEVENT"):
+                            uid = next((l[4:].strip().split("@", 1)[0] for l in event if l.startswith("UID:")), None)
+                            replaced = uid in old or (uid in legacy and summary in unfold("".join(event)).splitlines())
+                            if replaced:
+                                removed.add(uid)
+                            else:
+                                kept.extend(event)
+                            event = []
+                    else:
+                        kept.append(line)
+            if not removed:
+                return "NOT_FOUND"
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    f.writelines(kept)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                return f"ERROR: {e}"
+            self._uids -= removed
+            for uid in removed:
+                self._legacy.pop(uid, None)
+        success, message = self.create(action)
+        return "UPDATED" if success else f"ERROR: {message}"
+
+
+def _calendar_missing(sink, calendar: str, log, warned: set) -> bool:
+    """True when the sink knows ``calendar`` does not exist; says so once per ``warned``
+
+    ``warned`` belongs to one account's run, so accounts syncing in parallel
+    (with their own sinks and calendar prefixes) do not silence each other.
+    """
+    if sink.has_calendar(calendar) is not False:
+        return False
+    if calendar not in warned:
+        warned.add(calendar)
+        log(f"⚠️  Calendar '{calendar}' does not exist: its entries are skipped until it is created "
+            f"(or the project is mapped with PROJECT_CALENDARS / id_to_name)")
+    return True
+
+def make_sink(account: Account, executor: AppleScriptExecutor):
+    """Event sink for an account from its ``SINK`` setting
+
+    ``{"type": "ics", "path": "team/alice.ics"}`` writes an iCalendar file
+    (relative paths are resolved next to config.json); otherwise events go
+    to Calendar.app, with calendar names optionally prefixed by
+    ``{"type": "calendar", "calendar_prefix": "Alice – "}``.
+    """
+    spec = account.cfg.get("SINK") or {}
+    if spec.get("type") == "ics":
+        path = os.path.join(os.path.dirname(config_path()), spec["path"])
+        return IcsSink(path, spec.get("calendar_name", account.name))
+    return CalendarSink(executor, spec.get("calendar_prefix", ""))
+
+
+def sync(executor=None, since=None, until=None):
+    """Sync recent Toggl entries into Calendar for every configured account
+
+    All osascript calls go through ``executor`` (default: get_executor()),
+    so the loop can run against recorded fixtures. Runs are serialized
+    across processes by a lock file next to config.json. Several accounts
+    are synced concurrently on ``SYNC_WORKERS`` threads; a failing account
+    is reported and does not stop the others. Returns the aggregated counts.
+
+    With ``since`` (a date) the whole range up to ``until`` (default today)
+    is imported through the Toggl Reports API instead of the last few days.
+    """
+    # Concurrent syncs would race through the existence checks and duplicate events
+    lock = FileLock(os.path.join(os.path.dirname(config_path()), ".sync.lock"),
+                    timeout=load_config().get("SYNC_LOCK_TIMEOUT", 600))
     try:
-        subprocess.run(["osascript", "-e", script], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Notification failed: {e}")
+        lock.acquire()
+    except LockHeld as e:
+        print(f"Another sync is still running, giving up: {e}")
+        return
+    try:
+        with RECORDER.span("sync"):
+            return _sync_accounts(executor or get_executor(), since, until)
+    finally:
+        lock.release()
 
-def sync():
+def sync_failure(result):
+    """Why a sync() result counts as failed, or None when it succeeded"""
+    if result is None:
+        return "another sync is still running"
+    failed = [r["account"] for r in result["accounts"] if "error" in r]
+    if failed:
+        return f"sync failed for {', '.join(failed)}"
+    if result["errors"]:
+        return f"{result['errors']} events could not be written"
+    return None
 
+def _sync_accounts(executor, since=None, until=None):
     today = datetime.now()
-    start_date = (today - timedelta(days=3)).strftime("%Y-%m-%dT00:00:00.000Z")
-    end_date = (today).strftime("%Y-%m-%dT23:59:59.999Z")
+    if since:
+        start_date, end_date = since.isoformat(), (until or today.date()).isoformat()
+    else:
+        start_date = (today - timedelta(days=3)).strftime("%Y-%m-%dT00:00:00.000Z")
+        end_date = (today).strftime("%Y-%m-%dT23:59:59.999Z")
 
     print("Toggl → Calendar Sync", f"Syncing Toggl entries from 🗓️ {start_date[:10]} to 🗓️ {end_date[:10]}")
 
-    send_macos_notification("Toggl → Calendar Sync", f"Syncing Toggl entries from 🗓️ {start_date[:10]} to 🗓️ {end_date[:10]}")
-    
-    # Get time entries
-    entries = get_last_week_entries(start_date=start_date, end_date=end_date)
-    
-    if not entries:
-        print("No time entries found for last week.")
-        return
-    
-    print(f"Found {len(entries)} time entries")
-    
-    created_count = 0
-    skipped_count = 0
-    duplicate_count = 0
-    error_count = 0
+    send_macos_notification("Toggl → Calendar Sync", f"Syncing Toggl entries from 🗓️ {start_date[:10]} to 🗓️ {end_date[:10]}", executor)
+
+    accounts = get_accounts()
+
+    def run(account):
+        t0 = time.perf_counter()
+        try:
+            result = _run_sync(executor, account, start_date, end_date, bulk=since is not None)
+        except Exception as e:
+            # one broken account (bad token, unreachable sink) must not stop the others
+            account.log(f"✗ Sync failed: {e}")
+            result = {"account": account.name, "created": 0, "updated": 0, "duplicates": 0, "skipped": 0,
+                      "errors": 1, "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - t0, 3)
+        return result
+
+    if len(accounts) == 1:
+        results = [run(accounts[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max(1, min(load_config().get("SYNC_WORKERS", 4), len(accounts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as pool:
+            results = list(pool.map(run, accounts))
+
+    totals = {key: sum(r[key] for r in results) for key in ("created", "updated", "duplicates", "skipped", "errors")}
+
+    # Summary
+    print("=" * 40)
+    print(f"\nSummary:")
+    print("=" * 40)
+    if len(results) > 1:
+        for r in results:
+            status = f"failed: {r['error']}" if "error" in r else (
+                f"created {r['created']}, updated {r['updated']}, duplicates {r['duplicates']}, "
+                f"skipped {r['skipped']}, errors {r['errors']}")
+            print(f"  [{r['account']}] {status} ({r['seconds']:.1f}s)")
+        print("-" * 40)
+    print(f"  Created: {totals['created']}")
+    print(f"  Updated: {totals['updated']}")
+    print(f"  Duplicates found: {totals['duplicates']}")
+    print(f"  Skipped: {totals['skipped']}")
+    print(f"  Errors: {totals['errors']}")
+    print("-" * 40)
+
+    summary_msg = f"Created: {totals['created']}, Updated: {totals['updated']}, Skipped: {totals['skipped']}, Duplicates: {totals['duplicates']}, Errors: {totals['errors']}"
+    if len(results) > 1:
+        failed = sum("error" in r for r in results)
+        summary_msg = f"{len(results)} accounts{f' ({failed} failed)' if failed else ''} – {summary_msg}"
+    send_macos_notification("Toggl → Calendar Sync ✅", summary_msg, executor)
+    return {"accounts": results, **totals}
+
+def _run_sync(executor, account: Account, start_date: str, end_date: str, bulk: bool = False) -> dict:
+    """Sync one account; returns its counts
+
+    ``bulk`` imports the whole date range through the Reports API, planning
+    and writing one batch of entries at a time.
+    """
+    log = account.log
+    counts = {"account": account.name, "created": 0, "updated": 0, "duplicates": 0, "skipped": 0, "errors": 0}
+    sink = make_sink(account, executor)
+    missing_calendars = set()  # calendars this run has warned about
     
+    # Actions left unfinished by an interrupted run are replayed first
+    wal = account.sync_log
+    try:
+        wal.compact()
+        replay = list(wal.unfinished.values())
+        if replay:
+            log(f"Replaying {len(replay)} unfinished actions from {wal.path}")
+            _write_actions(replay, sink, wal, counts, log, missing_calendars)
+
+        gap_minutes = account.cfg.get("COALESCE_GAP_MINUTES")
+        if bulk:
+            entries = iter_report_entries(account.cfg, date.fromisoformat(start_date[:10]),
+                                          date.fromisoformat(end_date[:10]), account.limiter)
+            pending = batches(entries, account.cfg.get("IMPORT_BATCH_SIZE", DEFAULT_IMPORT_BATCH_SIZE),
+                              (gap_minutes or 0) * 60)
+        else:
+            # Get time entries
+            entries = get_last_week_entries(start_date=start_date, end_date=end_date, account=account)
+            if not entries:
+                if not replay:
+                    log("No time entries found for last week.")
+                return counts
+            pending = [entries]
+
+        archive = get_archive()
+        fetched = 0
+        for entries in pending:
+            fetched += len(entries)
+            log(f"Found {len(entries)} time entries" + (f" ({fetched} so far)" if bulk else ""))
+            if archive is not None:
+                _archive_entries(archive, entries, account)
+            if account.budgets is not None:
+                for alert in track_budgets(account, entries):
+                    log(f"⏰ {alert}")
+                    send_macos_notification("Time budget", alert, executor, log)
+
+            # Optionally merge stop-start fragments into one event each
+            if gap_minutes:
+                batch_size = len(entries)
+                entries = coalesce_entries(entries, gap_minutes * 60)
+                log(f"Coalesced {batch_size} entries into {len(entries)} (gap ≤ {gap_minutes} min)")
+
+            actions = _plan_actions(entries, account, wal, counts, sink, missing_calendars)
+            # Write the plan before touching Calendar, so a crash leaves a record of it
+            wal.plan(actions)
+            _write_actions(actions, sink, wal, counts, log, missing_calendars)
+
+        if bulk:
+            log(f"Imported {fetched} time entries from {start_date[:10]} to {end_date[:10]}")
+        return counts
+    finally:
+        wal.close()  # also on early returns and errors, so the log file is not left open
+
+def _toggl_project_name(entry, account: Account):
+    """Toggl project name of an entry (not its calendar), None without a project"""
+    project_id = entry.get('project_id')
+    if not project_id:
+        return None
+    return account.project_cache.name(project_id) or account.cfg.get("id_to_name", {}).get(str(project_id))
+
+def _archive_entries(archive: Archive, entries, account: Account) -> None:
+    """Add fetched entries to the history archive; a failure only costs history"""
+    try:
+        archive.ingest(entries, account.name, lambda entry: _toggl_project_name(entry, account))
+    except (OSError, ValueError) as e:
+        account.log(f"Could not archive entries: {e}")
+
+def track_budgets(account: Account, entries, now=None) -> list:
+    """Feed new, changed and deleted entries into the account's budget totals
+
+    Running entries are counted up to ``now``. Returns the notification
+    texts for thresholds crossed; the totals are saved afterwards.
+    """
+    tracker = account.budgets
+    now = now or time.time()
+    alerts = []
     for entry in entries:
-        # Get project name
-        project_name = get_project_name(entry)
-        
+        if entry.get('server_deleted_at'):
+            alerts += tracker.observe(entry['id'], None, 0, None, None)
+            continue
+        start = parse_datetime(entry.get('start') or '')
+        if start is None:
+            continue
+        route = route_entry(entry, account)
+        alerts += tracker.observe(entry['id'], start, entry_seconds(entry, now),
+                                  None if route.skip else route.calendar, _toggl_project_name(entry, account),
+                                  running=(entry.get('duration') or 0) < 0)
+    alerts += tracker.advance(now)
+    try:
+        tracker.save()
+    except OSError as e:
+        account.log(f"Could not save budget totals: {e}")
+    return alerts
+
+def _plan_actions(entries, account: Account, wal: SyncLog, counts: dict, sink=None, missing_calendars=None) -> list:
+    """SyncActions for entries not yet written; skips and known events are counted
+
+    Entries whose calendar the ``sink`` reports as missing are skipped rather
+    than planned, so they do not fail again on every run; each calendar is
+    warned about once per ``missing_calendars`` set (one per account run).
+    """
+    if missing_calendars is None:
+        missing_calendars = set()
+    log = account.log
+    actions = []
+    for entry in entries:
+        # Route to a calendar, title and notes (project calendar unless a rule says otherwise)
+        route = route_entry(entry, account)
+        project_name = route.calendar
+
+        if route.skip:
+            log(f"Skipping entry by routing rule {route.rule}: {entry.get('description', 'No description')}")
+            counts["skipped"] += 1
+            continue
+
         if not project_name:
-            print(f"Skipping entry without project: {entry.get('description', 'No description')}")
-            skipped_count += 1
+            log(f"Skipping entry without project: {entry.get('description', 'No description')}")
+            counts["skipped"] += 1
             continue
         
         # Get entry details
-        description = entry.get('description', 'No description')
+        description = route.title
         start_time = parse_datetime(entry.get('start', ''))
         end_time = parse_datetime(entry.get('stop', ''))
         duration = entry.get('duration', 0)
-        tag_str = get_tags(entry)
+        tag_str = route.notes
+        merged_ids = entry.get('merged_ids')
+        if merged_ids:
+            merged_note = f"Merged Toggl entries: {', '.join(str(i) for i in merged_ids)}"
+            tag_str = f"{tag_str}\n{merged_note}" if tag_str else merged_note
         
         if not start_time or not end_time:
-            print(f"Skipping entry with invalid time: {description}")
-            skipped_count += 1
+            log(f"Skipping entry with invalid time: {description} "
+                f"({entry.get('start')!r} to {entry.get('stop')!r})")
+            counts["skipped"] += 1
             continue
-        
+
+        replaces = []
+        if merged_ids:
+            event_id = generate_merged_event_id(description, merged_ids)
+            # the fragments may have been synced on their own before they were merged
+            for span in entry.get('merged_spans') or []:
+                fragment_start, fragment_end = parse_datetime(span[0]), parse_datetime(span[1])
+                if fragment_start and fragment_end:
+                    replaces.append(generate_event_id(description, fragment_start, fragment_end))
+        else:
+            event_id = generate_event_id(description, start_time, end_time)
+        # a merged event keeps its ID as later fragments extend it, so its end is compared too;
+        # a legacy ID in the log only counts with the same end
+        if (wal.is_done(event_id, end_time.isoformat() if merged_ids else None)
+                or wal.is_done(legacy_event_id(event_id), end_time.isoformat())):
+            # created or confirmed by an earlier run: no osascript needed
+            counts["duplicates"] += 1
+            continue
+        if event_id in wal.unfinished:
+            continue  # replay could not check it this run; it stays queued
+        # looking for an earlier event costs an osascript call: only when the log has written one
+        if replaces and not any(wal.is_done(key) or wal.is_done(legacy_event_id(key)) for key in [event_id, *replaces]):
+            replaces = []
+        if sink is not None and _calendar_missing(sink, project_name, log, missing_calendars):
+            counts["skipped"] += 1
+            continue
+        actions.append(SyncAction(event_id, project_name, description, start_time.isoformat(),
+                                  end_time.isoformat(), tag_str, duration, replaces))
+
+    return actions
+
+def _write_actions(actions, sink, wal: SyncLog, counts: dict, log, missing_calendars=None) -> None:
+    """Check and create each planned event, recording the outcome in the log
+
+    A merged event whose earlier span or fragments the log has written
+    first updates that event, and is only created when there is none.
+    """
+    if missing_calendars is None:
+        missing_calendars = set()
+    for action in actions:
+        if _calendar_missing(sink, action.calendar, log, missing_calendars):
+            # left unfinished: written once the calendar exists, dropped with the log's retention
+            counts["skipped"] += 1
+            continue
+
+        if action.replaces:
+            update_result = sink.update(action)
+            if update_result == "UPDATED":
+                log(f"Updated merged event: '{action.title}' in '{action.calendar}' calendar "
+                    f"({format_duration(action.duration)})")
+                wal.mark_done(action, "updated")
+                counts["updated"] += 1
+                continue
+            elif update_result.startswith("ERROR"):
+                log(f"  ⚠️  Error looking up the fragments of a merged event, retrying next run: {update_result}")
+                counts["errors"] += 1
+                continue
+
         # Check if event already exists
-        print(f"Checking for existing event: '{description}' in '{project_name}' calendar")
-        exists_result = check_existing_event(project_name, description, start_time, end_time)
+        log(f"Checking for existing event: '{action.title}' in '{action.calendar}' calendar")
+        exists_result = sink.exists(action)
         
         if exists_result == "EXISTS":
-            print(f"  ⚠️  Event already exists, skipping")
-            duplicate_count += 1
+            log(f"  ⚠️  Event already exists, skipping")
+            wal.mark_done(action, "exists")
+            counts["duplicates"] += 1
             continue
         elif exists_result.startswith("ERROR"):
-            print(f"  ⚠️  Error checking for existing event: {exists_result}")
-            # Continue to create the event anyway
+            # Creating anyway could duplicate an event we cannot see; the action
+            # stays unfinished in the log and is retried by the next run
+            log(f"  ⚠️  Error checking for existing event, retrying next run: {exists_result}")
+            counts["errors"] += 1
+            continue
         
         # Create calendar event
-        print(f"Creating event: '{description}' in '{project_name}' calendar ({format_duration(duration)})")
+        log(f"Creating event: '{action.title}' in '{action.calendar}' calendar ({format_duration(action.duration)})")
         
-        success, message = create_calendar_event(
-            project_name,
-            description,
-            start_time,
-            end_time,
-            tag_str
-        )
+        success, message = sink.create(action)
         
-        if success:
-            created_count += 1
-            print(f"  ✓ Created successfully")
+        if success and not message.startswith("Error"):
+            wal.mark_done(action, "created")
+            counts["created"] += 1
+            log(f"  ✓ Created successfully")
         else:
-            error_count += 1
-            print(f"  ✗ Failed: {message}")
-    
-    # Summary
-    print("=" * 40)
-    print(f"\nSummary:")
-    print("=" * 40)
-    print(f"  Created: {created_count}")
-    print(f"  Duplicates found: {duplicate_count}")
-    print(f"  Skipped: {skipped_count}")
-    print(f"  Errors: {error_count}")
-    print("-" * 40)
+            counts["errors"] += 1
+            log(f"  ✗ Failed: {message}")
 
-    summary_msg = f"Created: {created_count}, Skipped: {skipped_count}, Duplicates: {duplicate_count}, Errors: {error_count}"
-    send_macos_notification("Toggl → Calendar Sync ✅", summary_msg)
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Sync recent Toggl entries to Apple Calendar")
+    parser.add_argument("--profile", action="store_true", help="Run under cProfile and print the hottest functions")
+    parser.add_argument("--metrics-dir", help="Write Prometheus textfile and JSON lines call metrics here (default: $METRICS_DIR)")
+    parser.add_argument("--since", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="Import all entries from this date through the Toggl Reports API")
+    parser.add_argument("--until", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="Last day to import with --since (default: today)")
+    args = parser.parse_args(argv)
+    if args.until and not args.since:
+        parser.error("--until requires --since")
 
-if __name__ == "__main__":
     # Check if required libraries are installed
     try:
         import requests
     except ImportError:
         print("Error: 'requests' library not found. Install with: pip install requests")
         sys.exit(1)
-    
-    sync()
+
+    result = run_instrumented(lambda: sync(since=args.since, until=args.until),
+                              metrics_dir=args.metrics_dir, profile=args.profile)
+    # a non-zero exit lets the scheduler (and cron/launchd) see the failure
+    failure = sync_failure(result)
+    if failure:
+        sys.exit(f"Sync incomplete: {failure}")
+
+
+if __name__ == "__main__":
+    main()
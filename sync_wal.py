@@ -0,0 +1,142 @@
+import json
+import os
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# Finished actions older than this are dropped when the log is compacted
+DEFAULT_RETENTION_DAYS = 14
+
+
+@dataclass
+class SyncAction:
+    """One calendar event the sync intends to create (or update, see ``replaces``)"""
+    key: str  # the event ID written into the event notes
+    calendar: str
+    title: str
+    start: str  # ISO timestamps with offset
+    end: str
+    notes: str = ""
+    duration: int = 0
+    # IDs of events this one supersedes: the fragments of a merged entry
+    replaces: List[str] = field(default_factory=list)
+
+    @property
+    def start_time(self) -> datetime:
+        return datetime.fromisoformat(self.start)
+
+    @property
+    def end_time(self) -> datetime:
+        return datetime.fromisoformat(self.end)
+
+
+class SyncLog:
+    """Append-only write-ahead log of sync actions
+
+    Every action is appended as ``plan`` before any osascript call for it and
+    as ``done`` (created, or found to exist already) once it has finished;
+    both are flushed and fsynced, so a run killed at any point leaves an
+    accurate record. On open the log is replayed: finished keys are skipped
+    by later runs without an existence check, and planned-but-unfinished
+    actions are handed back for replay. Opening (and every sync run) compacts
+    the log to one line per key, dropping actions that ended before the
+    retention window, so recovery reads a file proportional to recent
+    activity. A torn last line from a crash mid-write is ignored.
+    """
+
+    def __init__(self, path: str, retention_days: int = DEFAULT_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.done: Dict[str, str] = {}  # key → outcome
+        self.unfinished: Dict[str, SyncAction] = {}
+        self._done_ends: Dict[str, Optional[str]] = {}  # key → event end, for retention
+        self._file = None
+        self._replay()
+        self.compact()
+
+    @classmethod
+    def from_config(cls, cfg: dict, config_dir: str) -> "SyncLog":
+        path = cfg.get("SYNC_LOG_PATH") or os.path.join(config_dir, ".sync_wal.jsonl")
+        return cls(path, cfg.get("SYNC_LOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS))
+
+    def _replay(self) -> None:
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write
+                key = record.get("key")
+                if record.get("op") == "plan":
+                    # a plan for a finished key is an update of its span
+                    if key not in self.done or self._done_ends.get(key) != record["action"].get("end"):
+                        self.unfinished[key] = SyncAction(**record["action"])
+                elif record.get("op") == "done":
+                    self.unfinished.pop(key, None)
+                    self.done[key] = record.get("outcome", "created")
+                    self._done_ends[key] = record.get("end")
+
+    def compact(self) -> None:
+        """Rewrite the log as one line per key, dropping actions past retention"""
+        self.close()  # appends must go to the new file, not the replaced one
+        cutoff = datetime.now().astimezone() - timedelta(days=self.retention_days)
+
+        def recent(end: Optional[str]) -> bool:
+            try:
+                return end is None or datetime.fromisoformat(end) >= cutoff
+            except (TypeError, ValueError):
+                return True
+
+        done_ends = self._done_ends
+        kept_done = {k: v for k, v in self.done.items() if recent(done_ends.get(k))}
+        self.unfinished = {k: a for k, a in self.unfinished.items() if recent(a.end)}
+        # finished keys first, so a pending update of one replays as unfinished
+        lines = [json.dumps({"op": "done", "key": k, "outcome": v, "end": done_ends.get(k)}, ensure_ascii=False)
+                 for k, v in kept_done.items()]
+        lines += [json.dumps({"op": "plan", "key": a.key, "action": asdict(a)}, ensure_ascii=False)
+                  for a in self.unfinished.values()]
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.done = kept_done
+        self._done_ends = {k: done_ends.get(k) for k in kept_done}
+
+    def _append(self, records: Iterable[dict]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, key: str, end: Optional[str] = None) -> bool:
+        """Whether ``key`` has finished; with ``end``, only if it finished with that end"""
+        return key in self.done and (end is None or self._done_ends.get(key) == end)
+
+    def plan(self, actions: List[SyncAction]) -> None:
+        """Record actions before running them; one fsync for the whole batch"""
+        new = [a for a in actions if not self.is_done(a.key, a.end) and a.key not in self.unfinished]
+        if not new:
+            return
+        self._append({"op": "plan", "key": a.key, "action": asdict(a), "ts": time.time()} for a in new)
+        self.unfinished.update((a.key, a) for a in new)
+
+    def mark_done(self, action: SyncAction, outcome: str) -> None:
+        """Record a finished action (``created``, ``updated`` or ``exists``)"""
+        self._append([{"op": "done", "key": action.key, "outcome": outcome, "end": action.end, "ts": time.time()}])
+        self.unfinished.pop(action.key, None)
+        self.done[action.key] = outcome
+        self._done_ends[action.key] = action.end
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
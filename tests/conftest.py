@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def write_config(tmp_path, monkeypatch):
+    """Write config.json into tmp_path and point the process-wide caches at it"""
+    import settings
+    import sync
+
+    def write(**cfg):
+        cfg = {"TOGGL_API_TOKEN": "token", "TOGGL_WORKSPACE_ID": 1, **cfg}
+        path = tmp_path / "config.json"
+        path.write_text(json.dumps(cfg))
+        monkeypatch.setenv("TOGGL_CALENDAR_CONFIG", str(path))
+        monkeypatch.setattr(settings, "_config", None)
+        monkeypatch.setattr(sync, "_accounts", None)
+        monkeypatch.setattr(sync, "_archive", False)
+        return cfg
+
+    return write
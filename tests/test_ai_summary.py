@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ai_summary import Assistant, LatencyTracker, LLMAssistant, ReportAnalyzer
+
+
+@pytest.fixture
+def llm_server():
+    """Start fake OpenAI-compatible /chat/completions servers; returns (url, received payloads)"""
+    servers = []
+
+    def start(chunks=("Hel", "lo"), delay=0.0, status=200, truncate=False, reject_stream_options=False):
+        payloads = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                payloads.append(payload)
+                time.sleep(delay)
+                if status != 200 or (reject_stream_options and "stream_options" in payload):
+                    self.send_error(400 if status == 200 else status)
+                    return
+                if not payload.get("stream"):
+                    body = json.dumps({"choices": [{"message": {"content": "".join(chunks)}}],
+                                       "usage": {"prompt_tokens": 3, "completion_tokens": 2}}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for text in chunks:
+                    self._event({"choices": [{"delta": {"content": text}, "finish_reason": None}]})
+                if truncate:
+                    return  # connection closed mid-completion
+                self._event({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+                self._event({"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2}})
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def _event(self, chunk):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}", payloads
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def make_assistant(url, tmp_path, **cfg):
+    assistant = LLMAssistant()
+    assistant.initialize({"AGENT_API_KEY": "key", "AGENT_URL": url,
+                          "LLM_TELEMETRY_PATH": str(tmp_path / "llm.jsonl"), **cfg})
+    return assistant
+
+
+def make_analyzer(url, tmp_path):
+    analyzer = ReportAnalyzer(str(tmp_path / "config.json"))
+    analyzer.cfg = {"AGENT_API_KEY": "key", "AGENT_URL": url, "LLM_TELEMETRY_PATH": str(tmp_path / "llm.jsonl")}
+    return analyzer
+
+
+def test_sse_content_skips_comments_and_collects_usage():
+    lines = [
+        ": keep-alive",
+        "",
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        b'data: {"choices": [{"delta": {"content": "Hi"}}]}',
+        'data: {"choices": [{"delta": {"content": " there"}, "finish_reason": "stop"}]}',
+        'data: {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2}}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+    usage = {}
+    assert list(LLMAssistant._iter_sse_content(lines, usage)) == ["Hi", " there"]
+    assert usage == {"prompt_tokens": 5, "completion_tokens": 2}
+
+
+def test_sse_content_raises_when_cut_off():
+    lines = ['data: {"choices": [{"delta": {"content": "Hi"}}]}']
+    received = []
+    with pytest.raises(Exception, match="ended before"):
+        for content in LLMAssistant._iter_sse_content(lines):
+            received.append(content)
+    assert received == ["Hi"]
+
+
+def test_query_stream_yields_deltas_from_server(tmp_path, llm_server):
+    url, payloads = llm_server(chunks=("Good ", "day"))
+    assistant = make_assistant(url, tmp_path)
+    assert list(assistant.query_stream("prompt")) == ["Good ", "day"]
+    assert payloads[0]["stream"] is True
+    call = json.loads((tmp_path / "llm.jsonl").read_text().splitlines()[-1])
+    assert call["outcome"] == "ok" and call["completion_tokens"] == 2
+
+
+def test_stream_options_dropped_after_a_400(tmp_path, llm_server):
+    url, payloads = llm_server(chunks=("ok",), reject_stream_options=True)
+    assistant = make_assistant(url, tmp_path)
+    assert list(assistant.query_stream("prompt")) == ["ok"]
+    assert list(assistant.query_stream("prompt")) == ["ok"]
+    assert ["stream_options" in p for p in payloads] == [True, False, False]
+
+
+def test_truncated_stream_raises_after_partial_analysis(tmp_path, llm_server):
+    url, _ = llm_server(chunks=("Partial ", "review"), truncate=True)
+    received = []
+    with pytest.raises(Exception, match="Error generating analysis"):
+        for chunk in make_analyzer(url, tmp_path).generate_analysis_stream("report"):
+            received.append(chunk)
+    assert received == ["Partial ", "review"]
+    call = json.loads((tmp_path / "llm.jsonl").read_text().splitlines()[-1])
+    assert call["outcome"] == "error"
+
+
+def test_failed_analysis_raises_instead_of_returning_the_error(tmp_path, llm_server):
+    url, _ = llm_server(status=500)
+    with pytest.raises(Exception, match="Error generating analysis"):
+        make_analyzer(url, tmp_path).generate_analysis("report")
+
+
+def make_router(tmp_path, *backends, **routing):
+    """RoutedAssistant over (name, url) backends with the hedge delay given in ``routing``"""
+    return Assistant.build_assistant({
+        "AGENT_API_KEY": "key",
+        "LLM_TELEMETRY_PATH": str(tmp_path / "llm.jsonl"),
+        "LLM_BACKENDS": [{"name": name, "url": url} for name, url in backends],
+        "LLM_ROUTING": {"policy": "hedged", **routing},
+    })
+
+
+def telemetry_calls(tmp_path):
+    path = tmp_path / "llm.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_latency_tracker_samples_slow_failures():
+    tracker = LatencyTracker(window=10)
+    for _ in range(9):
+        tracker.record(0.1, ok=True)
+    tracker.record(5.0, ok=False)
+    assert tracker.percentile(95) == 5.0
+    assert tracker.percentile(50) == 0.1
+    assert (tracker.failures, tracker.consecutive_failures) == (1, 1)
+    tracker.record(2.0, ok=None)  # a cancelled hedge is sampled but is no failure or success
+    assert (tracker.failures, tracker.consecutive_failures) == (1, 1)
+
+
+def test_hedge_delay_is_the_backend_p95_once_trusted(tmp_path, llm_server):
+    url, _ = llm_server()
+    router = make_router(tmp_path, ("primary", url), min_samples=5, default_hedge_delay=3.0)
+    primary = router.backends[0]
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        router.trackers["primary"].record(latency, ok=True)
+    assert router._hedge_delay(primary) == 3.0
+    router.trackers["primary"].record(0.5, ok=True)
+    assert router._hedge_delay(primary) == 0.5
+
+
+def test_fast_backend_is_not_hedged(tmp_path, llm_server):
+    primary, primary_payloads = llm_server(chunks=("primary",))
+    secondary, secondary_payloads = llm_server(chunks=("secondary",))
+    router = make_router(tmp_path, ("primary", primary), ("secondary", secondary), default_hedge_delay=2.0)
+    assert router.query("prompt") == "primary"
+    assert len(primary_payloads) == 1 and secondary_payloads == []
+
+
+def test_slow_backend_is_hedged_and_its_response_closed(tmp_path, llm_server):
+    primary, primary_payloads = llm_server(chunks=("primary",), delay=1.0)
+    secondary, _ = llm_server(chunks=("secondary",))
+    router = make_router(tmp_path, ("primary", primary), ("secondary", secondary), default_hedge_delay=0.2)
+    t0 = time.perf_counter()
+    assert router.query("prompt") == "secondary"
+    assert time.perf_counter() - t0 < 0.9
+    assert len(primary_payloads) == 1
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        outcomes = {(c["backend"], c["outcome"]) for c in telemetry_calls(tmp_path)}
+        if ("primary", "cancelled") in outcomes:
+            break
+        time.sleep(0.05)
+    assert outcomes == {("primary", "cancelled"), ("secondary", "ok")}
+    assert router.trackers["primary"].failures == 0
+
+
+def test_stream_fails_over_before_the_first_chunk(tmp_path, llm_server):
+    primary, _ = llm_server(status=500)
+    secondary, _ = llm_server(chunks=("from ", "secondary"))
+    router = make_router(tmp_path, ("primary", primary), ("secondary", secondary))
+    assert list(router.query_stream("prompt")) == ["from ", "secondary"]
+    assert router.trackers["primary"].failures == 1
+    assert len(router.trackers["primary"].samples) == 1
+    assert router.latency_report()["secondary"]["failures"] == 0
+
+
+def test_stream_does_not_fail_over_after_output(tmp_path, llm_server):
+    primary, _ = llm_server(chunks=("partial",), truncate=True)
+    secondary, secondary_payloads = llm_server()
+    router = make_router(tmp_path, ("primary", primary), ("secondary", secondary))
+    received = []
+    with pytest.raises(Exception, match="ended before"):
+        for chunk in router.query_stream("prompt"):
+            received.append(chunk)
+    assert received == ["partial"] and secondary_payloads == []
@@ -0,0 +1,122 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import wrap_up
+from api_server import ANALYSIS_MARKER, SummaryService, etag_matches, make_handler
+from journal import JournalStore
+from summarize_calendar import CalendarEvent, Reminder
+
+
+class FakeReminders:
+    def __init__(self):
+        self.items = [Reminder(due_date="", name="Pay rent", list_name="Personal", status="Overdue")]
+
+    def get_data(self, start, end):
+        return self.items
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.events = [CalendarEvent(start="09:00:00", end="10:00:00", summary="Write", calendar="Work",
+                                     is_toggl=True)]
+        self.reminder_source = FakeReminders()
+        self.fail = None
+
+    def _get_calendar_events(self, start, end):
+        if self.fail:
+            raise Exception(self.fail)
+        return list(self.events)
+
+    def build_summary(self, start_date_str, end_date_str, events, reminders):
+        return f"{len(events)} events"
+
+
+@pytest.fixture
+def api():
+    """(service, summarizer, get) against a live server; get(path, etag) returns (status, headers, body)"""
+    summarizer = FakeSummarizer()
+    service = SummaryService(summarizer, {})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(path, etag=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+        conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response.status, response.headers, json.loads(body) if body else None
+
+    yield service, summarizer, get
+    server.shutdown()
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_not_loaded_and_unknown_endpoints(api):
+    service, _, get = api
+    assert get("/totals")[0] == 503
+    assert get("/nope")[0] == 404
+    assert get("/archive")[0] == 404  # archive disabled
+    assert get("/")[2]["endpoints"][0] == "/summary"
+
+
+def test_matching_etag_gets_an_empty_304(api):
+    service, _, get = api
+    service.refresh()
+    status, headers, body = get("/totals")
+    assert status == 200 and body["actual_seconds"] == 3600
+    etag = headers["ETag"]
+    status, headers, body = get("/totals", etag)
+    assert (status, headers["ETag"], headers["Content-Length"], body) == (304, etag, "0", None)
+    assert get("/totals", f"W/{etag}")[0] == 304
+    assert get("/totals", '"stale"')[0] == 200
+
+
+def test_etag_only_changes_with_the_data(api):
+    service, summarizer, get = api
+    service.refresh()
+    etags = {path: get(path)[1]["ETag"] for path in ("/summary", "/totals", "/metrics", "/reminders")}
+    service.refresh()  # new generated_at, same data
+    assert {path: get(path, etag)[0] for path, etag in etags.items()} == dict.fromkeys(etags, 304)
+
+    summarizer.events.append(CalendarEvent(start="11:00:00", end="12:00:00", summary="Plan", calendar="Work"))
+    service.refresh()
+    status, headers, body = get("/totals", etags["/totals"])
+    assert status == 200 and headers["ETag"] != etags["/totals"]
+    assert body["planned_seconds"] == 3600
+    assert get("/reminders", etags["/reminders"])[0] == 304
+
+
+def test_failed_refresh_keeps_the_last_responses(api):
+    service, summarizer, get = api
+    service.refresh()
+    etag = get("/metrics")[1]["ETag"]
+    summarizer.fail = "Calendar timed out"
+    service.refresh()
+    assert get("/metrics", etag)[0] == 304
+    health = get("/health")[2]
+    assert health["refreshes"] == 1 and health["last_error"].endswith("Calendar timed out")
+
+
+def test_analysis_of_the_latest_journal(api, tmp_path, monkeypatch):
+    service, _, get = api
+    monkeypatch.setattr(wrap_up, "_journal_store", JournalStore(str(tmp_path)))
+    assert get("/analysis")[0] == 404
+    (tmp_path / "DAILY_20260105.md").write_text("old", encoding="utf-8")
+    (tmp_path / "DAILY_20260106.md").write_text(
+        "summary\n" + "=" * 20 + ANALYSIS_MARKER + "=" * 19 + "\nGood day.\n" + "=" * 60, encoding="utf-8")
+    status, headers, body = get("/analysis")
+    assert (status, body["day"], body["analysis"]) == (200, "2026-01-06", "Good day.")
+    assert get("/analysis", headers["ETag"])[0] == 304
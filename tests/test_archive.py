@@ -0,0 +1,101 @@
+import time
+from datetime import date
+
+import pytest
+
+from archive import Archive, Partition
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    """Archive days are local days; pin the local zone"""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def entry(entry_id, day, hours, project=None, description="", tags=(), hour=9):
+    return {"id": entry_id, "start": f"{day}T{hour:02d}:00:00Z", "stop": f"{day}T{hour + 1:02d}:00:00Z",
+            "duration": int(hours * 3600), "project_id": project, "description": description, "tags": list(tags)}
+
+
+ENTRIES = [
+    entry(1, "2026-01-05", 2, 10, "Write", ["deep"]),           # Monday
+    entry(2, "2026-01-06", 1, 10, "Review", ["deep", "team"]),
+    entry(3, "2026-01-06", 0.5, 20, "Email", hour=14),
+    entry(4, "2026-01-31", 1, 20, "Email", ["team"]),
+    entry(5, "2026-02-02", 3, 10, "Write", ["deep"]),
+    {**entry(6, "2026-02-03", 1, 10), "stop": None, "duration": -1},  # still running
+]
+NAMES = {10: "Growth", 20: "Admin"}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(str(tmp_path / "archive"))
+    assert archive.ingest(ENTRIES, account="alice", project_name=lambda e: NAMES.get(e.get("project_id"))) == 5
+    return archive
+
+
+def test_partition_bytes_round_trip():
+    rows = [(2, 200, 739000, 60, 1, 2, 0, (1, 3)), (1, 100, 739000, 30, 0, 1, 0, ())]
+    part = Partition.from_rows("2026-01", rows)
+    assert list(part.columns["id"]) == [1, 2]  # sorted by start
+    restored = Partition.from_bytes("2026-01", part.to_bytes())
+    assert restored.rows() == part.rows() == {r[0]: r for r in rows}
+    with pytest.raises(ValueError):
+        Partition.from_bytes("2026-01", b"nope" + part.to_bytes()[4:])
+
+
+def test_archive_survives_a_reopen(archive):
+    reopened = Archive(archive.path)
+    assert reopened.months() == ["2026-01", "2026-02"]
+    assert reopened.query(group_by=["project"]) == archive.query(group_by=["project"]) == [
+        (("Admin",), 1.5), (("Growth",), 6.0)]
+    stats = reopened.stats()
+    assert (stats["rows"], stats["partitions"], stats["projects"], stats["accounts"]) == (5, 2, 2, 1)
+
+
+def test_ingest_upserts_by_id(archive):
+    assert archive.ingest(ENTRIES, account="alice", project_name=lambda e: NAMES.get(e.get("project_id"))) == 0
+    changed = {**ENTRIES[0], "duration": 3 * 3600}
+    assert archive.ingest([changed], account="alice", project_name=lambda e: NAMES.get(e.get("project_id"))) == 1
+    assert archive.query(metric="count") == [((), 5)]
+    assert archive.query(where={"description": ["Write"]}) == [((), 6.0)]
+
+
+def test_time_groups(archive):
+    assert archive.query(group_by=["month"]) == [(("2026-01",), 4.5), (("2026-02",), 3.0)]
+    assert archive.query(group_by=["week"], metric="count") == [
+        (("2026-01-05",), 3), (("2026-01-26",), 1), (("2026-02-02",), 1)]
+    assert archive.query(group_by=["weekday"])[0] == (("1 Mon",), 5.0)
+    assert archive.query(group_by=["year", "project"]) == [(("2026", "Admin"), 1.5), (("2026", "Growth"), 6.0)]
+
+
+def test_entries_count_once_per_tag(archive):
+    assert archive.query(group_by=["tag"]) == [(("",), 0.5), (("deep",), 6.0), (("team",), 2.0)]
+    assert archive.query(where={"tag": ["team"]}, metric="count") == [((), 2)]
+    assert archive.query(where={"tag": ["unknown"]}) == []
+
+
+def test_day_range_inside_a_month(archive):
+    assert archive.query(since=date(2026, 1, 6), until=date(2026, 1, 6), group_by=["day"]) == [
+        (("2026-01-06",), 1.5)]
+    assert archive.query(since=date(2026, 1, 7), until=date(2026, 1, 30)) == []
+    assert archive.query(since=date(2026, 1, 31)) == [((), 4.0)]
+
+
+def test_whole_month_totals_follow_new_entries(archive):
+    assert archive.query(where={"project": ["Admin"]}) == [((), 1.5)]
+    archive.ingest([entry(7, "2026-01-20", 2, 20)], account="alice", project_name=lambda e: NAMES[e["project_id"]])
+    assert archive.query(where={"project": ["Admin"]}) == [((), 3.5)]
+    assert Archive(archive.path).query(where={"project": ["Admin"]}) == [((), 3.5)]
+
+
+def test_unknown_group_or_metric(archive):
+    with pytest.raises(ValueError, match="Unknown group"):
+        archive.query(group_by=["hour"])
+    with pytest.raises(ValueError, match="Unknown metric"):
+        archive.query(metric="minutes")
@@ -0,0 +1,62 @@
+from coalesce import batches, coalesce_entries
+
+
+def entry(entry_id, start, stop, description="Deep work", project_id=1, tags=None):
+    return {"id": entry_id, "project_id": project_id, "description": description, "tags": tags or [],
+            "start": f"2026-10-19T{start}:00+00:00", "stop": f"2026-10-19T{stop}:00+00:00"}
+
+
+def merged(entries):
+    return [(e["id"], e.get("merged_ids")) for e in entries]
+
+
+def test_merges_fragments_within_the_gap():
+    result = coalesce_entries([entry(2, "09:35", "10:00", tags=["b"]), entry(1, "09:00", "09:30", tags=["a"])], 600)
+    assert merged(result) == [(1, [1, 2])]
+    assert result[0]["start"] == "2026-10-19T09:00:00+00:00"
+    assert result[0]["stop"] == "2026-10-19T10:00:00+00:00"
+    assert result[0]["duration"] == 3600
+    assert result[0]["tags"] == ["a", "b"]
+    assert result[0]["merged_spans"] == [["2026-10-19T09:00:00+00:00", "2026-10-19T09:30:00+00:00"],
+                                         ["2026-10-19T09:35:00+00:00", "2026-10-19T10:00:00+00:00"]]
+
+
+def test_keeps_fragments_past_the_gap_apart():
+    assert merged(coalesce_entries([entry(1, "09:00", "09:30"), entry(2, "09:41", "10:00")], 600)) == [
+        (1, None), (2, None)]
+
+
+def test_other_entry_in_the_gap_closes_the_group():
+    entries = [entry(1, "09:00", "09:30"), entry(2, "09:32", "09:40", "Email"), entry(3, "09:42", "10:00")]
+    assert merged(coalesce_entries(entries, 600)) == [(1, None), (2, None), (3, None)]
+
+
+def test_overlapping_entry_does_not_close_the_group():
+    entries = [entry(1, "09:00", "09:30"), entry(2, "09:10", "09:20", "Email"), entry(3, "09:32", "10:00")]
+    assert merged(coalesce_entries(entries, 600)) == [(1, [1, 3]), (2, None)]
+
+
+def test_interleaved_keys_close_each_others_gaps():
+    entries = [entry(1, "09:00", "09:30"), entry(2, "09:00", "09:30", project_id=2),
+               entry(3, "09:35", "10:00"), entry(4, "09:36", "10:00", project_id=2)]
+    assert merged(coalesce_entries(entries, 600)) == [(1, [1, 3]), (2, None), (4, None)]
+
+
+def test_growing_run_keeps_the_first_id():
+    first = coalesce_entries([entry(1, "09:00", "09:30"), entry(2, "09:35", "10:00")], 600)
+    grown = coalesce_entries([entry(1, "09:00", "09:30"), entry(2, "09:35", "10:00"), entry(3, "10:05", "10:30")], 600)
+    assert merged(first) == [(1, [1, 2])]
+    assert merged(grown) == [(1, [1, 2, 3])]
+    assert grown[0]["stop"] == "2026-10-19T10:30:00+00:00"
+
+
+def test_running_entries_pass_through():
+    running = {"id": 9, "project_id": 1, "description": "Deep work", "start": "2026-10-19T10:05:00+00:00",
+               "stop": None}
+    result = coalesce_entries([entry(1, "09:00", "09:30"), running], 600)
+    assert merged(result) == [(1, None), (9, None)]
+
+
+def test_batches_only_cut_at_gaps():
+    entries = [entry(1, "09:00", "09:30"), entry(2, "09:35", "10:00"), entry(3, "11:00", "11:30")]
+    assert [[e["id"] for e in batch] for batch in batches(entries, 1, 600)] == [[1, 2], [3]]
@@ -0,0 +1,109 @@
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from ics_reader import IcsFile, day_range, parse_block, parse_datetime, parse_duration, unfold
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    """Floating times are local; pin the local zone"""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def vevent(uid, dtstart, *lines):
+    return "\r\n".join(["BEGIN:VEVENT", f"UID:{uid}", dtstart, *lines, "END:VEVENT"]) + "\r\n"
+
+
+def calendar(*events, name="Work"):
+    return ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + f"X-WR-CALNAME:{name}\r\n" + "".join(events)
+            + "END:VCALENDAR\r\n")
+
+
+def daily_events(days, first=date(2026, 1, 1)):
+    return [vevent(f"e{i}", f"DTSTART:{first + timedelta(days=i):%Y%m%d}T090000Z",
+                   f"DTEND:{first + timedelta(days=i):%Y%m%d}T100000Z", f"SUMMARY:Day {i}")
+            for i in range(days)]
+
+
+def read(ics, start, end):
+    return [(e.start, e.props.get("SUMMARY")) for e in ics.events(*day_range(start, end))]
+
+
+def test_folded_lines_and_escapes():
+    block = vevent("a", "DTSTART:20260105T090000Z",
+                   "SUMMARY:Quarterly planning with the platform team and the infra",
+                   " structure folks\\, part 2",
+                   "DESCRIPTION:Line one\\nLine two",
+                   "BEGIN:VALARM", "SUMMARY:Reminder", "END:VALARM",
+                   "CATEGORIES:a", "CATEGORIES:b")
+    assert "\r\n " not in unfold(block)
+    props, params = parse_block(block)
+    assert props["SUMMARY"] == "Quarterly planning with the platform team and the infrastructure folks\\, part 2"
+    assert props["CATEGORIES"] == "a"  # the first of a repeated property
+
+
+def test_tzid_floating_utc_and_date_values():
+    assert parse_datetime("20260105T090000", 'TZID="America/New_York"')[0] == \
+        datetime(2026, 1, 5, 14, tzinfo=timezone.utc)
+    assert parse_datetime("20260705T090000", "TZID=America/New_York")[0] == \
+        datetime(2026, 7, 5, 13, tzinfo=timezone.utc)  # daylight saving time
+    assert parse_datetime("20260105T090000Z")[0] == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)
+    assert parse_datetime("20260105T090000")[0] == datetime(2026, 1, 5, 9, tzinfo=timezone.utc)  # floating
+    assert parse_datetime("20260105T090000", "TZID=Unknown Standard Time")[0].hour == 9
+    start, all_day = parse_datetime("20260105", "VALUE=DATE")
+    assert all_day and start == datetime(2026, 1, 5, tzinfo=timezone.utc)
+    assert parse_duration("PT1H30M") == timedelta(hours=1, minutes=30)
+    assert parse_duration("-P1W2D") == -timedelta(days=9)
+
+
+def test_range_reads_bisect_the_start_index(tmp_path):
+    path = tmp_path / "work.ics"
+    path.write_text(calendar(*reversed(daily_events(60))), newline="")
+    ics = IcsFile(str(path), str(tmp_path / "index"))
+    assert read(ics, date(2026, 1, 10), date(2026, 1, 11)) == [
+        (datetime(2026, 1, 10, 9, tzinfo=timezone.utc), "Day 9"),
+        (datetime(2026, 1, 11, 9, tzinfo=timezone.utc), "Day 10")]
+    assert read(ics, date(2025, 12, 1), date(2025, 12, 31)) == []
+    assert len(ics) == 60 and ics.calendar_name == "Work"
+    assert list(ics.starts) == sorted(ics.starts)
+
+
+def test_ends_from_duration_and_all_day_events(tmp_path):
+    path = tmp_path / "work.ics"
+    path.write_text(calendar(
+        vevent("d", "DTSTART:20260105T090000Z", "DURATION:PT45M"),
+        vevent("a", "DTSTART;VALUE=DATE:20260106"),
+        vevent("z", "DTSTART;TZID=America/New_York:20260107T090000", "DTEND;TZID=America/New_York:20260107T100000"),
+    ), newline="")
+    events = list(IcsFile(str(path), str(tmp_path / "index")).events(*day_range(date(2026, 1, 5), date(2026, 1, 7))))
+    assert [e.end - e.start for e in events] == [timedelta(minutes=45), timedelta(days=1), timedelta(hours=1)]
+    assert [e.all_day for e in events] == [False, True, False]
+    assert events[2].start.hour == 14
+
+
+def test_index_is_reused_extended_and_rebuilt(tmp_path):
+    path = tmp_path / "work.ics"
+    events = daily_events(10)
+    path.write_text("".join(events[:5]), newline="")
+    index_dir = str(tmp_path / "index")
+    assert len(read(IcsFile(str(path), index_dir), date(2026, 1, 1), date(2026, 1, 31))) == 5
+
+    reopened = IcsFile(str(path), index_dir)
+    reopened._load_index()
+    assert len(reopened.starts) == 5  # persisted
+
+    with open(path, "a", newline="") as f:  # appended, as the ics sync sink does
+        f.write("".join(events[5:]))
+    ics = IcsFile(str(path), index_dir)
+    assert [s for _, s in read(ics, date(2026, 1, 1), date(2026, 1, 31))] == [f"Day {i}" for i in range(10)]
+    assert ics.meta["scanned_to"] == os.path.getsize(path)
+
+    path.write_text("".join(events[3:4]), newline="")  # rewritten: the index is rebuilt
+    assert [s for _, s in read(ics, date(2026, 1, 1), date(2026, 1, 31))] == ["Day 3"]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from sync import IcsSink, generate_event_id, generate_merged_event_id, legacy_event_id
+from sync_wal import SyncAction
+
+START = datetime(2026, 10, 19, 9, tzinfo=timezone.utc)
+
+
+def action(key, title="Deep work", minutes=60, **kwargs):
+    return SyncAction(key, "Work", title, START.isoformat(), (START + timedelta(minutes=minutes)).isoformat(),
+                      **kwargs)
+
+
+def test_created_events_exist_after_reopening(tmp_path):
+    path = str(tmp_path / "out.ics")
+    sink = IcsSink(path, "Team")
+    ok, _ = sink.create(action("0123456789abcdef", notes="#focus"))
+    assert ok
+    assert IcsSink(path).exists(action("0123456789abcdef")) == "EXISTS"
+    text = open(path, encoding="utf-8", newline="").read()
+    assert text.startswith("BEGIN:VCALENDAR\r\n") and text.endswith("END:VCALENDAR\r\n")
+    assert "X-WR-CALNAME:Team" in text
+
+
+def test_long_lines_are_folded_at_75_octets(tmp_path):
+    path = str(tmp_path / "out.ics")
+    IcsSink(path).create(action("0123456789abcdef", title="Überlange Beschreibung " * 6))
+    lines = open(path, encoding="utf-8", newline="").read().split("\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in lines)
+    assert any(line.startswith(" ") for line in lines)
+
+
+def test_legacy_uid_matches_only_with_the_same_times(tmp_path):
+    path = str(tmp_path / "out.ics")
+    key = generate_event_id("Deep work", START, START + timedelta(hours=1))
+    IcsSink(path).create(action(legacy_event_id(key)))
+    sink = IcsSink(path)
+    assert sink.exists(action(key)) == "EXISTS"
+    assert sink.exists(action(key, minutes=90)) == "NOT_EXISTS"
+
+
+def test_update_replaces_a_legacy_event_with_a_folded_summary(tmp_path):
+    path = str(tmp_path / "out.ics")
+    title = "Reading the RFC 5545 section on content lines and their folding rules"
+    fragment = generate_event_id(title, START, START + timedelta(hours=1))
+    IcsSink(path).create(action(legacy_event_id(fragment), title=title))
+    sink = IcsSink(path)
+    merged = action(generate_merged_event_id(title, [1, 2]), title=title, minutes=90, replaces=[fragment])
+    assert sink.update(action(merged.key, title="Something else", minutes=90, replaces=[fragment])) == "NOT_FOUND"
+    assert sink.update(merged) == "UPDATED"
+    text = open(path, encoding="utf-8").read()
+    assert text.count("BEGIN:VEVENT") == 1
+    assert f"UID:{merged.key}@toggl-calendar" in text
+    assert "DTEND:20261019T103000Z" in text
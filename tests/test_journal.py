@@ -0,0 +1,98 @@
+import os
+from datetime import date
+
+import pytest
+
+from journal import JournalStore, fts_query, parse_report
+
+SUMMARY = """🗓️ Comprehensive Daily Summary for {day}
+
+📅 Planned Calendar Events:
+  09:00:00–11:00:00 | Paper review | Work
+
+⏱️ Actual Events (Toggl):
+  09:10:00–10:40:00 | Paper review | Work | Note: Imported from Toggl
+  23:30:00–00:15:00 | LeetCode | Growth
+
+📊 Summary:
+  Calendar Events: 1 planned, 2 actual (Toggl)
+  Reminders: 3 total (1 overdue, 2 completed)"""
+
+
+def report(day: str, analysis: str) -> str:
+    return "\n".join([
+        "=" * 60,
+        "📊 CALENDAR ANALYSIS REPORT - DAILY",
+        "\n" + "=" * 20 + " 📝 SUMMARY " + "=" * 20,
+        SUMMARY.format(day=day),
+        "\n" + "=" * 20 + " 🔍 ANALYSIS " + "=" * 19,
+        analysis,
+        "\n" + "=" * 60,
+    ])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / "journal"))
+    store.save("DAILY", date(2026, 1, 5), report("2026-01-05", "### 4️⃣ Tactical Recommendations\n"
+                                                              "1. Deep work in the morning before any meeting"))
+    store.save("DAILY", date(2026, 1, 6), report("2026-01-06", "### 4️⃣ Tactical Recommendations\n"
+                                                              "1. Batch the meetings after lunch"))
+    yield store
+    store.close()
+
+
+def test_report_sections_activities_and_counts():
+    sections, activities, metrics = parse_report(report("2026-01-05", "## Wins\nShipped it"))
+    headings = [heading for heading, _ in sections]
+    assert headings[:2] == ["header", "SUMMARY"]
+    assert headings[2:] == ["Planned Calendar Events", "Actual Events (Toggl)", "Summary", "Wins"]
+    assert ("actual", "Growth", "LeetCode", 45 * 60) in activities  # past midnight
+    assert ("planned", "Work", "Paper review", 2 * 3600) in activities
+    assert metrics["actual_events"] == 2 and metrics["reminders_overdue"] == 1
+    assert metrics["actual_seconds"] == (90 + 45) * 60
+
+
+def test_search_ranks_and_filters(store):
+    hits = store.search("meeting*")
+    assert {h["day"] for h in hits} == {"2026-01-05", "2026-01-06"}
+    assert all(h["section"].endswith("Tactical Recommendations") for h in hits)
+    hits = store.search("meetings", since=date(2026, 1, 6))
+    assert [h["day"] for h in hits] == ["2026-01-06"] and "[meetings]" in hits[0]["snippet"]
+    assert [h["day"] for h in store.search("NEAR(deep meeting, 8)")] == ["2026-01-05"]
+    assert store.search("NEAR(deep meeting, 3)") == []
+    assert store.search("meeting", report_type="weekly") == []
+    assert store.search("review", section="recommendations") == []
+
+
+def test_invalid_fts_syntax_is_searched_as_plain_terms(store):
+    assert fts_query('deep "work') == '"deep" """work"'
+    assert [h["day"] for h in store.search("lunch (")] == ["2026-01-06"]
+
+
+def test_search_sees_files_edited_by_hand(store):
+    path = store.path("DAILY", date(2026, 1, 6))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n## Notes\nRetro with the platform team\n")
+    assert store.search("platform") == []
+    assert store.refresh() == (1, 0)
+    assert [h["section"] for h in store.search("platform")] == ["Notes"]
+    os.remove(path)
+    assert store.refresh() == (0, 1)
+    assert store.search("platform") == [] and store.search("lunch") == []
+
+
+def test_history_counts_and_activity_time(store):
+    rows = store.history()
+    assert [r["day"] for r in rows] == ["2026-01-05", "2026-01-06"]
+    assert rows[0]["reminders_completed"] == 2 and rows[0]["actual_seconds"] == (90 + 45) * 60
+    leetcode = store.history(activity="leetcode", since=date(2026, 1, 6))
+    assert [(r["day"], r["actual_seconds"], r["entries"]) for r in leetcode] == [("2026-01-06", 45 * 60, 1)]
+
+
+def test_index_is_rebuilt_after_deletion(store):
+    store.close()
+    os.remove(store.index_path)
+    assert store.search("lunch") == []  # an empty index until refreshed
+    assert store.refresh() == (2, 0)
+    assert [h["day"] for h in store.search("lunch")] == ["2026-01-06"]
@@ -0,0 +1,76 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from project_cache import PROJECTS_PER_PAGE, ProjectCache
+
+PROJECTS = [{"id": i, "name": f"Project {i}", "active": i % 3 != 0, "client_name": None}
+            for i in range(1, 2 * PROJECTS_PER_PAGE + 51)]
+
+
+@pytest.fixture
+def toggl():
+    """Fake /workspaces/{id}/projects: paginated, active-only unless asked, ETag-aware"""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            requests.append(query)
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            projects = PROJECTS if query.get("active") == "both" else [p for p in PROJECTS if p["active"]]
+            projects = [p for p in projects if p["id"] > int(query.get("since", 0))]
+            per_page = int(query.get("per_page", 50))
+            page = int(query.get("page", 1))
+            body = json.dumps(projects[(page - 1) * per_page:page * per_page]).encode()
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+
+
+def test_pages_through_every_project_including_inactive(tmp_path, toggl):
+    url, requests = toggl
+    cache = ProjectCache(str(tmp_path / "projects.json"), "token", 1, url)
+    assert cache.refresh(full=True)
+    assert len(cache.projects) == len(PROJECTS)
+    assert cache.name(PROJECTS[-1]["id"]) == PROJECTS[-1]["name"]
+    assert cache.get(3)["active"] is False
+    assert [r["page"] for r in requests] == ["1", "2", "3"]
+    assert all(r["active"] == "both" for r in requests)
+
+
+def test_unchanged_workspace_is_a_single_304(tmp_path, toggl):
+    url, requests = toggl
+    path = str(tmp_path / "projects.json")
+    ProjectCache(path, "token", 1, url).refresh(full=True)
+    requests.clear()
+    cache = ProjectCache(path, "token", 1, url)
+    assert cache.refresh() is False
+    assert len(requests) == 1
+    assert len(cache.projects) == len(PROJECTS)
+
+
+def test_cache_without_inactive_projects_is_refetched_in_full(tmp_path, toggl):
+    url, requests = toggl
+    path = tmp_path / "projects.json"
+    path.write_text(json.dumps({"workspace_id": "1", "etag": '"v1"', "fetched_at": 10**10,
+                                "projects": {"1": {"name": "Project 1", "active": True}}}))
+    cache = ProjectCache(str(path), "token", 1, url)
+    assert cache.name(3) == "Project 3"
+    assert "since" not in requests[0]
@@ -0,0 +1,97 @@
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from ics_reader import IcsFile, day_range
+from recurrence import OccurrenceCache, RecurrenceRule, Series, expand
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    """Occurrences are returned as local times; pin the local zone"""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def series(rule, start=datetime(2026, 1, 5, 9), **kwargs):
+    return Series("uid", RecurrenceRule.parse(rule), start, timedelta(hours=1), **kwargs)
+
+
+def test_rule_parsing():
+    rule = RecurrenceRule.parse("RRULE:FREQ=MONTHLY;INTERVAL=2;BYDAY=1MO,-1FR;COUNT=4;WKST=SU")
+    assert (rule.freq, rule.interval, rule.count, rule.wkst) == ("MONTHLY", 2, 4, 6)
+    assert rule.byday == ((1, 0), (-1, 4))
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse("FREQ=HOURLY")
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse("FREQ=WEEKLY;BYDAY=XX")
+
+
+def test_weekly_with_exdate_and_rdate():
+    s = series("FREQ=WEEKLY;BYDAY=MO,WE", exdates=(datetime(2026, 1, 7, 9),), rdates=(datetime(2026, 1, 10, 9),))
+    assert expand(s, datetime(2026, 1, 1), datetime(2026, 1, 15)) == [
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 10, 9), datetime(2026, 1, 12, 9), datetime(2026, 1, 14, 9)]
+
+
+def test_count_until_and_ordinals():
+    assert len(expand(series("FREQ=DAILY;COUNT=3"), datetime(2026, 1, 1), datetime(2027, 1, 1))) == 3
+    assert expand(series("FREQ=DAILY;UNTIL=20260107"), datetime(2026, 1, 1), datetime(2027, 1, 1))[-1] == \
+        datetime(2026, 1, 7, 9)
+    last_fridays = expand(series("FREQ=MONTHLY;BYDAY=-1FR", start=datetime(2026, 1, 30, 9)),
+                          datetime(2026, 1, 1), datetime(2026, 4, 1))
+    assert [d.day for d in last_fridays] == [30, 27, 27]
+    # DTSTART is an occurrence even when the rule does not match it
+    assert [d.day for d in expand(series("FREQ=MONTHLY;BYDAY=-1FR"), datetime(2026, 1, 1),
+                                  datetime(2026, 2, 1))] == [5, 30]
+    assert expand(series("FREQ=MONTHLY;BYMONTHDAY=31", start=datetime(2026, 1, 31, 9)),
+                  datetime(2026, 1, 1), datetime(2026, 6, 1)) == [
+        datetime(2026, 1, 31, 9), datetime(2026, 3, 31, 9), datetime(2026, 5, 31, 9)]
+    assert [d.day for d in expand(series("FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1"),
+                                  datetime(2026, 1, 1), datetime(2026, 3, 1))] == [5, 30, 27]
+
+
+def test_zone_keeps_the_wall_clock_across_dst():
+    s = series("FREQ=WEEKLY", start=datetime(2026, 3, 2, 9), zone=NEW_YORK)
+    starts = [start for start, _ in OccurrenceCache().occurrences(
+        s, *day_range(date(2026, 3, 1), date(2026, 3, 16)))]
+    assert [start.hour for start in starts] == [14, 13, 13]  # 09:00 New York, EST then EDT from March 8
+
+
+def test_cache_serves_covered_windows_and_extends_overlaps():
+    cache = OccurrenceCache()
+    s = series("FREQ=DAILY")
+    assert len(cache.starts(s, datetime(2026, 1, 10), datetime(2026, 1, 12))) == 2
+    assert len(cache.starts(s, datetime(2026, 1, 20), datetime(2026, 1, 25))) == 5
+    assert (cache.hits, cache.misses) == (1, 1)  # whole January expanded once
+    assert len(cache.starts(s, datetime(2026, 1, 30), datetime(2026, 2, 3))) == 4
+    assert cache.misses == 2
+    edited = series("FREQ=DAILY", exdates=(datetime(2026, 1, 11, 9),))
+    assert len(cache.starts(edited, datetime(2026, 1, 10), datetime(2026, 1, 12))) == 1
+
+
+def test_ics_series_with_exdate_and_detached_occurrence(tmp_path):
+    path = tmp_path / "work.ics"
+    path.write_text("\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT", "UID:standup", "SUMMARY:Standup",
+        "DTSTART;TZID=America/New_York:20260105T090000", "DTEND;TZID=America/New_York:20260105T091500",
+        "RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR",
+        "EXDATE;TZID=America/New_York:20260106T090000",
+        "END:VEVENT",
+        "BEGIN:VEVENT", "UID:standup", "SUMMARY:Standup (moved)",
+        "RECURRENCE-ID;TZID=America/New_York:20260108T090000",
+        "DTSTART;TZID=America/New_York:20260108T110000", "DTEND;TZID=America/New_York:20260108T111500",
+        "END:VEVENT",
+        "END:VCALENDAR", ""]), newline="")
+    ics = IcsFile(str(path), str(tmp_path / "index"))
+    events = list(ics.events(*day_range(date(2026, 1, 5), date(2026, 1, 9))))
+    assert [(e.start.day, e.start.hour, e.props["SUMMARY"]) for e in events] == [
+        (5, 14, "Standup"), (7, 14, "Standup"), (8, 16, "Standup (moved)"), (9, 14, "Standup")]
+    assert all(e.end - e.start == timedelta(minutes=15) for e in events)
@@ -0,0 +1,96 @@
+from review_metrics import ReviewMetrics, calendar_totals, compute_metrics, render_offline_review, render_tables
+from summarize_calendar import CalendarEvent, Reminder
+
+
+def event(start, end, summary, calendar="Work", toggl=False, day="2025-07-30"):
+    return CalendarEvent(start=start, end=end, summary=summary, calendar=calendar, is_toggl=toggl, date=day)
+
+
+EVENTS = [
+    event("09:00:00", "11:00:00", "Write report"),
+    event("13:00:00", "14:00:00", "Review PRs"),
+    event("16:00:00", "17:00:00", "Gym", calendar="Personal"),
+    event("09:05:00", "10:35:00", "write report ", toggl=True),   # same title, any case
+    event("13:30:00", "13:50:00", "Email", toggl=True),           # overlaps "Review PRs"
+    event("15:00:00", "15:40:00", "Standup", toggl=True),
+    event("20:00:00", "21:00:00", "Reading", calendar="Growth", toggl=True),
+    event("22:00:00", "23:00:00", "Gaming", calendar="Personal", toggl=True),
+]
+REMINDERS = [
+    Reminder(due_date="", name="Pay rent", list_name="Personal", status="Overdue"),
+    Reminder(due_date="", name="Leetcode", list_name="Growth", status="Completed"),
+    Reminder(due_date="", name="Call bank", list_name="Personal", status="Completed"),
+]
+
+
+def test_task_and_reminder_counts():
+    metrics = compute_metrics(EVENTS, REMINDERS)
+    assert (metrics.tasks_planned, metrics.tasks_completed) == (3, 2)
+    assert metrics.missed_tasks == ["Gym"]
+    assert (metrics.reminders_completed, metrics.reminders_overdue) == (2, 1)
+    assert metrics.overdue_names == ["Pay rent"]
+    assert round(metrics.task_rate, 3) == 0.667
+    assert round(metrics.reminder_rate, 3) == 0.667
+    assert metrics.backlog_status == "Manageable"
+
+
+def test_deep_and_shallow_work_only_in_work_calendars():
+    metrics = compute_metrics(EVENTS, [])
+    assert (metrics.deep_work_seconds, metrics.deep_blocks) == (150 * 60, 2)  # 90m and 60m blocks
+    assert (metrics.shallow_seconds, metrics.shallow_blocks) == (60 * 60, 2)  # 20m and 40m blocks
+    assert metrics.total_work_seconds == 210 * 60
+
+    metrics = compute_metrics(EVENTS, [], cfg={"DEEP_WORK_MIN_MINUTES": 90, "WORK_CALENDARS": ["Work"]})
+    assert (metrics.deep_blocks, metrics.shallow_blocks) == (1, 2)
+    assert metrics.total_work_seconds == 150 * 60
+
+
+def test_rest_is_the_average_overnight_gap():
+    events = [
+        event("08:00:00", "22:00:00", "Day 1", toggl=True, day="2025-07-28"),
+        event("07:00:00", "23:30:00", "Day 2", toggl=True, day="2025-07-29"),
+        event("09:00:00", "10:00:00", "Day 3", toggl=True, day="2025-07-30"),
+        event("10:00:00", "11:00:00", "Day 5", toggl=True, day="2025-08-01"),  # no next day
+    ]
+    metrics = compute_metrics(events, [], report_type="weekly", days=7)
+    assert metrics.report_type == "WEEKLY"
+    assert metrics.rest_seconds == (9 * 3600 + int(9.5 * 3600)) // 2
+    assert compute_metrics(events[:1], []).rest_seconds is None
+
+
+def test_event_past_midnight_and_untimed_events():
+    events = [event("23:30:00", "00:30:00", "Late deploy", toggl=True), event("", "", "All day", toggl=True)]
+    metrics = compute_metrics(events, [])
+    assert (metrics.deep_work_seconds, metrics.deep_blocks) == (3600, 1)
+
+
+def test_calendar_totals():
+    totals = calendar_totals(EVENTS)
+    assert totals["Work"] == {"actual_seconds": 150 * 60, "actual_events": 3,
+                              "planned_seconds": 3 * 3600, "planned_events": 2}
+    assert totals["Personal"]["planned_seconds"] == totals["Personal"]["actual_seconds"] == 3600
+
+
+def test_tables_show_the_values():
+    tables = render_tables(compute_metrics(EVENTS, REMINDERS))
+    assert "| Tasks      | 3 | 2 | 67% | ⚠️ | missed: Gym |" in tables
+    assert "| Reminders  | 3 | 2 | 67% | ⚠️ | 1 overdue |" in tables
+    assert "| Deep Work Hours        | 2h 30m | 3–5h | ⚠️ | 2 blocks |" in tables
+    assert "| Rest / Sleep           | — | 7–8h | — | not tracked |" in tables
+    assert "> Backlog status: Manageable" in tables
+
+
+def test_weekly_hours_are_averaged_per_day():
+    metrics = ReviewMetrics(report_type="WEEKLY", days=5, deep_work_seconds=20 * 3600)
+    tables = render_tables(metrics)
+    assert "This week Execution Overview" in tables
+    assert "| 20h 0m (avg 4h 0m/day) | 3–5h | ✅ |" in tables
+
+
+def test_offline_review_recommendations():
+    review = render_offline_review(compute_metrics(EVENTS, REMINDERS))
+    assert "1. Handle 1 overdue reminders first (Pay rent)" in review
+    assert "2. Deep work → Reserve a continuous 2h block, no fragmentation" in review
+    assert "3. Plan calibration → Reschedule or drop: Gym" in review
+    clean = render_offline_review(ReviewMetrics(report_type="DAILY", days=1, deep_work_seconds=4 * 3600))
+    assert "1. Keep the current plan" in clean
@@ -0,0 +1,152 @@
+import pytest
+
+import sync
+
+
+class FakeSink:
+    """In-memory calendar: events are dicts with the ID they were written with"""
+
+    def __init__(self):
+        self.events = []
+        self.calls = []
+
+    def has_calendar(self, calendar):
+        return True
+
+    def exists(self, action):
+        self.calls.append("exists")
+        hit = any(action.key in e["id"] or (e["start"], e["end"]) == (action.start, action.end) for e in self.events)
+        return "EXISTS" if hit else "NOT_EXISTS"
+
+    def create(self, action):
+        self.calls.append("create")
+        self.events.append({"id": action.key, "start": action.start, "end": action.end})
+        return True, "Success"
+
+    def update(self, action):
+        self.calls.append("update")
+        hits = [e for e in self.events if e["id"] in {action.key, *action.replaces}]
+        if not hits:
+            return "NOT_FOUND"
+        hits[0].update(id=action.key, start=action.start, end=action.end)
+        for e in hits[1:]:
+            self.events.remove(e)
+        return "UPDATED"
+
+
+def entry(entry_id, start, stop):
+    return {"id": entry_id, "project_id": 1, "description": "Deep work", "tags": [], "duration": 60,
+            "start": f"2026-10-19T{start}:00+00:00", "stop": f"2026-10-19T{stop}:00+00:00"}
+
+
+@pytest.fixture
+def run(write_config, monkeypatch):
+    write_config(id_to_name={"1": "Work"}, COALESCE_GAP_MINUTES=10)
+    sink = FakeSink()
+    monkeypatch.setattr(sync, "make_sink", lambda account, executor: sink)
+
+    def run_once(entries):
+        monkeypatch.setattr(sync, "get_last_week_entries", lambda **kwargs: list(entries))
+        sink.calls.clear()
+        return sync._run_sync(None, sync.get_accounts()[0], "2026-10-16", "2026-10-19")
+
+    run_once.sink = sink
+    return run_once
+
+
+def test_fragment_synced_alone_is_extended_not_duplicated(run):
+    fragments = [entry(1, "09:00", "09:30"), entry(2, "09:35", "10:00"), entry(3, "10:05", "10:30")]
+    assert run(fragments[:1])["created"] == 1
+    assert run(fragments[:2])["updated"] == 1
+    assert run(fragments)["updated"] == 1
+    assert run(fragments)["duplicates"] == 1
+    assert len(run.sink.events) == 1
+    assert run.sink.events[0]["end"] == sync.parse_datetime("2026-10-19T10:30:00+00:00").isoformat()
+
+
+def test_new_merged_event_skips_the_update_lookup(run):
+    counts = run([entry(1, "09:00", "09:30"), entry(2, "09:35", "10:00")])
+    assert counts["created"] == 1
+    assert run.sink.calls == ["exists", "create"]
+
+
+def test_synced_entries_are_not_checked_again(run):
+    run([entry(1, "09:00", "09:30")])
+    counts = run([entry(1, "09:00", "09:30")])
+    assert counts["duplicates"] == 1
+    assert run.sink.calls == []
+
+
+def test_log_is_closed_after_replay_without_new_entries(run):
+    from sync_wal import SyncAction
+
+    wal = sync.get_accounts()[0].sync_log
+    wal.plan([SyncAction("abc", "Work", "Deep work", "2026-10-19T09:00:00+00:00", "2026-10-19T10:00:00+00:00")])
+    counts = run([])
+    assert counts["created"] == 1
+    assert wal._file is None
+
+
+def test_legacy_ids_count_only_with_the_same_end(run):
+    from sync_wal import SyncAction
+
+    start, end = sync.parse_datetime("2026-10-19T09:00:00+00:00"), sync.parse_datetime("2026-10-19T09:30:00+00:00")
+    legacy = sync.legacy_event_id(sync.generate_event_id("Deep work", start, end))
+    wal = sync.get_accounts()[0].sync_log
+    wal.mark_done(SyncAction(legacy, "Work", "Deep work", start.isoformat(), end.isoformat()), "created")
+    assert run([entry(1, "09:00", "09:30")])["duplicates"] == 1
+    assert run([entry(2, "11:00", "11:30")])["created"] == 1
+
+
+def test_update_script_searches_only_the_new_span():
+    scripts = []
+
+    class Executor:
+        def run(self, script, timeout=None):
+            scripts.append(script)
+            return True, "NOT_FOUND"
+
+    start, end = sync.parse_datetime("2026-10-19T09:00:00+00:00"), sync.parse_datetime("2026-10-19T10:30:00+00:00")
+    result = sync.update_calendar_event("Work", "Deep work", start, end, ["0123456789abcdef"], executor=Executor(),
+                                        event_id="fedcba9876543210")
+    assert result == "NOT_FOUND"
+    searches = [line for line in scripts[0].splitlines() if "description contains" in line]
+    assert searches and all("start date ≥ startDate and start date ≤ endDate" in line for line in searches)
+    assert '"01234567"' in scripts[0] and '"fedcba98"' in scripts[0]
+
+
+def test_missing_calendar_is_per_account_and_per_run(write_config, monkeypatch, capsys):
+    write_config(id_to_name={"1": "Work"}, ACCOUNTS=[{"name": "alice"}, {"name": "bob"}])
+    sinks = {"alice": FakeSink(), "bob": FakeSink()}
+    sinks["alice"].has_calendar = lambda calendar: False
+    monkeypatch.setattr(sync, "make_sink", lambda account, executor: sinks[account.name])
+    monkeypatch.setattr(sync, "get_last_week_entries",
+                        lambda **kwargs: [entry(1, "09:00", "09:30"), entry(2, "11:00", "11:30")])
+    alice, bob = sync.get_accounts()
+
+    assert sync._run_sync(None, alice, "2026-10-16", "2026-10-19")["skipped"] == 2
+    assert sync._run_sync(None, bob, "2026-10-16", "2026-10-19")["created"] == 2
+    sync._run_sync(None, alice, "2026-10-16", "2026-10-19")
+    assert capsys.readouterr().out.count("Calendar 'Work' does not exist") == 2
+
+
+def test_create_prints_nothing(capsys):
+    class Executor:
+        def run(self, script, timeout=None):
+            return True, "Success"
+
+    start, end = sync.parse_datetime("2026-10-19T09:00:00+00:00"), sync.parse_datetime("2026-10-19T10:00:00+00:00")
+    assert sync.create_calendar_event("Work", "Deep work", start, end, executor=Executor())[0]
+    assert capsys.readouterr().out == ""
+
+
+def test_invalid_times_are_logged_under_the_account(write_config, monkeypatch, capsys):
+    write_config(id_to_name={"1": "Work"}, ACCOUNTS=[{"name": "alice"}, {"name": "bob"}])
+    monkeypatch.setattr(sync, "make_sink", lambda account, executor: FakeSink())
+    monkeypatch.setattr(sync, "get_last_week_entries",
+                        lambda **kwargs: [{**entry(1, "09:00", "09:30"), "stop": "not a time"}])
+    counts = sync._run_sync(None, sync.get_accounts()[0], "2026-10-16", "2026-10-19")
+    assert counts["skipped"] == 1
+    out = capsys.readouterr().out.splitlines()
+    assert all(line.startswith("[alice] ") for line in out if line)
+    assert any("invalid time" in line and "'not a time'" in line for line in out)
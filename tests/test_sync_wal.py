@@ -0,0 +1,52 @@
+from sync_wal import SyncAction, SyncLog
+
+
+def action(key, end="2026-10-19T10:00:00+00:00", **kwargs):
+    return SyncAction(key, "Work", "Deep work", "2026-10-19T09:00:00+00:00", end, **kwargs)
+
+
+def test_unfinished_actions_are_replayed(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    wal = SyncLog(path)
+    wal.plan([action("a"), action("b")])
+    wal.mark_done(action("a"), "created")
+    wal.close()
+    reopened = SyncLog(path)
+    assert list(reopened.unfinished) == ["b"]
+    assert reopened.is_done("a")
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "wal.jsonl"
+    wal = SyncLog(str(path))
+    wal.plan([action("a")])
+    wal.close()
+    with open(path, "a") as f:
+        f.write('{"op": "done", "key": "a", "outc')
+    assert list(SyncLog(str(path)).unfinished) == ["a"]
+
+
+def test_update_of_a_finished_key_survives_compaction(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    wal = SyncLog(path)
+    wal.plan([action("m")])
+    wal.mark_done(action("m"), "created")
+    grown = action("m", end="2026-10-19T10:30:00+00:00", replaces=["x"])
+    assert wal.is_done("m") and not wal.is_done("m", grown.end)
+    wal.plan([grown])
+    wal.close()
+    reopened = SyncLog(path)  # replays, then compacts
+    assert reopened.unfinished["m"].replaces == ["x"]
+    reopened.mark_done(reopened.unfinished["m"], "updated")
+    reopened.close()
+    assert not SyncLog(path).unfinished
+
+
+def test_compaction_drops_actions_past_retention(tmp_path):
+    path = str(tmp_path / "wal.jsonl")
+    wal = SyncLog(path, retention_days=14)
+    old = action("old", end="2020-01-01T10:00:00+00:00")
+    wal.plan([old])
+    wal.mark_done(old, "created")
+    wal.compact()
+    assert not wal.is_done("old")
@@ -0,0 +1,125 @@
+import json
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from toggl_reports import MAX_WINDOW_DAYS, date_windows, iter_json_array, iter_report_entries
+
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 400  # two request windows
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+def test_json_array_across_chunk_boundaries(size):
+    values = [{"id": 1, "description": "Über ✓"}, 123, -4.5, "x", [1, [2]], None, True]
+    data = json.dumps(values, ensure_ascii=False).encode("utf-8")
+    assert list(iter_json_array(split(data, size))) == values
+
+
+def test_json_array_number_is_not_cut_at_a_chunk_end():
+    assert list(iter_json_array([b"[12", b"3, 4", b"5]"])) == [123, 45]
+
+
+def test_json_array_empty_and_whitespace():
+    assert list(iter_json_array([b" \n[", b" ]"])) == []
+
+
+@pytest.mark.parametrize("chunks", [[b'[{"id": 1}, {"id"'], [b"[1, 2"]])
+def test_json_array_truncated_raises(chunks):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks))
+
+
+def test_json_array_rejects_other_documents():
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        list(iter_json_array([b'{"error": "quota"}']))
+
+
+def test_date_windows_cover_the_range_without_overlap():
+    start, end = date(2023, 3, 1), date(2025, 2, 28)
+    windows = list(date_windows(start, end))
+    assert windows[0][0] == start and windows[-1][1] == end
+    for (_, prev_end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start == prev_end + timedelta(days=1)
+    assert all((e - s).days + 1 <= MAX_WINDOW_DAYS for s, e in windows)
+    assert len(windows) == 2
+
+
+def test_date_windows_edges():
+    day = date(2024, 2, 29)
+    assert list(date_windows(day, day)) == [(day, day)]
+    assert list(date_windows(day, day - timedelta(days=1))) == []
+    assert list(date_windows(day, day + timedelta(days=2), days=1)) == [
+        (day, day), (day + timedelta(days=1),) * 2, (day + timedelta(days=2),) * 2]
+
+
+@pytest.fixture
+def reports():
+    """Fake Reports API: one row per day, paged with the X-Next-ID / X-Next-Row-Number cursor"""
+    rows = [{"description": f"Day {i}", "project_id": 7, "tag_ids": [1, 99], "billable": False,
+             "time_entries": [{"id": 1000 + i, "seconds": 60,
+                               "start": f"{FIRST_DAY + timedelta(days=i)}T09:00:00Z",
+                               "stop": f"{FIRST_DAY + timedelta(days=i)}T09:01:00Z"}]}
+            for i in range(DAYS)]
+    bodies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._send(json.dumps([{"id": 1, "name": "focus"}]).encode(), {})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            bodies.append(body)
+            window = [r for r in rows
+                      if body["start_date"] <= r["time_entries"][0]["start"][:10] <= body["end_date"]]
+            first = body.get("first_row_number", 1) - 1
+            page = window[first:first + body["page_size"]]
+            headers = {}
+            if first + len(page) < len(window):
+                headers = {"X-Next-ID": str(window[first + len(page)]["time_entries"][0]["id"]),
+                           "X-Next-Row-Number": str(first + len(page) + 1)}
+            self._send(json.dumps(page).encode(), headers)
+
+        def _send(self, data, headers):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    cfg = {"TOGGL_API_TOKEN": "token", "TOGGL_WORKSPACE_ID": 1, "TOGGL_API_URL": url,
+           "TOGGL_REPORTS_URL": url, "TOGGL_REPORTS_PAGE_SIZE": 150}
+    yield cfg, bodies
+    server.shutdown()
+
+
+def test_report_entries_follow_the_cursor_across_windows(reports):
+    cfg, bodies = reports
+    entries = list(iter_report_entries(cfg, FIRST_DAY, FIRST_DAY + timedelta(days=DAYS - 1)))
+    assert [e["id"] for e in entries] == [1000 + i for i in range(DAYS)]
+    assert entries[0]["tags"] == ["focus", "99"] and entries[0]["duration"] == 60
+
+    first_window = [b for b in bodies if b["start_date"] == FIRST_DAY.isoformat()]
+    assert [b.get("first_row_number") for b in first_window] == [None, 151, 301]
+    assert first_window[1]["first_id"] == 1150
+    assert len(bodies) == 4  # 366 days in three pages, the remaining 34 in one
+
+
+def test_report_entries_stop_on_a_page_without_cursor(reports):
+    cfg, bodies = reports
+    entries = list(iter_report_entries(cfg, FIRST_DAY, FIRST_DAY + timedelta(days=9)))
+    assert len(entries) == 10 and len(bodies) == 1
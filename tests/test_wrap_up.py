@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import sync
+import wrap_up
+from journal import JournalStore
+
+
+class FakeSummarizer:
+    def __init__(self, executor=None):
+        pass
+
+    def _get_data(self, start_date, end_date):
+        return [], []
+
+    def build_summary(self, start_date_str, end_date_str, calendar, reminders):
+        return f"summary of {start_date_str}"
+
+
+class FakeAnalyzer:
+    cfg = {}
+    agent = None
+
+    def generate_analysis(self, summary, report_type="DAILY", metrics=None):
+        if summary.endswith("2025-07-02"):
+            raise Exception("Error generating analysis: backend down")
+        return "analysis"
+
+
+@pytest.fixture
+def backfill_env(tmp_path, monkeypatch, write_config):
+    write_config()
+    monkeypatch.setattr(sync, "_default_executor", None)
+    monkeypatch.setattr(wrap_up, "CalendarSummarizer", FakeSummarizer)
+    monkeypatch.setattr(wrap_up, "_analyzer", FakeAnalyzer())
+    monkeypatch.setattr(wrap_up, "_journal_store", JournalStore(str(tmp_path / "journal")))
+    return tmp_path / "journal"
+
+
+def test_backfill_reports_failed_days(backfill_env):
+    failures = []
+    saved = wrap_up.backfill("2025-07-01", "2025-07-03", max_workers=2, failures=failures)
+    assert sorted(saved) == ["2025-07-01", "2025-07-03"]
+    assert failures == ["backfill 2025-07-02: Error generating analysis: backend down"]
+    assert not os.path.exists(wrap_up.journal_path("DAILY", wrap_up.datetime(2025, 7, 2)))
+
+
+def test_range_exits_non_zero_when_a_day_fails(backfill_env):
+    with pytest.raises(SystemExit) as exit_info:
+        wrap_up.run(wrap_up.parse_args(["--range", "2025-07-01", "2025-07-03"]))
+    assert "backfill 2025-07-02" in str(exit_info.value.code)
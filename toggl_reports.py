@@ -0,0 +1,133 @@
+import codecs
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from instrumentation import http_request
+from rate_limit import RateLimiter
+from settings import DEFAULT_TOGGL_API_URL
+
+DEFAULT_TOGGL_REPORTS_URL = "https://api.track.toggl.com/reports/api/v3"
+DEFAULT_PAGE_SIZE = 50
+# Longest date range requested at once; longer imports are split into windows
+MAX_WINDOW_DAYS = 366
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decode a top-level JSON array element by element as its bytes arrive
+
+    Only the undecoded tail of the stream is buffered, so memory is bounded
+    by the chunk size plus the largest single element, not the array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos = "", 0
+    started = eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"Expected a JSON array, got {buf[pos:pos + 20]!r}")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a number is only complete once a delimiter follows it
+                if eof or buf[end - 1] in '}]"' or (end < len(buf) and buf[end] in " \t\r\n,]"):
+                    yield value
+                    pos = end
+                    continue
+        elif eof:
+            raise ValueError("Truncated JSON array")
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buf = buf[pos:] + utf8.decode(chunk or b"", final=eof)
+        pos = 0
+
+
+def fetch_tag_names(cfg: Dict[str, Any], limiter: Optional[RateLimiter] = None) -> Dict[int, str]:
+    """Workspace tag id → name; the Reports API only returns tag ids"""
+    if limiter is not None:
+        limiter.acquire()
+    response = http_request(
+        "GET",
+        f"{cfg.get('TOGGL_API_URL', DEFAULT_TOGGL_API_URL)}/workspaces/{cfg['TOGGL_WORKSPACE_ID']}/tags",
+        auth=(cfg["TOGGL_API_TOKEN"], "api_token"),
+    )
+    response.raise_for_status()
+    return {tag["id"]: tag["name"] for tag in response.json() or []}
+
+
+def normalize_row(row: Dict[str, Any], tag_names: Dict[int, str]) -> Iterator[dict]:
+    """Entries of one report row in the shape of ``/me/time_entries`` records"""
+    tags = [tag_names.get(tag_id, str(tag_id)) for tag_id in row.get("tag_ids") or []]
+    for entry in row.get("time_entries") or []:
+        yield {
+            "id": entry["id"],
+            "description": row.get("description") or "",
+            "project_id": row.get("project_id"),
+            "start": entry.get("start"),
+            "stop": entry.get("stop"),
+            "duration": entry.get("seconds", 0),
+            "tags": list(tags),
+            "billable": row.get("billable", False),
+        }
+
+
+def date_windows(start: date, end: date, days: int = MAX_WINDOW_DAYS) -> Iterator[tuple]:
+    """Split the inclusive range ``start``..``end`` into windows of at most ``days`` days"""
+    while start <= end:
+        window_end = min(end, start + timedelta(days=days - 1))
+        yield start, window_end
+        start = window_end + timedelta(days=1)
+
+
+def iter_report_entries(cfg: Dict[str, Any], start: date, end: date,
+                        limiter: Optional[RateLimiter] = None) -> Iterator[dict]:
+    """Time entries from ``start`` to ``end`` (inclusive) via the Reports API, oldest first
+
+    Pages of the detailed report are requested with the ``X-Next-ID`` /
+    ``X-Next-Row-Number`` cursor and parsed as they stream in; each page is
+    normalized and handed out before the next is requested, so memory is
+    bounded by ``TOGGL_REPORTS_PAGE_SIZE`` however long the range is. HTTP
+    errors are raised; entries already yielded stay yielded.
+    """
+    url = f"{cfg.get('TOGGL_REPORTS_URL', DEFAULT_TOGGL_REPORTS_URL)}/workspace/{cfg['TOGGL_WORKSPACE_ID']}/search/time_entries"
+    auth = (cfg["TOGGL_API_TOKEN"], "api_token")
+    tag_names = fetch_tag_names(cfg, limiter)
+    for window_start, window_end in date_windows(start, end):
+        body = {
+            "start_date": window_start.isoformat(),
+            "end_date": window_end.isoformat(),
+            "page_size": cfg.get("TOGGL_REPORTS_PAGE_SIZE", DEFAULT_PAGE_SIZE),
+            "order_by": "date",
+            "order_dir": "asc",
+            "grouped": False,
+        }
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            # the page is read to the end before it is yielded, so the
+            # connection goes back to the pool while the caller works
+            page: List[dict] = []
+            with http_request("POST", url, json=body, auth=auth, stream=True, timeout=(10, 60)) as response:
+                response.raise_for_status()
+                for row in iter_json_array(response.iter_content(CHUNK_SIZE)):
+                    page.extend(normalize_row(row, tag_names))
+                next_id = response.headers.get("X-Next-ID")
+                next_row = response.headers.get("X-Next-Row-Number")
+            yield from page
+            if not next_id or not next_row:
+                break
+            body = {**body, "first_id": int(next_id), "first_row_number": int(next_row)}
@@ -1,17 +1,69 @@
 import os
-from typing import Optional, Literal
+import sys
+from typing import Optional, Literal, List, Dict
 from datetime import datetime, timedelta
-from summarize_calendar import CalendarSummarizer
-from ai_summary import ReportAnalyzer
-from sync import sync 
+from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+from summarize_calendar import CalendarSummarizer, CalendarEvent, Reminder
+from settings import config_path, load_config
 
-def wrap_up(option: Optional[Literal["DAILY", "WEEKLY"]] = "DAILY", do_sync: Optional[bool] = False) -> None:
-    """Generate and analyze calendar reports for Daily or Weekly periods"""
+REPORT_FOOTER = "\n" + "=" * 60
+
+_journal_store = None
+
+def get_journal_store():
+    """JournalStore for ``JOURNAL_DIR``, kept for the life of the process"""
+    global _journal_store
+    if _journal_store is None:
+        from journal import JournalStore
+        _journal_store = JournalStore.from_config(load_config(), os.path.dirname(config_path()))
+    return _journal_store
+
+def journal_path(report_type: str, report_date: datetime) -> str:
+    """Path of the saved journal file for a report"""
+    return get_journal_store().path(report_type, report_date)
+
+def report_header(report_type: str, date_str: str, generated: datetime, summary: str) -> List[str]:
+    """Header and summary lines of a report, up to the analysis section"""
+    headerLines = []
     
+    headerLines.append("=" * 60)
+    headerLines.append(f"📊 CALENDAR ANALYSIS REPORT - {report_type}")
+    headerLines.append(f"📅 Period: {date_str}")
+    headerLines.append(f"⏰ Generated: {generated.strftime('%Y-%m-%d %H:%M:%S')}")
+    headerLines.append("\n" + "=" * 20 + " 📝 SUMMARY " + "=" * 20)
+    headerLines.append(summary)
+    headerLines.append("\n" + "=" * 20 + " 🔍 ANALYSIS " + "=" * 19)
+    return headerLines
+
+_analyzer = None
+
+def get_analyzer():
+    """ReportAnalyzer kept for the life of the process, so a resident scheduler
+    reuses its config, LLM client and latency history across runs"""
+    global _analyzer
+    if _analyzer is None:
+        from ai_summary import ReportAnalyzer
+        _analyzer = ReportAnalyzer(config_path())
+    return _analyzer
+
+def wrap_up(option: Optional[Literal["DAILY", "WEEKLY"]] = "DAILY", do_sync: Optional[bool] = False, stream: Optional[bool] = False, offline: Optional[bool] = False, failures: Optional[List[str]] = None) -> None:
+    """Generate and analyze calendar reports for Daily or Weekly periods
+
+    Stages run as a dependency pipeline: the reminder fetch and LLM client
+    setup overlap with the sync, and the analysis starts as soon as the
+    summary is ready. With ``stream`` the summary is printed as soon as it is
+    ready and the analysis is printed progressively while the LLM generates it.
+    The review tables are computed locally; with ``offline`` the whole review
+    is filled in locally and no LLM request is made. A failed ``do_sync``
+    does not stop the report; its reason is appended to ``failures``.
+    """
+    # Imported here so `--help` and the other subcommands skip the LLM client stack
+    from sync import sync, sync_failure, get_executor
+    from pipeline import Pipeline
+    from review_metrics import compute_metrics, render_offline_review
+
     today = datetime.now()
-    
-    if do_sync:
-        sync()
 
     # Calculate date range based on option
     if option.upper() == "DAILY":
@@ -34,45 +86,163 @@ def wrap_up(option: Optional[Literal["DAILY", "WEEKLY"]] = "DAILY", do_sync: Opt
         raise ValueError(f"Unsupported option: {option}")
 
     # Initialize components
-    summarizer = CalendarSummarizer()
+    summarizer = CalendarSummarizer(executor=get_executor())
 
-    config_path = os.path.join(os.path.dirname(__file__), "config.json")
-    analyzer = ReportAnalyzer(config_path)
+    analyzer = get_analyzer()
 
-    try:
-        # Generate calendar summary based on the option
-        if option == "DAILY":
-            summary = summarizer.generate_summary(start_date.strftime("%Y-%m-%d"))
-        else:  # Weekly
-            # Assuming CalendarSummarizer can handle date ranges
-            summary = summarizer.generate_summary(
-                start_date.strftime("%Y-%m-%d"),
-                end_date.strftime("%Y-%m-%d")
-            )
-        
+    start_date_str = start_date.strftime("%Y-%m-%d")
+    end_date_str = start_date_str if report_type == "DAILY" else end_date.strftime("%Y-%m-%d")
+    query_start = datetime.strptime(start_date_str, "%Y-%m-%d")
+    query_end = datetime.strptime(end_date_str, "%Y-%m-%d")
+    elapsed_days = (min(query_end, today) - query_start).days + 1
+
+    headerLines = []
+    footer = REPORT_FOOTER
+
+    def build_summary(calendar, reminders):
+        summary = summarizer.build_summary(start_date_str, end_date_str, calendar, reminders)
+        headerLines.extend(report_header(report_type, date_str, today, summary))
+        if stream:
+            print("\n".join(headerLines), flush=True)
+        return summary
+
+    def build_metrics(calendar, reminders, config):
+        return compute_metrics(calendar, reminders, report_type, elapsed_days, analyzer.cfg)
+
+    def analyze(summary, metrics, agent):
         # Analyze the summary with context about the report type
-        result = analyzer.generate_analysis(summary, report_type=option)
+        if offline:
+            review = render_offline_review(metrics)
+            if stream:
+                print(review + "\n" + footer, flush=True)
+            return review
+        if not stream:
+            return analyzer.generate_analysis(summary, report_type=report_type, metrics=metrics)
+        chunks = []
+        try:
+            for chunk in analyzer.generate_analysis_stream(summary, report_type=report_type, metrics=metrics):
+                print(chunk, end="", flush=True)
+                chunks.append(chunk)
+        except Exception:
+            print(flush=True)  # the error is reported on its own line, not after the partial analysis
+            raise
+        print("\n" + footer, flush=True)
+        return "".join(chunks)
 
-        outputLines = []
-        
-        outputLines.append("=" * 60)
-        outputLines.append(f"📊 CALENDAR ANALYSIS REPORT - {report_type}")
-        outputLines.append(f"📅 Period: {date_str}")
-        outputLines.append(f"⏰ Generated: {today.strftime('%Y-%m-%d %H:%M:%S')}")
-        outputLines.append("\n" + "=" * 20 + " 📝 SUMMARY " + "=" * 20)
-        outputLines.append(summary)
-        outputLines.append("\n" + "=" * 20 + " 🔍 ANALYSIS " + "=" * 19)
-        outputLines.append(result)
-        outputLines.append("\n" + "=" * 60)
+    # Toggl events only show up in Calendar after the sync has written them, so
+    # the calendar fetch waits for sync; reminders and the LLM client do not.
+    def run_sync():
+        failure = sync_failure(sync())
+        if failure:
+            print(f"⚠️  Sync incomplete, the report uses the calendar as it is: {failure}")
+            if failures is not None:
+                failures.append(f"sync: {failure}")
+
+    pipeline = Pipeline()
+    pipeline.add("sync", run_sync if do_sync else (lambda: None))
+    pipeline.add("reminders", lambda: summarizer.reminder_source.get_data(query_start, query_end))
+    pipeline.add("config", lambda: None if hasattr(analyzer, "cfg") else analyzer._load_config())
+    pipeline.add("agent", lambda config: None if offline or hasattr(analyzer, "agent") else analyzer._load_agent(),
+                 deps=["config"])
+    pipeline.add("calendar", lambda sync: summarizer._get_calendar_events(query_start, query_end), deps=["sync"])
+    pipeline.add("summary", build_summary, deps=["calendar", "reminders"])
+    pipeline.add("metrics", build_metrics, deps=["calendar", "reminders", "config"])
+    pipeline.add("analysis", analyze, deps=["summary", "metrics", "agent"])
+
+    try:
+        results = pipeline.run()
+        print(pipeline.format_timings())
+
+        outputLines = headerLines + [results["analysis"], footer]
         
         # Join all lines and print the complete report
         return "\n".join(outputLines)
         
     except Exception as e:
+        print(pipeline.format_timings())
         print(f"Error generating {option.lower()} report: {e}")
 
-def parse_args():
+def split_by_day(day: str, events: List[CalendarEvent], reminders: List[Reminder]):
+    """Select one day's events and reminders out of a range fetch
+
+    Overdue reminders are the ones still open and due on or before the day;
+    completed reminders are the ones due on the day.
+    """
+    day_events = [e for e in events if e.date == day]
+    day_reminders = [
+        r for r in reminders
+        if r.due_day and ((r.status == "Overdue" and r.due_day <= day) or
+                          (r.status == "Completed" and r.due_day == day))
+    ]
+    return day_events, day_reminders
+
+def backfill(start_date_str: str, end_date_str: str, max_workers: int = 4,
+             failures: Optional[List[str]] = None) -> Dict[str, str]:
+    """Write missing daily journals for every day in [start, end]
+
+    Calendar and Reminders are queried once for the whole range, the data is
+    split into per-day summaries locally, and the LLM analyses run on a
+    bounded worker pool throttled by LLM_REQUESTS_PER_MINUTE from config.
+    Days whose journal file already exists are skipped. Returns day → path;
+    a day that could not be written is appended to ``failures``.
+    """
+    from sync import get_executor
+    from rate_limit import RateLimiter
+    from review_metrics import compute_metrics
+
+    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+    if end_date < start_date:
+        raise ValueError(f"Range end {end_date_str} is before start {start_date_str}")
+
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    missing = [d for d in days if not os.path.exists(journal_path("DAILY", d))]
+    print(f"Backfill {start_date_str} → {end_date_str}: {len(missing)} of {len(days)} journals missing")
+    if not missing:
+        return {}
+
+    summarizer = CalendarSummarizer(executor=get_executor())
+    analyzer = get_analyzer()
+    if not hasattr(analyzer, "agent"):
+        analyzer._load_agent()
+    limiter = RateLimiter.per_minute(analyzer.cfg.get("LLM_REQUESTS_PER_MINUTE"))
+
+    # One range query instead of one query per day
+    events, reminders = summarizer._get_data(missing[0], missing[-1])
+    undated = sum(1 for e in events if e.date is None)
+    if undated:
+        print(f"⚠️ {undated} events have no date and are left out of the daily journals")
+
+    generated = datetime.now()
+
+    def analyze_day(day: datetime) -> str:
+        day_str = day.strftime("%Y-%m-%d")
+        day_events, day_reminders = split_by_day(day_str, events, reminders)
+        summary = summarizer.build_summary(day_str, day_str, day_events, day_reminders)
+        metrics = compute_metrics(day_events, day_reminders, "DAILY", 1, analyzer.cfg)
+        limiter.acquire()
+        analysis = analyzer.generate_analysis(summary, report_type="DAILY", metrics=metrics)
+        report = "\n".join(report_header("DAILY", day_str, generated, summary) + [analysis, REPORT_FOOTER])
+        return get_journal_store().save("DAILY", day, report)
+
+    saved = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+        future_to_day = {executor.submit(analyze_day, day): day.strftime("%Y-%m-%d") for day in missing}
+        for future in concurrent.futures.as_completed(future_to_day):
+            day_str = future_to_day[future]
+            try:
+                saved[day_str] = future.result()
+                print(f"Saved {day_str} to {saved[day_str]}")
+            except Exception as exc:
+                print(f"Error backfilling {day_str}: {exc}")
+                if failures is not None:
+                    failures.append(f"backfill {day_str}: {exc}")
+
+    return saved
+
+def parse_args(argv=None):
     """Parse command line arguments"""
+    import argparse
     parser = argparse.ArgumentParser(
         description="Generate calendar analysis reports",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -102,18 +272,53 @@ def parse_args():
         help="Sync from toggl to apple calendar"
     )
 
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the summary first and stream the analysis as it is generated"
+    )
+
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Fill the review template locally without calling the LLM"
+    )
+
     parser.add_argument(
         "--save",
         action="store_true",
         help="Save report to file"
     )
-    
-    return parser.parse_args()
 
-if __name__ == "__main__":
-    import argparse
-    args = parse_args()
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run under cProfile and print the hottest functions"
+    )
+
+    parser.add_argument(
+        "--metrics-dir",
+        help="Write Prometheus textfile and JSON lines call metrics here (default: $METRICS_DIR)"
+    )
+
+    parser.add_argument(
+        "--range",
+        nargs=2,
+        metavar=("START", "END"),
+        help="Backfill missing daily journals for YYYY-MM-DD START to END (implies --save)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent LLM analyses when backfilling with --range"
+    )
     
+    return parser.parse_args(argv)
+
+def run(args) -> None:
+    """Run the command line invocation described by ``args``"""
     # Determine report type
     if args.weekly:
         report_type = "WEEKLY"
@@ -122,23 +327,41 @@ if __name__ == "__main__":
         report_type = "DAILY"
 
     do_sync = args.sync
+    # reasons for a non-zero exit, so the scheduler (and cron/launchd) see the failure
+    failures = []
+
+    if args.range:
+        if do_sync:
+            from sync import sync, sync_failure
+            failure = sync_failure(sync())
+            if failure:
+                failures.append(f"sync: {failure}")
+        backfill(args.range[0], args.range[1], max_workers=args.workers, failures=failures)
+    else:
+        report = wrap_up(report_type, do_sync, stream=args.stream, offline=args.offline, failures=failures)
+        if report is None:
+            failures.append(f"the {report_type.lower()} report could not be generated")
+            if args.save:
+                print("Nothing saved: the report could not be generated")
+        elif args.save:
+            # Define the output file path
+            now = datetime.now()
+            if now.hour < 6:
+                report_date = now - timedelta(1)
+            else:
+                report_date = now
+            filepath = get_journal_store().save(report_type, report_date, report)
 
-    report = wrap_up(report_type, do_sync)
+            print(f"Saved to {filepath}")
 
-    if args.save:
-        journal_dir = '/Users/wsq/Codespace/Obsidian/Work/2025/Journals'
-        os.makedirs(journal_dir, exist_ok=True)
+    if failures:
+        sys.exit("Wrap-up incomplete: " + "; ".join(failures))
 
-        # Define the output file path
-        now = datetime.now()
-        if now.hour < 6:
-            report_date = now - timedelta(1)
-        else:
-            report_date = now
-        filename = f"{report_type}_{report_date.strftime('%Y%m%d')}.md"
-        filepath = os.path.join(journal_dir, filename)
+def main(argv=None) -> None:
+    from instrumentation import run_instrumented
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(report)
-    
-        print(f"Saved to {filepath}")
+    args = parse_args(argv)
+    run_instrumented(lambda: run(args), metrics_dir=args.metrics_dir, profile=args.profile)
+
+if __name__ == "__main__":
+    main()